@@ -12,6 +12,7 @@ User = get_user_model()  # Always use get_user_model() to get the custom User, n
 
 from rbac.models import Role
 from file_upload.utils import get_group_id  # Helper to resolve which company a user belongs to
+from backend.storage import file_url  # Cached presigned URLs for profile pictures
 
 
 # ================================================================
@@ -72,7 +73,7 @@ class ProfileSerializer(serializers.ModelSerializer):
         file = getattr(obj, "profile_picture", None)
         if file:
             try:
-                return file.url  # MinIO signed URL or relative path
+                return file_url(file)  # MinIO signed URL (cached) or relative path
             except Exception:
                 return None
         return None
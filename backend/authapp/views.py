@@ -25,6 +25,7 @@ from django.views.decorators.csrf import ensure_csrf_cookie  # Forces CSRF cooki
 from django.views.decorators.csrf import csrf_exempt         # Skips CSRF check (used for public register)
 from rbac.models import Role, RolePermission
 from file_upload.utils import get_group_id  # Resolves the company group_id for any user
+from backend.storage import file_url  # Cached presigned URLs for profile pictures
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -437,7 +438,7 @@ def list_users_api(request):
         pic = None
         if u.profile_picture:
             try:
-                pic = request.build_absolute_uri(u.profile_picture.url)
+                pic = request.build_absolute_uri(file_url(u.profile_picture))  # Cached signed URL
             except Exception:
                 pic = None
 
@@ -0,0 +1,129 @@
+# ===============================================================
+#  backend/ollama_client.py
+#  Shared Ollama client for the whole project
+#
+#  Before: every call site built its own client (ollama.Client(), ChatOllama,
+#  OllamaLLM) → a fresh HTTP connection pool per request/prompt
+#  Now: ONE httpx-backed client per process, created on first use
+#
+#  - Keep-alive pool → repeated calls reuse open TCP connections to Ollama
+#  - Timeouts        → a hung model never blocks a worker forever
+#  - Semaphore       → caps in-flight requests per process (OLLAMA_MAX_CONCURRENCY)
+#                      so a burst of chats/embeds queues here instead of piling
+#                      up on the Ollama server
+#
+#  FUNCTIONS:
+#  embed(texts)          → list of vectors (one /api/embed call)
+#  chat(messages)        → assistant reply text
+#  chat_stream(messages) → iterator of reply tokens
+#  generate(prompt)      → completion text
+#  Model defaults come from OLLAMA_EMBED_MODEL / OLLAMA_CHAT_MODEL (settings Step 21)
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import threading
+from contextlib import contextmanager
+
+import httpx  # Transport used by the ollama package — exposes pool limits + timeouts
+from django.conf import settings
+from ollama import Client
+
+
+_client = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, settings.OLLAMA_MAX_CONCURRENCY))
+
+
+# ================================================================
+#  Helper 1: get_client
+#  Process-wide ollama.Client — httpx.Client is thread-safe, so all
+#  request threads and embedding worker threads share its pool
+# ================================================================
+def get_client() -> Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Client(
+                    host=settings.OLLAMA_HOST,
+                    timeout=httpx.Timeout(settings.OLLAMA_TIMEOUT, connect=settings.OLLAMA_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+# ================================================================
+#  Helper 2: _slot
+#  Holds one of the OLLAMA_MAX_CONCURRENCY slots for the duration of a request
+# ================================================================
+@contextmanager
+def _slot():
+    _slots.acquire()
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+# ================================================================
+#  Function 1: embed
+#  texts → list[list[float]], same order as the input
+# ================================================================
+def embed(texts, model=None):
+    with _slot():
+        resp = get_client().embed(model=model or settings.OLLAMA_EMBED_MODEL, input=list(texts))
+    return resp["embeddings"]
+
+
+# ================================================================
+#  Function 2: chat
+#  messages → [{"role": ..., "content": ...}, ...]
+#  options  → Ollama model options, e.g. {"temperature": 0}
+#  fmt      → "json" (or a JSON schema) to constrain the output format
+# ================================================================
+def chat(messages, model=None, options=None, fmt=None) -> str:
+    with _slot():
+        resp = get_client().chat(
+            model=model or settings.OLLAMA_CHAT_MODEL,
+            messages=messages,
+            options=options,
+            format=fmt,
+        )
+    return resp["message"]["content"]
+
+
+# ================================================================
+#  Function 3: chat_stream
+#  Yields reply tokens as they are generated
+#  The slot is held until the stream is exhausted or closed
+#  (a disconnected SSE client closes the generator → slot released)
+# ================================================================
+def chat_stream(messages, model=None, options=None):
+    with _slot():
+        for part in get_client().chat(
+            model=model or settings.OLLAMA_CHAT_MODEL,
+            messages=messages,
+            options=options,
+            stream=True,
+        ):
+            token = part["message"]["content"]
+            if token:
+                yield token
+
+
+# ================================================================
+#  Function 4: generate
+#  Plain prompt → completion text (no chat template roles)
+# ================================================================
+def generate(prompt: str, model=None, options=None) -> str:
+    with _slot():
+        resp = get_client().generate(
+            model=model or settings.OLLAMA_CHAT_MODEL,
+            prompt=prompt,
+            options=options,
+        )
+    return resp["response"]
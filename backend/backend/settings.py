@@ -13,7 +13,7 @@
 #  Step 7  → Media files (local dev fallback)
 #  Step 8  → Email (SMTP via Gmail)
 #  Step 9  → Google OAuth (Calendar integration)
-#  Step 10 → MinIO / S3 file storage
+#  Step 10 → MinIO / S3 file storage (shared client, presigned URL cache)
 #  Step 11 → Custom User model
 #  Step 12 → Templates
 #  Step 13 → Database (PostgreSQL + pgvector)
@@ -21,6 +21,12 @@
 #  Step 15 → Internationalisation & timezone
 #  Step 16 → Static files
 #  Step 17 → Auth redirect URLs
+#  Step 18 → RAG retrieval tuning (pgvector ANN search)
+#  Step 19 → Embedding pipeline tuning (batching, concurrency)
+#  Step 20 → RAG caches (query embeddings, answers)
+#  Step 21 → Ollama client (host, models, connection pool, concurrency)
+#  Step 22 → RAG prompt context packing (token budget, overlap dedup)
+#  Step 23 → RAG chat sessions (server-side history, rolling summary)
 # ===============================================================
 
 
@@ -72,6 +78,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',     # Session storage (used by login() to persist auth state)
     'django.contrib.messages',     # Flash messages framework
     'django.contrib.staticfiles',  # Collects and serves static assets
+    'django.contrib.postgres',     # Full-text search fields/lookups (DocumentChunk.search_vector)
 
     # ---------------- Your Apps ----------------
     'authapp',       # Custom User model, registration, login, OTP, RBAC user management
@@ -239,6 +246,44 @@ AWS_S3_REGION_NAME       = os.getenv("MINIO_REGION", "us-east-1")  # MinIO ignor
 AWS_DEFAULT_ACL          = None         # Don't apply any ACL — bucket policy controls access
 AWS_S3_ADDRESSING_STYLE  = "path"       # Path-style URLs (http://minio:9000/bucket/key) — required for MinIO
 AWS_QUERYSTRING_AUTH     = True         # Presigned URLs include auth query params (not headers)
+AWS_QUERYSTRING_EXPIRE   = int(os.getenv("AWS_QUERYSTRING_EXPIRE", 3600))  # Lifetime of FieldFile.url presigned URLs (seconds)
+
+# Shared S3 client + presigned URL cache (backend/storage.py)
+# S3_MAX_POOL_CONNECTIONS        → HTTP connections kept open by the one per-process boto3 client
+# S3_PRESIGNED_URL_CACHE_SIZE    → URLs kept per process (LRU)
+# S3_PRESIGNED_URL_CACHE_REUSE   → share of a URL's lifetime it is served from the cache
+#                                  (0.8 → a cached URL always has ≥ 20% of its validity left)
+# S3_PRESIGNED_URL_CACHE_BACKEND → optional Django CACHES alias shared by all workers ("" = per process)
+S3_MAX_POOL_CONNECTIONS        = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 32))
+S3_PRESIGNED_URL_CACHE_SIZE    = int(os.getenv("S3_PRESIGNED_URL_CACHE_SIZE", 4096))
+S3_PRESIGNED_URL_CACHE_REUSE   = float(os.getenv("S3_PRESIGNED_URL_CACHE_REUSE", 0.8))
+S3_PRESIGNED_URL_CACHE_BACKEND = os.getenv("S3_PRESIGNED_URL_CACHE_BACKEND", "")
+
+# Bulk uploads (POST /bulk_upload_files/, file_upload/bulk_upload.py)
+# FILE_BULK_UPLOAD_MAX_FILES   → files accepted per request (also raises Django's own
+#                                DATA_UPLOAD_MAX_NUMBER_FILES limit, default 100, to match)
+# FILE_BULK_UPLOAD_CONCURRENCY → MinIO PUTs in flight at once per request
+FILE_BULK_UPLOAD_MAX_FILES   = int(os.getenv("FILE_BULK_UPLOAD_MAX_FILES", 200))
+FILE_BULK_UPLOAD_CONCURRENCY = int(os.getenv("FILE_BULK_UPLOAD_CONCURRENCY", 8))
+DATA_UPLOAD_MAX_NUMBER_FILES = FILE_BULK_UPLOAD_MAX_FILES
+
+# Direct browser → MinIO uploads (POST /presigned_upload/ + /complete_upload/, file_upload/direct_upload.py)
+# FILE_DIRECT_UPLOAD_MAX_BYTES   → largest file a client may announce
+# FILE_PRESIGNED_UPLOAD_EXPIRY   → seconds the presigned PUT / part URLs stay valid
+# FILE_PRESIGNED_COMPLETE_GRACE  → extra seconds the upload_token is accepted by complete_upload
+# FILE_MULTIPART_THRESHOLD       → files of at least this size use an S3 multipart upload
+# FILE_MULTIPART_PART_SIZE       → bytes per part (raised automatically to stay under 10,000 parts)
+FILE_DIRECT_UPLOAD_MAX_BYTES  = int(os.getenv("FILE_DIRECT_UPLOAD_MAX_BYTES", 5 * 1024 ** 3))
+FILE_PRESIGNED_UPLOAD_EXPIRY  = int(os.getenv("FILE_PRESIGNED_UPLOAD_EXPIRY", 3600))
+FILE_PRESIGNED_COMPLETE_GRACE = int(os.getenv("FILE_PRESIGNED_COMPLETE_GRACE", 3600))
+FILE_MULTIPART_THRESHOLD      = int(os.getenv("FILE_MULTIPART_THRESHOLD", 64 * 1024 * 1024))
+FILE_MULTIPART_PART_SIZE      = int(os.getenv("FILE_MULTIPART_PART_SIZE", 16 * 1024 * 1024))
+
+# File listing (GET /list_files/?limit=&cursor=, file_upload/pagination.py)
+# FILE_LIST_PAGE_SIZE     → rows per keyset page when only a cursor is given
+# FILE_LIST_MAX_PAGE_SIZE → upper bound for the client's limit
+FILE_LIST_PAGE_SIZE     = int(os.getenv("FILE_LIST_PAGE_SIZE", 50))
+FILE_LIST_MAX_PAGE_SIZE = int(os.getenv("FILE_LIST_MAX_PAGE_SIZE", 200))
 
 
 # ================================================================
@@ -342,4 +387,220 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ================================================================
 LOGIN_URL = '/accounts/login'          # Where @login_required redirects unauthenticated users
 LOGIN_REDIRECT_URL = '/authapp/'       # Where Django redirects after a successful admin login
-LOGOUT_REDIRECT_URL = '/authapp/'      # Where Django redirects after logout
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/authapp/'      # Where Django redirects after logout
+
+# ================================================================
+#  Step 18: RAG Retrieval Tuning (pgvector)
+#  DocumentChunk.embedding has an HNSW cosine index
+#  These values are applied per query with SET LOCAL (see file_upload/retrieval.py)
+#
+#  RAG_HNSW_EF_SEARCH     → HNSW candidate list size (pgvector default 40)
+#                           Higher = better recall, slower queries
+#  RAG_IVFFLAT_PROBES     → lists scanned if an IVFFlat index is used instead
+#  RAG_HNSW_ITERATIVE_SCAN → "relaxed_order" / "strict_order" on pgvector >= 0.8
+#                           Keeps scanning when the tenant filter removes many candidates
+#                           Leave empty on older pgvector versions
+# ================================================================
+RAG_HNSW_EF_SEARCH      = int(os.getenv("RAG_HNSW_EF_SEARCH", 40))
+RAG_IVFFLAT_PROBES      = int(os.getenv("RAG_IVFFLAT_PROBES", 0))
+RAG_HNSW_ITERATIVE_SCAN = os.getenv("RAG_HNSW_ITERATIVE_SCAN", "")
+
+# Retrieval mode for rag_chat / doc_chat
+# "vector" → embedding similarity only
+# "hybrid" → embedding similarity + full-text search, merged with reciprocal rank fusion
+# RAG_HYBRID_CANDIDATES → rows taken from each leg before fusion
+# RAG_HYBRID_RRF_K      → RRF damping constant (60 is the value from the original RRF paper)
+RAG_RETRIEVAL_MODE    = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", 40))
+RAG_HYBRID_RRF_K      = int(os.getenv("RAG_HYBRID_RRF_K", 60))
+
+# Compact ANN indexes (halfvec / binary expression HNSW indexes on DocumentChunk.embedding)
+# RAG_VECTOR_QUANTIZATION          → "none" (float32 HNSW), "halfvec" or "binary"
+# RAG_QUANTIZED_RERANK_CANDIDATES  → coarse candidates re-ranked with the exact float32 distance
+# Only the compact index of the configured mode is built (none for "none"); after
+# changing it run `python manage.py sync_vector_indexes` (file_upload/vector_indexes.py)
+# Check recall@10 on real data with `python manage.py eval_vector_recall --group <id>`
+RAG_VECTOR_QUANTIZATION         = os.getenv("RAG_VECTOR_QUANTIZATION", "none")
+RAG_QUANTIZED_RERANK_CANDIDATES = int(os.getenv("RAG_QUANTIZED_RERANK_CANDIDATES", 100))
+
+# In-process NumPy index for small tenants (file_upload/memory_index.py)
+# RAG_RETRIEVAL_ENGINE → "postgres" or "memory"; "memory" serves group-wide
+#                        vector-only searches (RAG_RETRIEVAL_MODE="vector") from RAM
+# RAG_MEMORY_INDEX_MAX_CHUNKS → groups larger than this always use Postgres
+# RAG_MEMORY_INDEX_MAX_BYTES  → LRU cap across all loaded groups, per process
+RAG_RETRIEVAL_ENGINE        = os.getenv("RAG_RETRIEVAL_ENGINE", "postgres")
+RAG_MEMORY_INDEX_MAX_CHUNKS = int(os.getenv("RAG_MEMORY_INDEX_MAX_CHUNKS", 20000))
+RAG_MEMORY_INDEX_MAX_BYTES  = int(os.getenv("RAG_MEMORY_INDEX_MAX_BYTES", 256 * 1024 * 1024))
+
+# Memory-mapped .npy snapshots of the memory index (file_upload/vector_snapshots.py)
+# RAG_VECTOR_SNAPSHOT_DIR         → one sub-directory per group ("" = disabled)
+#                                   workers map every snapshot at startup, so share it between them
+# RAG_VECTOR_SNAPSHOT_IVF_LISTS   → k-means lists written by `manage.py build_vector_snapshots`
+#                                   (0 = flat; needs scikit-learn)
+# RAG_VECTOR_SNAPSHOT_IVF_PROBES  → lists scanned per query when a snapshot has IVF lists
+# RAG_VECTOR_SNAPSHOT_WRITE_ASYNC → write memory-index loads back on a background thread
+#                                   (False = inline, inside the search request)
+RAG_VECTOR_SNAPSHOT_DIR         = os.getenv("RAG_VECTOR_SNAPSHOT_DIR", "")
+RAG_VECTOR_SNAPSHOT_IVF_LISTS   = int(os.getenv("RAG_VECTOR_SNAPSHOT_IVF_LISTS", 0))
+RAG_VECTOR_SNAPSHOT_IVF_PROBES  = int(os.getenv("RAG_VECTOR_SNAPSHOT_IVF_PROBES", 4))
+RAG_VECTOR_SNAPSHOT_WRITE_ASYNC = os.getenv("RAG_VECTOR_SNAPSHOT_WRITE_ASYNC", "True") == "True"
+
+
+# ================================================================
+#  Step 19: Embedding Pipeline Tuning
+#  Used by file_upload/embedding_file.py when documents are embedded
+#
+#  RAG_EMBED_BATCH_SIZE  → chunks sent per Ollama embed() call
+#  RAG_EMBED_CONCURRENCY → max embed() batches in flight at the same time
+# ================================================================
+RAG_EMBED_BATCH_SIZE  = int(os.getenv("RAG_EMBED_BATCH_SIZE", 32))
+RAG_EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", 4))
+
+# Embedding backend (file_upload/embedders.py)
+# RAG_EMBEDDING_BACKEND → "ollama" (HTTP, OLLAMA_EMBED_MODEL) or "local" (in-process
+#                         sentence-transformers on CPU; needs sentence-transformers + torch)
+# RAG_LOCAL_EMBED_THREADS  → torch CPU threads for the local model (0 = torch default)
+# RAG_LOCAL_EMBED_QUANTIZE → int8 dynamic quantization of the local model
+# Compare both with `python manage.py bench_embeddings`
+# Switching backend re-embeds documents on their next embed (different model id)
+RAG_EMBEDDING_BACKEND      = os.getenv("RAG_EMBEDDING_BACKEND", "ollama")
+RAG_LOCAL_EMBED_MODEL      = os.getenv("RAG_LOCAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+RAG_LOCAL_EMBED_THREADS    = int(os.getenv("RAG_LOCAL_EMBED_THREADS", 0))
+RAG_LOCAL_EMBED_BATCH_SIZE = int(os.getenv("RAG_LOCAL_EMBED_BATCH_SIZE", 64))
+RAG_LOCAL_EMBED_QUANTIZE   = os.getenv("RAG_LOCAL_EMBED_QUANTIZE", "False") == "True"
+
+# Background embedding jobs (`python manage.py embedding_worker`)
+# RAG_EMBED_JOB_STALE_SECONDS → a running job with no progress for this long is re-claimed
+# RAG_EMBED_JOB_MAX_ATTEMPTS  → stop re-claiming a job after this many tries (it is marked failed)
+# RAG_EMBED_JOB_HEARTBEAT_SECONDS → how often a running job's heartbeat is refreshed
+#                                   (keep well below RAG_EMBED_JOB_STALE_SECONDS)
+RAG_EMBED_JOB_STALE_SECONDS     = int(os.getenv("RAG_EMBED_JOB_STALE_SECONDS", 600))
+RAG_EMBED_JOB_MAX_ATTEMPTS      = int(os.getenv("RAG_EMBED_JOB_MAX_ATTEMPTS", 3))
+RAG_EMBED_JOB_HEARTBEAT_SECONDS = float(os.getenv("RAG_EMBED_JOB_HEARTBEAT_SECONDS", 30))
+
+# Content-addressed embedding cache (EmbeddingCache table)
+# Chunks whose (model, sha256(text)) is already cached skip the Ollama call
+RAG_EMBED_CACHE_ENABLED = os.getenv("RAG_EMBED_CACHE_ENABLED", "True") == "True"
+
+# Incremental re-embedding: diff new chunks against stored ones by content hash
+# False → always delete every chunk of the document and re-insert
+RAG_INCREMENTAL_REEMBED = os.getenv("RAG_INCREMENTAL_REEMBED", "True") == "True"
+
+# Text extraction buffers (file_upload/embedding_file.open_document_buffer)
+# Files up to RAG_EXTRACT_MAX_MEMORY_BYTES are parsed fully in memory;
+# larger ones spill to a temp file on local disk
+# RAG_EXTRACT_RANGE_BYTES → size of each ranged GET against MinIO
+RAG_EXTRACT_MAX_MEMORY_BYTES = int(os.getenv("RAG_EXTRACT_MAX_MEMORY_BYTES", 64 * 1024 * 1024))
+RAG_EXTRACT_RANGE_BYTES      = int(os.getenv("RAG_EXTRACT_RANGE_BYTES", 8 * 1024 * 1024))
+
+# Parallel PDF text extraction (file_upload/pdf_extract.py)
+# RAG_PDF_EXTRACT_WORKERS    → process pool size; 1 keeps the serial path
+# RAG_PDF_PARALLEL_MIN_PAGES → PDFs shorter than this are always parsed serially
+#                              (pool start-up costs more than it saves on small files)
+# Compare both paths on a real file with `python manage.py bench_pdf_extract <file.pdf>`
+RAG_PDF_EXTRACT_WORKERS    = int(os.getenv("RAG_PDF_EXTRACT_WORKERS", 1))
+RAG_PDF_PARALLEL_MIN_PAGES = int(os.getenv("RAG_PDF_PARALLEL_MIN_PAGES", 64))
+
+# Bounded-memory streaming ingest (stream_embeddings_for_document)
+# Files of at least RAG_STREAMING_INGEST_MIN_BYTES are extracted page by page and
+# embedded + stored RAG_STREAM_BATCH_SIZE chunks at a time (searchable per batch);
+# the previous chunks are deleted when the file is done (0 disables streaming)
+RAG_STREAMING_INGEST_MIN_BYTES = int(os.getenv("RAG_STREAMING_INGEST_MIN_BYTES", 20 * 1024 * 1024))
+RAG_STREAM_BATCH_SIZE          = int(os.getenv("RAG_STREAM_BATCH_SIZE", 128))
+
+# DocumentChunk insert path (file_upload/bulk_load.py)
+# RAG_CHUNK_INSERT_METHOD    → "copy" (PostgreSQL COPY FROM STDIN) or "bulk_create"
+# RAG_CHUNK_COPY_BATCH_SIZE  → rows per COPY / bulk_create batch
+# Compare both with `python manage.py bench_chunk_insert --document <uuid>`
+RAG_CHUNK_INSERT_METHOD   = os.getenv("RAG_CHUNK_INSERT_METHOD", "copy")
+RAG_CHUNK_COPY_BATCH_SIZE = int(os.getenv("RAG_CHUNK_COPY_BATCH_SIZE", 1000))
+
+
+# ================================================================
+#  Step 20: RAG Caches
+#  In-process LRU caches in file_upload/caching.py
+#  *_BACKEND → optional name of a Django CACHES alias (e.g. a Redis cache)
+#              that backs the in-process LRU so entries are shared across
+#              worker processes; empty = process-local only
+#  Hit/miss counters: GET /file_upload/rag_cache_stats/ (staff only)
+# ================================================================
+
+# Query embeddings — key: (embedding model, normalized question)
+RAG_QUERY_EMBED_CACHE_SIZE    = int(os.getenv("RAG_QUERY_EMBED_CACHE_SIZE", 2048))
+RAG_QUERY_EMBED_CACHE_TTL     = int(os.getenv("RAG_QUERY_EMBED_CACHE_TTL", 3600))
+RAG_QUERY_EMBED_CACHE_BACKEND = os.getenv("RAG_QUERY_EMBED_CACHE_BACKEND", "")
+
+# Finished RAG answers — key: (group or document, corpus version, normalized question, history digest)
+# The corpus version is bumped on every embed/delete, so stale answers are never served;
+# the TTL only bounds how long unused entries linger
+RAG_ANSWER_CACHE_ENABLED = os.getenv("RAG_ANSWER_CACHE_ENABLED", "True") == "True"
+RAG_ANSWER_CACHE_SIZE    = int(os.getenv("RAG_ANSWER_CACHE_SIZE", 512))
+RAG_ANSWER_CACHE_TTL     = int(os.getenv("RAG_ANSWER_CACHE_TTL", 24 * 3600))
+RAG_ANSWER_CACHE_BACKEND = os.getenv("RAG_ANSWER_CACHE_BACKEND", "")
+
+# Semantic answer cache (file_upload/semantic_cache.py) — paraphrased rag_chat questions
+# RAG_SEMANTIC_CACHE_THRESHOLD   → minimum cosine similarity between the new and the
+#                                  cached question embedding (1.0 = identical)
+# RAG_SEMANTIC_CACHE_TTL         → seconds a stored answer may be reused (0 = until the corpus changes)
+# RAG_SEMANTIC_CACHE_MAX_ENTRIES → entries kept per group and corpus version (least recently used dropped)
+# Off by default: numbers and capitalised names must match between the two questions,
+# other identifiers (lower-case names, codes without digits) can still be confused
+RAG_SEMANTIC_CACHE_ENABLED     = os.getenv("RAG_SEMANTIC_CACHE_ENABLED", "False") == "True"
+RAG_SEMANTIC_CACHE_THRESHOLD   = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", 0.97))
+RAG_SEMANTIC_CACHE_TTL         = int(os.getenv("RAG_SEMANTIC_CACHE_TTL", 7 * 24 * 3600))
+RAG_SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("RAG_SEMANTIC_CACHE_MAX_ENTRIES", 500))
+
+
+# ================================================================
+#  Step 21: Ollama Client
+#  One process-wide client in backend/ollama_client.py is used by every
+#  LLM / embedding call (RAG, calendar command parser, email drafts)
+#
+#  OLLAMA_HOST        → Ollama server URL
+#  OLLAMA_EMBED_MODEL → embedding model — must output EMBEDDING_DIMENSIONS (384) floats
+#  OLLAMA_CHAT_MODEL  → generation model
+#  OLLAMA_TIMEOUT / OLLAMA_CONNECT_TIMEOUT → seconds per request / per TCP connect
+#  OLLAMA_MAX_CONNECTIONS → HTTP connection pool size (kept alive between requests)
+#  OLLAMA_MAX_CONCURRENCY → max in-flight Ollama requests per process; extra callers wait
+# ================================================================
+OLLAMA_HOST            = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_EMBED_MODEL     = os.getenv("OLLAMA_EMBED_MODEL", "all-minilm:l6-v2")
+OLLAMA_CHAT_MODEL      = os.getenv("OLLAMA_CHAT_MODEL", "llama3.2:3b")
+OLLAMA_TIMEOUT         = float(os.getenv("OLLAMA_TIMEOUT", 120))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 10))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", 4))
+
+
+# ================================================================
+#  Step 22: RAG Prompt Context Packing
+#  file_upload/context_packing.py — used by build_prompt() in file_upload/views.py
+#
+#  RAG_CONTEXT_PACKING          → False pastes every retrieved chunk verbatim
+#  RAG_CONTEXT_TOKEN_BUDGET     → max estimated tokens of document context per prompt
+#  RAG_CONTEXT_CHARS_PER_TOKEN  → token estimate = characters / this (≈4 for English text)
+#  RAG_CONTEXT_DEDUP_THRESHOLD  → word-shingle Jaccard at which two passages count as duplicates
+# ================================================================
+RAG_CONTEXT_PACKING         = os.getenv("RAG_CONTEXT_PACKING", "True") == "True"
+RAG_CONTEXT_TOKEN_BUDGET    = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", 1500))
+RAG_CONTEXT_CHARS_PER_TOKEN = float(os.getenv("RAG_CONTEXT_CHARS_PER_TOKEN", 4))
+RAG_CONTEXT_DEDUP_THRESHOLD = float(os.getenv("RAG_CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+
+# ================================================================
+#  Step 23: RAG Chat Sessions
+#  file_upload/chat_sessions.py — server-side history for rag_chat / doc_chat
+#
+#  RAG_CHAT_RECENT_TURNS         → turns sent verbatim; older ones only via the summary
+#                                  (2 = the previous question + answer)
+#  RAG_CHAT_HISTORY_TOKEN_BUDGET → cap on the verbatim turns while the summary lags
+#                                  behind (oldest left out first; 0 = no cap)
+#  RAG_CHAT_SUMMARY_MAX_WORDS    → length cap asked of the LLM for the rolling summary
+#  RAG_CHAT_SUMMARY_ASYNC        → summarize on a background thread (False = inline, after commit)
+#  RAG_CHAT_SUMMARY_WORKERS      → background summary threads per process
+# ================================================================
+RAG_CHAT_RECENT_TURNS         = int(os.getenv("RAG_CHAT_RECENT_TURNS", 2))
+RAG_CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("RAG_CHAT_HISTORY_TOKEN_BUDGET", 1500))
+RAG_CHAT_SUMMARY_MAX_WORDS    = int(os.getenv("RAG_CHAT_SUMMARY_MAX_WORDS", 150))
+RAG_CHAT_SUMMARY_ASYNC        = os.getenv("RAG_CHAT_SUMMARY_ASYNC", "True") == "True"
+RAG_CHAT_SUMMARY_WORKERS      = int(os.getenv("RAG_CHAT_SUMMARY_WORKERS", 1))
@@ -0,0 +1,121 @@
+# ===============================================================
+#  backend/storage.py
+#  Shared MinIO / S3 access for the whole project
+#
+#  Before: preview_file built a new boto3 client per request, and every
+#  serializer row (documents, avatars on the task board, user lists)
+#  re-signed its presigned URL — HMAC work for each item of each list
+#  Now:
+#  - get_s3_client()  → ONE boto3 client per process (thread-safe, pooled
+#                       connections, same MinIO options as django-storages)
+#  - presigned_url()  → GET URLs cached per (bucket, key, lifetime) for
+#                       S3_PRESIGNED_URL_CACHE_REUSE of their validity, so a
+#                       cached URL always has time left when the client uses it
+#  - file_url()       → drop-in for FieldFile.url on S3-backed file fields
+#
+#  Cache counters show up as "presigned_url" in GET /file_upload/rag_cache_stats/
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import threading
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from file_upload.caching import TTLCache
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# One URL cache per URL lifetime (TTLCache has a single TTL) — normally just
+# "presigned_url" for AWS_QUERYSTRING_EXPIRE plus preview_file's shorter one
+_url_caches = {}
+_url_caches_lock = threading.Lock()
+
+
+# ================================================================
+#  Helper 1: get_s3_client
+#  Process-wide boto3 client — boto3 clients are thread-safe, so request
+#  threads and upload thread pools share its connection pool
+# ================================================================
+def get_s3_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    "s3",
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_S3_REGION_NAME,
+                    verify=settings.AWS_S3_VERIFY,
+                    config=Config(
+                        signature_version="s3v4",  # Required for MinIO
+                        s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+# ================================================================
+#  Helper 2: url_cache
+#  Cache for URLs valid `expires` seconds; entries live for
+#  S3_PRESIGNED_URL_CACHE_REUSE of that, so every URL handed out has at least
+#  the remaining share of its lifetime left
+# ================================================================
+def url_cache(expires: int) -> TTLCache:
+    cache = _url_caches.get(expires)
+    if cache is None:
+        with _url_caches_lock:
+            cache = _url_caches.get(expires)
+            if cache is None:
+                name = "presigned_url" if expires == settings.AWS_QUERYSTRING_EXPIRE else f"presigned_url_{expires}s"
+                cache = TTLCache(
+                    name,
+                    maxsize=settings.S3_PRESIGNED_URL_CACHE_SIZE,
+                    ttl=int(expires * settings.S3_PRESIGNED_URL_CACHE_REUSE),
+                    backend_alias=settings.S3_PRESIGNED_URL_CACHE_BACKEND,
+                )
+                _url_caches[expires] = cache
+    return cache
+
+
+# ================================================================
+#  Helper 3: presigned_url
+#  Cached presigned GET URL of one object
+#  expires → URL lifetime in seconds (default AWS_QUERYSTRING_EXPIRE, as FieldFile.url)
+# ================================================================
+def presigned_url(key: str, expires=None, bucket=None) -> str:
+    expires = int(expires or settings.AWS_QUERYSTRING_EXPIRE)
+    bucket = bucket or settings.AWS_STORAGE_BUCKET_NAME
+    return url_cache(expires).get_or_set(
+        (bucket, key),
+        lambda: get_s3_client().generate_presigned_url(
+            "get_object",
+            Params={"Bucket": bucket, "Key": key},
+            ExpiresIn=expires,
+        ),
+    )
+
+
+# ================================================================
+#  Helper 4: file_url
+#  FieldFile → URL, like `fieldfile.url`, but signed through the cache when
+#  the field lives on a query-string-authenticated S3Boto3Storage
+#  Returns None for an empty field
+# ================================================================
+def file_url(fieldfile):
+    if not fieldfile:
+        return None
+    storage = fieldfile.storage
+    if isinstance(storage, S3Boto3Storage) and storage.querystring_auth and not storage.custom_domain:
+        key = storage._normalize_name(clean_name(fieldfile.name))
+        return presigned_url(key, expires=storage.querystring_expire, bucket=storage.bucket_name)
+    return fieldfile.url
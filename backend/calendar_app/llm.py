@@ -21,7 +21,7 @@ from pydantic import BaseModel, Field     # Schema definition + validation
 from dateutil import parser as dateparser  # Parses many datetime string formats flexibly
 from dateutil import tz                    # Timezone-aware datetime handling
 
-from langchain_ollama import ChatOllama   # LangChain wrapper for local Ollama models
+from backend import ollama_client          # Shared, pooled Ollama client (keep-alive + concurrency cap)
 
 # Default timezone for the system — all events use this unless the user specifies another
 DEFAULT_TZ = "Asia/Kathmandu"
@@ -134,37 +134,35 @@ def extract_command(prompt: str) -> CalendarCommand:
         f"- Current local datetime is {now.isoformat()} and local timezone is {DEFAULT_TZ}.\n"
     )
 
-    # ---------------- Step 2: Initialize LLaMA ----------------
-    # temperature=0 → deterministic output, reduces hallucination in structured JSON tasks
-    model = ChatOllama(model="llama3.2:3b", temperature=0)
-
-    # ---------------- Step 3: Build the JSON Schema Hint ----------------
+    # ---------------- Step 2: Build the JSON Schema Hint ----------------
     # Providing the Pydantic schema directly in the prompt helps LLaMA
     # output JSON that matches the expected field names and types
     schema = CalendarCommand.model_json_schema()
 
-    # ---------------- Step 4: Invoke LLaMA ----------------
+    # ---------------- Step 3: Invoke LLaMA ----------------
     # Three-message format:
     #  [system] → parsing rules + current time context
     #  [user]   → the actual user prompt
     #  [user]   → the Pydantic JSON schema for LLaMA to follow
-    resp = model.invoke(
+    # temperature=0 → deterministic output, reduces hallucination in structured JSON tasks
+    resp = ollama_client.chat(
         [
             {"role": "system", "content": system},
             {"role": "user", "content": prompt},
             {"role": "user", "content": "JSON_SCHEMA:\n" + json.dumps(schema)},
-        ]
+        ],
+        options={"temperature": 0},
     )
 
-    raw = resp.content.strip()  # LLaMA's raw response — should be valid JSON
+    raw = resp.strip()  # LLaMA's raw response — should be valid JSON
 
-    # ---------------- Step 5: Parse + Validate ----------------
+    # ---------------- Step 4: Parse + Validate ----------------
     # json.loads() raises JSONDecodeError if LLaMA returns non-JSON (caught in the view)
     # model_validate() enforces the CalendarCommand schema and raises ValidationError if invalid
     data = json.loads(raw)
     cmd = CalendarCommand.model_validate(data)
 
-    # ---------------- Step 6: Normalize Datetimes ----------------
+    # ---------------- Step 5: Normalize Datetimes ----------------
     tz_name = cmd.timeZone or DEFAULT_TZ
 
     # Ensure both datetime strings are fully timezone-aware ISO strings
@@ -173,7 +171,7 @@ def extract_command(prompt: str) -> CalendarCommand:
     if cmd.end_iso:
         cmd.end_iso = _ensure_tz_iso(cmd.end_iso, tz_name)
 
-    # ---------------- Step 7: Fill Default End Time ----------------
+    # ---------------- Step 6: Fill Default End Time ----------------
     # Google Calendar API rejects events without an end time
     # If start is given but end is missing → auto-set end = start + 1 hour
     if cmd.action in ("create", "update"):
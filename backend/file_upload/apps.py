@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class FileUploadConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'file_upload'
+
+    def ready(self):
+        # Map the on-disk vector snapshots once per worker → first searches skip Postgres
+        if settings.RAG_RETRIEVAL_ENGINE == "memory" and settings.RAG_VECTOR_SNAPSHOT_DIR:
+            from .memory_index import memory_index
+            memory_index.warm_from_snapshots()
@@ -0,0 +1,145 @@
+# ===============================================================
+#  file_upload/bulk_load.py
+#  PostgreSQL COPY loader for DocumentChunk rows
+#
+#  bulk_create() sends parameterized INSERTs, adapting every float of every
+#  vector through the driver. COPY ... FROM STDIN streams pre-formatted rows in
+#  one protocol message per batch instead — much cheaper for large ingests
+#  and full re-embedding backfills
+#
+#  FLOW OVERVIEW:
+#  Step 1 → Fill defaults bulk_create() would normally apply (auto_now timestamps)
+#  Step 2 → Format each row in COPY text format (vectors as pgvector text '[x,y,...]')
+#  Step 3 → Send the rows batch by batch through the raw driver cursor
+#           (psycopg2 copy_expert, or psycopg 3 cursor.copy)
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import io
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from pgvector import Vector  # Formats vectors in pgvector's text representation
+
+from .models import DocumentChunk
+
+
+# Column order of the COPY statement — every concrete, non-generated DocumentChunk column
+COPY_COLUMNS = [
+    "id",
+    "document_id",
+    "follow_group",
+    "chunk_index",
+    "text",
+    "content_hash",
+    "metadata",
+    "embedding",
+    "embedding_model",
+    "embedding_created_at",
+    "ingest_run",
+    "created_at",
+    "updated_at",
+]
+
+
+# ================================================================
+#  Helper: _copy_text
+#  Encodes one value for COPY text format
+#  NULL → \N ; backslash, tab, newline and carriage return are escaped
+# ================================================================
+def _copy_text(value) -> str:
+    if value is None:
+        return "\\N"
+    s = str(value)
+    return (
+        s.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+# ================================================================
+#  Helper: _row_values
+#  Extracts the COPY_COLUMNS values of one DocumentChunk instance
+# ================================================================
+def _row_values(obj: DocumentChunk, now):
+    return [
+        obj.id,
+        obj.document_id,
+        obj.follow_group,
+        obj.chunk_index,
+        obj.text,
+        obj.content_hash,
+        json.dumps(obj.metadata) if obj.metadata is not None else None,
+        Vector(obj.embedding).to_text() if obj.embedding is not None else None,
+        obj.embedding_model,
+        obj.embedding_created_at.isoformat() if obj.embedding_created_at else None,
+        obj.ingest_run,
+        (obj.created_at or now).isoformat(),
+        now.isoformat(),  # auto_now — bulk paths never keep a stale updated_at
+    ]
+
+
+# ================================================================
+#  Helper: _copy_payload
+#  Builds one batch as a COPY text-format buffer
+# ================================================================
+def _copy_payload(objs, now) -> io.StringIO:
+    buf = io.StringIO()
+    for obj in objs:
+        buf.write("\t".join(_copy_text(v) for v in _row_values(obj, now)))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+
+# ================================================================
+#  Function 1: copy_chunks
+#  Inserts DocumentChunk instances with COPY, batch_size rows per COPY
+#  Runs on the current connection, so it joins any surrounding transaction.atomic()
+#  Returns the number of rows written
+# ================================================================
+def copy_chunks(objs, batch_size=None) -> int:
+    objs = list(objs)
+    if not objs:
+        return 0
+
+    batch_size = batch_size or settings.RAG_CHUNK_COPY_BATCH_SIZE
+    now = timezone.now()
+    sql = (
+        f'COPY {DocumentChunk._meta.db_table} ({", ".join(COPY_COLUMNS)}) '
+        "FROM STDIN WITH (FORMAT text)"
+    )
+
+    with connection.cursor() as cursor:
+        raw = cursor.cursor  # Underlying driver cursor — COPY is not part of the DB-API
+        for i in range(0, len(objs), batch_size):
+            payload = _copy_payload(objs[i:i + batch_size], now)
+            if hasattr(raw, "copy_expert"):
+                # psycopg2
+                raw.copy_expert(sql, payload)
+            else:
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(payload.getvalue())
+
+    return len(objs)
+
+
+# ================================================================
+#  Function 2: insert_chunks
+#  Single entry point used by the embedding pipeline
+#  RAG_CHUNK_INSERT_METHOD = "copy"        → copy_chunks() on PostgreSQL
+#                            "bulk_create" → Django bulk_create()
+# ================================================================
+def insert_chunks(objs) -> int:
+    objs = list(objs)
+    if settings.RAG_CHUNK_INSERT_METHOD == "copy" and connection.vendor == "postgresql":
+        return copy_chunks(objs)
+
+    DocumentChunk.objects.bulk_create(objs, batch_size=settings.RAG_CHUNK_COPY_BATCH_SIZE)
+    return len(objs)
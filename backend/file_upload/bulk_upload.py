@@ -0,0 +1,147 @@
+# ===============================================================
+#  file_upload/bulk_upload.py
+#  Many files in one request (bulk_upload_files view)
+#
+#  upload_file saves one Document per request and its FileField writes the
+#  object to MinIO synchronously. Here the writes overlap instead:
+#
+#  FLOW OVERVIEW:
+#  Step 1 → Validate every file (empty files are rejected like DocumentSerializer does)
+#  Step 2 → PUT the valid files to MinIO through a bounded thread pool
+#           (FILE_BULK_UPLOAD_CONCURRENCY writes in flight)
+#  Step 3 → One bulk_create() for the Document rows of every stored file
+#  Step 4 → Optionally queue one EmbeddingJob per new Document (one INSERT)
+#
+#  Results come back per file, in request order — one bad file never fails the rest
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import mimetypes
+import os
+import pathlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+
+from .models import Document, s3_storage
+from .jobs import enqueue_embedding_jobs
+from .utils import get_group_id
+
+
+# ================================================================
+#  Helper: object_key
+#  "uploads/<random>/<filename>" — the random directory keeps two uploads of
+#  the same filename from overwriting each other — s3_storage overwrites
+#  (AWS_S3_FILE_OVERWRITE defaults to True), so a plain "uploads/<filename>"
+#  key would be shared by every file of that name
+#  Keys over the field's max_length lose the end of the file's basename, never
+#  its extension (same rule as Django's Storage.get_available_name); raises
+#  SuspiciousFileOperation when not even one character of it fits
+#  Also used by direct_upload.py
+# ================================================================
+def object_key(filename: str) -> str:
+    field = Document._meta.get_field("file")
+    key = field.generate_filename(None, f"{uuid.uuid4().hex}/{filename}")
+    truncation = len(key) - field.max_length
+    if truncation <= 0:
+        return key
+
+    dir_name, file_name = os.path.split(key)
+    file_ext = "".join(pathlib.PurePath(file_name).suffixes)
+    file_root = file_name.removesuffix(file_ext)[:-truncation]
+    if not file_root:
+        raise SuspiciousFileOperation(f'Filename "{filename}" is too long to store.')
+    return os.path.join(dir_name, file_root + file_ext)
+
+
+# ================================================================
+#  Helper: _store_file
+#  Writes one upload to MinIO under a fresh object_key() — a failed batch
+#  only ever deletes objects it wrote itself
+#  Returns (storage key, None) or (None, error message)
+# ================================================================
+def _store_file(uploaded):
+    field = Document._meta.get_field("file")
+    try:
+        return s3_storage.save(object_key(uploaded.name), uploaded, max_length=field.max_length), None
+    except Exception as e:
+        return None, f"Upload failed: {e}"
+
+
+# ================================================================
+#  Helper: build_document
+#  Unsaved Document for an object already in the bucket
+#  bulk_create() skips Document.save(), so its metadata rules are applied here:
+#  original_filename = the client's filename, mime_type guessed from the extension
+# ================================================================
+def build_document(user, group_id, key, filename, size) -> Document:
+    return Document(
+        user=user,
+        follow_group=group_id,
+        file=key,
+        original_filename=filename[:255],
+        mime_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        file_size=size,
+    )
+
+
+# ================================================================
+#  Function 1: upload_documents
+#  files → list of UploadedFile (request.FILES.getlist("files"))
+#  embed → also queue an embedding job for every created Document
+#  Returns list[dict] per file:
+#   {"filename", "document": Document | None, "job": EmbeddingJob | None, "error": str | None}
+# ================================================================
+def upload_documents(user, files, embed=False) -> list[dict]:
+    group_id = get_group_id(user)
+    results = [{"filename": f.name, "document": None, "job": None, "error": None} for f in files]
+
+    # ---------------- Step 1: Validate ----------------
+    pending = []
+    for result, uploaded in zip(results, files):
+        if not uploaded.name:
+            result["error"] = "No filename was submitted."
+        elif not uploaded.size:
+            result["error"] = "The submitted file is empty."
+        else:
+            pending.append((result, uploaded))
+
+    # ---------------- Step 2: Parallel MinIO Writes ----------------
+    # boto3 clients are thread-safe; S3Boto3Storage keeps one connection per thread
+    stored = []
+    if pending:
+        workers = min(settings.FILE_BULK_UPLOAD_CONCURRENCY, len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(lambda item: _store_file(item[1]), pending))
+        for (result, uploaded), (key, error) in zip(pending, outcomes):
+            if error:
+                result["error"] = error
+            else:
+                stored.append((result, uploaded, key))
+
+    if not stored:
+        return results
+
+    # ---------------- Step 3: One INSERT for All Documents ----------------
+    docs = [
+        build_document(user, group_id, key, uploaded.name, uploaded.size)
+        for _result, uploaded, key in stored
+    ]
+    try:
+        with transaction.atomic():
+            Document.objects.bulk_create(docs)
+            jobs = enqueue_embedding_jobs(docs, user=user) if embed else [None] * len(docs)
+    except Exception:
+        # Rows were not written → do not leave orphaned objects in the bucket
+        for _result, _uploaded, key in stored:
+            s3_storage.delete(key)
+        raise
+
+    for (result, _uploaded, _key), doc, job in zip(stored, docs, jobs):
+        result["document"] = doc
+        result["job"] = job
+    return results
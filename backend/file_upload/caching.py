@@ -0,0 +1,180 @@
+# ===============================================================
+#  file_upload/caching.py
+#  In-process caches used by the RAG endpoints
+#
+#  TTLCache → thread-safe, size-bounded LRU with per-entry expiry
+#             optionally backed by a Django cache alias (e.g. Redis/Memcached)
+#             so several worker processes can share entries
+#  Every TTLCache registers itself by name → all_cache_stats() reports
+#  hits / misses / hit_rate / size for each one
+#
+#  Caches defined here:
+#  - query_embedding_cache → (model, normalized question) → query vector
+#  - answer_cache          → (scope, corpus version, normalized question, history digest)
+#                            → {"answer", "chunks"} of a finished RAG answer
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Every TTLCache created in this process, by name — read by all_cache_stats()
+_registry = {}
+
+# Sentinel for "not in cache" (None can be a legitimate cached value)
+MISSING = object()
+
+
+# ================================================================
+#  Helper: normalize_question
+#  Case-folds and collapses whitespace so trivially different spellings
+#  of the same question ("What is X?" vs "what  is x?") share one cache key
+#  all-MiniLM-L6-v2 is an uncased model, so this does not change its output
+# ================================================================
+def normalize_question(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+# ================================================================
+#  Helper: history_digest
+#  Stable sha256 of the chat history sent with a question — the same question
+#  in a different conversation gets a different prompt, so it must not share
+#  a cached answer
+# ================================================================
+def history_digest(history) -> str:
+    payload = json.dumps(history or [], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ================================================================
+#  Class: TTLCache
+#  name          → label used in stats and in shared-cache keys
+#  maxsize       → max entries held in process (least recently used evicted first)
+#  ttl           → seconds an entry stays valid (0 = no expiry)
+#  backend_alias → optional Django CACHES alias shared across processes
+# ================================================================
+class TTLCache:
+
+    def __init__(self, name: str, maxsize: int, ttl: float, backend_alias: str = ""):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend_alias = backend_alias
+        self._data = OrderedDict()  # key → (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _registry[name] = self
+
+    # ---------------- Shared-backend key ----------------
+    # Django cache keys must be short strings — hash the (possibly tuple) key
+    def _shared_key(self, key) -> str:
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return f"rag:{self.name}:{digest}"
+
+    def _shared(self):
+        return caches[self.backend_alias] if self.backend_alias else None
+
+    # ---------------- get ----------------
+    # Returns the value or MISSING; a hit refreshes the entry's LRU position
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if not expires_at or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+        shared = self._shared()
+        if shared is not None:
+            value = shared.get(self._shared_key(key), MISSING)
+            if value is not MISSING:
+                self._set_local(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return MISSING
+
+    # ---------------- set ----------------
+    def set(self, key, value):
+        self._set_local(key, value)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(self._shared_key(key), value, timeout=self.ttl or None)
+
+    def _set_local(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)  # Evict least recently used
+
+    # ---------------- get_or_set ----------------
+    # factory() is only called on a miss; its result is cached
+    def get_or_set(self, key, factory):
+        value = self.get(key)
+        if value is MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    # ---------------- stats ----------------
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "shared_backend": self.backend_alias or None,
+            }
+
+
+# ================================================================
+#  Helper: all_cache_stats
+#  {cache name: stats} for every TTLCache in this process
+# ================================================================
+def all_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+# ---------------- Cache instances ----------------
+# Query embeddings for rag_chat / doc_chat — key: (embedding model, normalized question)
+query_embedding_cache = TTLCache(
+    "query_embedding",
+    maxsize=settings.RAG_QUERY_EMBED_CACHE_SIZE,
+    ttl=settings.RAG_QUERY_EMBED_CACHE_TTL,
+    backend_alias=settings.RAG_QUERY_EMBED_CACHE_BACKEND,
+)
+
+# Finished RAG answers for rag_chat / doc_chat (and their *_stream variants)
+# Key: (scope, corpus version, normalized question, history digest) — see views.answer_cache_key()
+answer_cache = TTLCache(
+    "rag_answer",
+    maxsize=settings.RAG_ANSWER_CACHE_SIZE,
+    ttl=settings.RAG_ANSWER_CACHE_TTL,
+    backend_alias=settings.RAG_ANSWER_CACHE_BACKEND,
+)
@@ -0,0 +1,178 @@
+# ===============================================================
+#  file_upload/chat_sessions.py
+#  Server-side chat history for rag_chat / doc_chat (ChatSession + ChatTurn)
+#
+#  Without a session the client re-sends `history` on every question and the
+#  prompt grows with the conversation. With a session the prompt carries:
+#   - summary → every older turn, compacted by the LLM (bounded length)
+#   - every turn the summary does not cover yet, verbatim — normally the last
+#     RAG_CHAT_RECENT_TURNS, more while a background summary is pending or
+#     after one failed (capped by RAG_CHAT_HISTORY_TOKEN_BUDGET)
+#
+#  FLOW OVERVIEW:
+#  Step 1 → prompt_history()   — history list for build_prompt()
+#  Step 2 → record_exchange()  — append question + answer as two ChatTurns
+#  Step 3 → summarize_session() — fold turns that left the recent window into
+#           the summary; runs on a background thread after the request commits
+#           (RAG_CHAT_SUMMARY_ASYNC=False runs it inline)
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from backend import ollama_client
+from .context_packing import estimate_tokens
+from .models import ChatSession, ChatTurn
+
+
+logger = logging.getLogger(__name__)
+
+# One small pool per process — summaries are cheap, rare and never on the request path
+_executor = ThreadPoolExecutor(max_workers=settings.RAG_CHAT_SUMMARY_WORKERS, thread_name_prefix="chat-summary")
+_pending = set()  # Session ids with a summary already queued in this process
+_pending_lock = threading.Lock()
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant "
+    "that answers questions about company documents.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New messages:\n{messages}\n\n"
+    "Rewrite the summary so it also covers the new messages. Keep names, numbers, "
+    "decisions and open questions; drop small talk. Use at most {max_words} words. "
+    "Reply with the summary only."
+)
+
+
+# ================================================================
+#  Function 1: prompt_history
+#  → list[{"role", "content"}] for build_prompt()
+#  role "summary" marks the compacted part of the conversation
+#
+#  Every turn after summarized_turns is sent verbatim, so a summary that lags
+#  behind (still running, or failed) never leaves a gap in the conversation
+#  Unsummarized turns beyond RAG_CHAT_HISTORY_TOKEN_BUDGET are left out oldest
+#  first (the last RAG_CHAT_RECENT_TURNS always stay); that is logged and a
+#  summary is queued so the next prompt gets them back through the summary
+# ================================================================
+def prompt_history(session: ChatSession) -> list[dict]:
+    history = []
+    if session.summary:
+        history.append({"role": "summary", "content": session.summary})
+
+    # Never re-sends what the summary already covers
+    turns = list(session.turns.filter(position__gte=session.summarized_turns).order_by("position"))
+
+    # ---------------- Step 1a: Token Budget, Newest First ----------------
+    budget = settings.RAG_CHAT_HISTORY_TOKEN_BUDGET
+    if budget:
+        used, keep = 0, 0
+        for turn in reversed(turns):
+            used += estimate_tokens(turn.content)
+            if used > budget and keep >= settings.RAG_CHAT_RECENT_TURNS:
+                break
+            keep += 1
+        if keep < len(turns):
+            logger.warning(
+                "Chat session %s: %d unsummarized turns over the history budget left out of the prompt",
+                session.pk, len(turns) - keep,
+            )
+            schedule_summary(session.pk)
+            turns = turns[len(turns) - keep:]
+
+    history.extend({"role": t.role, "content": t.content} for t in turns)
+    return history
+
+
+# ================================================================
+#  Function 2: record_exchange
+#  Appends the question and its answer, then queues a summary if turns have
+#  left the recent window. The session row is locked so two answers to the
+#  same session never get the same positions
+# ================================================================
+def record_exchange(session: ChatSession, question: str, answer: str):
+    with transaction.atomic():
+        locked = ChatSession.objects.select_for_update().get(pk=session.pk)
+        position = locked.turn_count
+        ChatTurn.objects.bulk_create([
+            ChatTurn(session=locked, position=position, role=ChatTurn.Role.USER, content=question),
+            ChatTurn(session=locked, position=position + 1, role=ChatTurn.Role.ASSISTANT, content=answer),
+        ])
+        if not locked.title:
+            locked.title = question[:255]
+        locked.turn_count = position + 2
+        locked.save(update_fields=["title", "turn_count", "updated_at"])
+
+    session.turn_count, session.title = locked.turn_count, locked.title
+    if locked.turn_count - locked.summarized_turns > settings.RAG_CHAT_RECENT_TURNS:
+        schedule_summary(locked.pk)
+
+
+# ================================================================
+#  Function 3: schedule_summary
+#  Runs summarize_session() once the surrounding transaction has committed
+# ================================================================
+def schedule_summary(session_id):
+    if not settings.RAG_CHAT_SUMMARY_ASYNC:
+        transaction.on_commit(lambda: summarize_session(session_id))
+        return
+
+    with _pending_lock:
+        if session_id in _pending:
+            return  # Already queued — it will pick up these turns too
+        _pending.add(session_id)
+    transaction.on_commit(lambda: _executor.submit(_summarize_in_background, session_id))
+
+
+def _summarize_in_background(session_id):
+    try:
+        with _pending_lock:
+            _pending.discard(session_id)
+        summarize_session(session_id)
+    except Exception:
+        logger.exception("Chat summary failed for session %s", session_id)
+    finally:
+        connection.close()  # Pool threads would otherwise keep their DB connection open forever
+
+
+# ================================================================
+#  Function 4: summarize_session
+#  Folds every turn older than the recent window into session.summary
+#  The LLM call runs outside any transaction; the write only succeeds if no
+#  other worker moved summarized_turns meanwhile (compare-and-set)
+#  Returns True when the summary was updated
+# ================================================================
+def summarize_session(session_id) -> bool:
+    session = ChatSession.objects.filter(pk=session_id).first()
+    if session is None:
+        return False
+
+    upto = session.turn_count - settings.RAG_CHAT_RECENT_TURNS
+    if upto <= session.summarized_turns:
+        return False
+
+    turns = session.turns.filter(position__gte=session.summarized_turns, position__lt=upto).order_by("position")
+    messages = "\n".join(f"{t.role.upper()}: {t.content}" for t in turns)
+    prompt = SUMMARY_PROMPT.format(
+        summary=session.summary or "(empty)",
+        messages=messages,
+        max_words=settings.RAG_CHAT_SUMMARY_MAX_WORDS,
+    )
+    summary = ollama_client.chat(
+        [{"role": "user", "content": prompt}],
+        model=settings.OLLAMA_CHAT_MODEL,
+        options={"temperature": 0},
+    ).strip()
+
+    updated = (
+        ChatSession.objects
+        .filter(pk=session_id, summarized_turns=session.summarized_turns)
+        .update(summary=summary, summarized_turns=upto, updated_at=F("updated_at"))
+    )
+    return bool(updated)
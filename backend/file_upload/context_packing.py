@@ -0,0 +1,180 @@
+# ===============================================================
+#  file_upload/context_packing.py
+#  Turns retrieved chunks into the "Context from documents" block of the prompt
+#
+#  chunk_text() splits with chunk_overlap=200, so two neighbouring chunks of
+#  the same file repeat up to 20% of their text, and copies of the same file
+#  in a group return near-identical chunks. Prompt length drives generation
+#  latency on CPU, so the context is packed instead of pasted verbatim
+#
+#  FLOW OVERVIEW:
+#  Step 1 → Merge chunks that are adjacent in the same document into one
+#           passage, cutting the text the second chunk repeats from the first
+#  Step 2 → Drop passages contained in, or nearly identical to (word-shingle
+#           Jaccard ≥ RAG_CONTEXT_DEDUP_THRESHOLD), a more relevant passage
+#  Step 3 → Fill RAG_CONTEXT_TOKEN_BUDGET greedily, most relevant passage first
+#
+#  Relevance = position in the search results (they arrive best first);
+#  a merged passage ranks as its best chunk
+#  Tokens are estimated as characters / RAG_CONTEXT_CHARS_PER_TOKEN
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import threading
+
+from django.conf import settings
+
+from .caching import normalize_question
+from .embedding_file import CHUNK_OVERLAP
+
+
+MIN_OVERLAP_CHARS = 20  # Shorter suffix/prefix matches are coincidence, not splitter overlap
+SHINGLE_WORDS = 5
+
+# Running totals since process start — reported by rag_cache_stats
+_totals = {"requests": 0, "tokens_before": 0, "tokens_after": 0}
+_totals_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / settings.RAG_CONTEXT_CHARS_PER_TOKEN + 0.5)
+
+
+# ================================================================
+#  Helper 1: overlap_length
+#  Length of the longest suffix of `first` that starts `second`
+#  Only lengths up to twice the splitter overlap are tried
+# ================================================================
+def overlap_length(first: str, second: str) -> int:
+    longest = min(len(first), len(second), 2 * CHUNK_OVERLAP)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _join(first: str, second: str) -> str:
+    size = overlap_length(first, second)
+    if size:
+        return first + second[size:]
+    return first + "\n" + second
+
+
+# ================================================================
+#  Helper 2: _shingles
+#  Set of overlapping SHINGLE_WORDS-word windows of the normalized text
+# ================================================================
+def _shingles(text: str) -> set:
+    words = text.split()
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _is_duplicate(norm, shingles, kept) -> bool:
+    for kept_norm, kept_shingles in kept:
+        if norm in kept_norm:
+            return True
+        union = len(shingles | kept_shingles)
+        if union and len(shingles & kept_shingles) / union >= settings.RAG_CONTEXT_DEDUP_THRESHOLD:
+            return True
+    return False
+
+
+# ================================================================
+#  Step 1: _merge_adjacent
+#  → list of (rank, text) passages, one per run of consecutive chunk_index
+#  values of one document; chunks without a chunk_index are kept as they are
+# ================================================================
+def _merge_adjacent(chunks):
+    by_document = {}
+    singles = []
+    for rank, chunk in enumerate(chunks):
+        if chunk.get("chunk_index") is None:
+            singles.append((rank, chunk["text"]))
+        else:
+            by_document.setdefault(chunk.get("document_id"), []).append((chunk["chunk_index"], rank, chunk["text"]))
+
+    passages = list(singles)
+    for rows in by_document.values():
+        rows.sort()
+        run_rank, run_text, last_index = None, None, None
+        for chunk_index, rank, text in rows:
+            if run_text is not None and chunk_index == last_index + 1:
+                run_text = _join(run_text, text)
+                run_rank = min(run_rank, rank)
+            else:
+                if run_text is not None:
+                    passages.append((run_rank, run_text))
+                run_rank, run_text = rank, text
+            last_index = chunk_index
+        passages.append((run_rank, run_text))
+
+    passages.sort(key=lambda p: p[0])
+    return passages
+
+
+# ================================================================
+#  Function 1: pack_context
+#  chunks → search results (list[dict] with "text", "document_id", "chunk_index")
+#  budget → max context tokens (None = RAG_CONTEXT_TOKEN_BUDGET)
+#  Returns (passages, stats)
+#   passages → list[str], most relevant first
+#   stats    → chunks / passages / tokens_before / tokens_after / tokens_saved
+#              tokens_before = what pasting every chunk verbatim would cost
+# ================================================================
+def pack_context(chunks, budget=None):
+    budget = budget or settings.RAG_CONTEXT_TOKEN_BUDGET
+    tokens_before = sum(estimate_tokens(c["text"]) for c in chunks)
+
+    # ---------------- Step 2: Merge + Deduplicate ----------------
+    kept, passages = [], []
+    for _rank, text in _merge_adjacent(chunks):
+        norm = normalize_question(text)
+        shingles = _shingles(norm)
+        if _is_duplicate(norm, shingles, kept):
+            continue
+        kept.append((norm, shingles))
+        passages.append(text)
+
+    # ---------------- Step 3: Greedy Fill by Relevance ----------------
+    # A passage that does not fit is skipped, a smaller, less relevant one may still fit
+    # If even the best passage is too long it is cut to the budget (never an empty context)
+    packed, used = [], 0
+    for text in passages:
+        tokens = estimate_tokens(text)
+        if used + tokens <= budget:
+            packed.append(text)
+            used += tokens
+        elif not packed:
+            cut = text[:int(budget * settings.RAG_CONTEXT_CHARS_PER_TOKEN)]
+            packed.append(cut.rsplit(" ", 1)[0] if " " in cut else cut)
+            used = estimate_tokens(packed[0])
+
+    stats = {
+        "chunks": len(chunks),
+        "passages": len(packed),
+        "tokens_before": tokens_before,
+        "tokens_after": used,
+        "tokens_saved": tokens_before - used,
+    }
+    with _totals_lock:
+        _totals["requests"] += 1
+        _totals["tokens_before"] += tokens_before
+        _totals["tokens_after"] += used
+    return packed, stats
+
+
+# ================================================================
+#  Function 2: context_packing_stats
+#  Totals since process start → GET /file_upload/rag_cache_stats/
+# ================================================================
+def context_packing_stats() -> dict:
+    with _totals_lock:
+        before, after = _totals["tokens_before"], _totals["tokens_after"]
+        return {
+            **_totals,
+            "tokens_saved": before - after,
+            "saved_ratio": round((before - after) / before, 4) if before else 0.0,
+        }
@@ -0,0 +1,41 @@
+# ===============================================================
+#  file_upload/corpus.py
+#  Per-company corpus version used to invalidate RAG answer caches
+#
+#  bump_corpus_version(group_id) → call after a group's chunks change
+#                                  (embed / re-embed / delete)
+#  get_corpus_version(group_id)  → current version (0 if never bumped)
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+from django.db import transaction
+from django.db.models import F
+
+from .models import CorpusVersion
+
+
+# ================================================================
+#  Function 1: bump_corpus_version
+#  Atomic increment — concurrent bumps never lose an update
+#  Returns the new version
+# ================================================================
+def bump_corpus_version(group_id: int) -> int:
+    with transaction.atomic():
+        row, _ = CorpusVersion.objects.get_or_create(follow_group=group_id)
+        CorpusVersion.objects.filter(pk=row.pk).update(version=F("version") + 1)
+        return CorpusVersion.objects.values_list("version", flat=True).get(pk=row.pk)
+
+
+# ================================================================
+#  Function 2: get_corpus_version
+#  Single indexed lookup on the unique follow_group column
+# ================================================================
+def get_corpus_version(group_id: int) -> int:
+    version = (
+        CorpusVersion.objects
+        .filter(follow_group=group_id)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
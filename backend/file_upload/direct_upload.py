@@ -0,0 +1,225 @@
+# ===============================================================
+#  file_upload/direct_upload.py
+#  Two-step uploads straight from the browser to MinIO
+#
+#  upload_file streams every byte through MultiPartParser and a gunicorn
+#  worker. Here Django only signs URLs and registers the finished object:
+#
+#  FLOW OVERVIEW:
+#  Step 1 → start_direct_upload()  (POST /presigned_upload/)
+#           picks a fresh object key and returns either
+#           - one presigned PUT URL (files below FILE_MULTIPART_THRESHOLD), or
+#           - an S3 multipart upload: one presigned URL per part
+#           plus a signed upload_token naming the key, size and uploader
+#  Step 2 → the client PUTs the bytes to MinIO itself
+#  Step 3 → finish_direct_upload() (POST /complete_upload/)
+#           completes the multipart upload (metadata call — no bytes),
+#           HEADs the object, checks its size and creates the Document
+#
+#  The token is signed with SECRET_KEY (django.core.signing), so a client can
+#  only register objects this server issued to that same user
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import math
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+
+from backend.storage import get_s3_client
+from .models import Document
+from .bulk_upload import build_document, object_key
+from .jobs import enqueue_embedding_job
+from .utils import get_group_id
+
+
+TOKEN_SALT = "file_upload.direct_upload"
+MAX_PARTS = 10000  # S3 / MinIO limit per multipart upload
+MIN_PART_SIZE = 5 * 1024 * 1024  # Every part except the last must be at least 5 MiB
+
+
+class DirectUploadError(Exception):
+    # message is returned to the client; status is the HTTP status to use
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _part_size(size: int) -> int:
+    part_size = max(settings.FILE_MULTIPART_PART_SIZE, MIN_PART_SIZE)
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+# ================================================================
+#  Function 1: start_direct_upload
+#  → response dict for the client (method "put" or "multipart")
+# ================================================================
+def start_direct_upload(user, filename: str, size: int) -> dict:
+    # ---------------- Step 1a: Validate ----------------
+    if not filename:
+        raise DirectUploadError("filename is required.")
+    if size <= 0:
+        raise DirectUploadError("size must be a positive number of bytes.")
+    if size > settings.FILE_DIRECT_UPLOAD_MAX_BYTES:
+        raise DirectUploadError(f"Files larger than {settings.FILE_DIRECT_UPLOAD_MAX_BYTES} bytes are not accepted.")
+
+    client = get_s3_client()
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    try:
+        key = object_key(filename)
+    except SuspiciousFileOperation:
+        raise DirectUploadError("filename is too long.")
+    expires = settings.FILE_PRESIGNED_UPLOAD_EXPIRY
+    claims = {"key": key, "filename": filename, "size": size, "uid": user.id}
+
+    # ---------------- Step 1b: Single PUT ----------------
+    if size < settings.FILE_MULTIPART_THRESHOLD:
+        url = client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": bucket, "Key": key},
+            ExpiresIn=expires,
+        )
+        return {
+            "method": "put",
+            "url": url,
+            "key": key,
+            "expires_in": expires,
+            "upload_token": signing.dumps(claims, salt=TOKEN_SALT),
+        }
+
+    # ---------------- Step 1c: Multipart ----------------
+    upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+    part_size = _part_size(size)
+    parts = [
+        {
+            "part_number": number,
+            "url": client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": number},
+                ExpiresIn=expires,
+            ),
+        }
+        for number in range(1, math.ceil(size / part_size) + 1)
+    ]
+    return {
+        "method": "multipart",
+        "key": key,
+        "part_size": part_size,
+        "parts": parts,
+        "expires_in": expires,
+        "upload_token": signing.dumps({**claims, "upload_id": upload_id}, salt=TOKEN_SALT),
+    }
+
+
+# ================================================================
+#  Helper: read_upload_token
+#  Claims of a token issued to this user, or DirectUploadError
+#  max_age = URL lifetime + FILE_PRESIGNED_COMPLETE_GRACE for slow final parts
+# ================================================================
+def read_upload_token(user, token: str) -> dict:
+    try:
+        claims = signing.loads(
+            token or "",
+            salt=TOKEN_SALT,
+            max_age=settings.FILE_PRESIGNED_UPLOAD_EXPIRY + settings.FILE_PRESIGNED_COMPLETE_GRACE,
+        )
+    except signing.SignatureExpired:
+        raise DirectUploadError("Upload token has expired.")
+    except signing.BadSignature:
+        raise DirectUploadError("Invalid upload token.")
+    if claims.get("uid") != user.id:
+        raise DirectUploadError("Invalid upload token.")
+    return claims
+
+
+# ================================================================
+#  Helper: _lock_object_key
+#  Transaction-scoped advisory lock on one object key — a client retrying
+#  "complete" while its first call is still running waits here, then finds
+#  the Document that call created
+# ================================================================
+def _lock_object_key(key: str):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+
+
+# ================================================================
+#  Function 2: finish_direct_upload
+#  parts → [{"part_number", "etag"}] from the client (multipart only)
+#  Returns (document, embedding_job or None)
+#  Completing the same token twice returns the Document created the first time,
+#  also when both calls run at once: check, completion and INSERT happen
+#  under the key's lock (other keys are not blocked)
+# ================================================================
+def finish_direct_upload(user, token: str, parts=None, embed=False):
+    claims = read_upload_token(user, token)
+    with transaction.atomic():
+        _lock_object_key(claims["key"])
+        return _finish_locked(user, claims, parts, embed)
+
+
+def _finish_locked(user, claims, parts, embed):
+    key = claims["key"]
+    existing = Document.objects.filter(file=key, user=user).first()
+    if existing is not None:
+        return existing, None
+
+    client = get_s3_client()
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+
+    # ---------------- Step 3a: Complete the Multipart Upload ----------------
+    if claims.get("upload_id"):
+        if not parts:
+            raise DirectUploadError("parts is required for a multipart upload.")
+        try:
+            completed = sorted(
+                ({"PartNumber": int(p["part_number"]), "ETag": str(p["etag"])} for p in parts),
+                key=lambda p: p["PartNumber"],
+            )
+        except (KeyError, TypeError, ValueError):
+            raise DirectUploadError("Each part needs a part_number and an etag.")
+        try:
+            client.complete_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=claims["upload_id"],
+                MultipartUpload={"Parts": completed},
+            )
+        except ClientError as e:
+            raise DirectUploadError(f"Could not complete the multipart upload: {e}")
+
+    # ---------------- Step 3b: Verify the Object ----------------
+    try:
+        head = client.head_object(Bucket=bucket, Key=key)
+    except ClientError:
+        raise DirectUploadError("The file has not been uploaded yet.", status=409)
+    if head["ContentLength"] != claims["size"]:
+        client.delete_object(Bucket=bucket, Key=key)
+        raise DirectUploadError(
+            f"Uploaded size {head['ContentLength']} does not match the announced size {claims['size']}."
+        )
+
+    # ---------------- Step 3c: Register the Document ----------------
+    # Already inside finish_direct_upload()'s transaction
+    doc = build_document(user, get_group_id(user), key, claims["filename"], head["ContentLength"])
+    Document.objects.bulk_create([doc])  # bulk_create → no save() re-reading the size from MinIO
+    job = enqueue_embedding_job(doc, user=user) if embed else None
+    return doc, job
+
+
+# ================================================================
+#  Function 3: abort_direct_upload
+#  Cancels an unfinished multipart upload so MinIO drops its stored parts
+# ================================================================
+def abort_direct_upload(user, token: str):
+    claims = read_upload_token(user, token)
+    if not claims.get("upload_id"):
+        return
+    try:
+        get_s3_client().abort_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=claims["key"], UploadId=claims["upload_id"],
+        )
+    except ClientError as e:
+        raise DirectUploadError(f"Could not abort the upload: {e}")
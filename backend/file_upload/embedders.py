@@ -0,0 +1,124 @@
+# ===============================================================
+#  file_upload/embedders.py
+#  Embedding backends used by embed_chunks() and embed_query()
+#
+#  RAG_EMBEDDING_BACKEND = "ollama" → HTTP call to Ollama (all-minilm:l6-v2), the default
+#                          "local"  → the same MiniLM model loaded in THIS process via
+#                                     sentence-transformers on CPU — no HTTP hop, no JSON
+#                                     encoding of vectors, batches sized for the CPU
+#
+#  Both backends return L2-normalized 384-dim vectors of the same model,
+#  so chunks embedded by one can be searched with queries from the other.
+#  They are still recorded under different model ids (embedding_model_id())
+#  so EmbeddingCache / incremental re-embedding never mix their vectors.
+#
+#  sentence-transformers + torch are imported lazily — the Ollama backend
+#  works without them installed
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import threading
+
+from django.conf import settings
+
+from backend import ollama_client
+
+
+# ================================================================
+#  Class: LocalEmbedder
+#  One in-process SentenceTransformer on CPU
+#
+#  model_name → Hugging Face id (sentence-transformers/all-MiniLM-L6-v2)
+#  threads    → torch intra-op threads (0 = torch default, usually all cores)
+#  quantize   → int8 dynamic quantization of every nn.Linear layer
+#               (~2x faster on CPU, vectors within ~0.99 cosine of fp32)
+#  batch_size → texts per forward pass
+#
+#  encode() is serialized with a lock: torch already spreads ONE forward
+#  pass over `threads` cores, and concurrent passes would only oversubscribe them
+# ================================================================
+class LocalEmbedder:
+
+    def __init__(self, model_name: str, threads: int = 0, quantize: bool = False, batch_size: int = 64):
+        self.model_name = model_name
+        self.threads = threads
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return f"st:{self.model_name}" + (":int8" if self.quantize else "")
+
+    # ---------------- Lazy Model Load ----------------
+    def _load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+
+        model = SentenceTransformer(self.model_name, device="cpu")
+        model.eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def encode(self, texts) -> list[list[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        with self._lock:
+            if self._model is None:
+                self._model = self._load()
+            vectors = self._model.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,  # Same unit-length output as Ollama's /api/embed
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return vectors.tolist()
+
+
+# ---------------- Process-wide local embedder ----------------
+# Built from settings on first use — the model itself loads on the first encode()
+_local = None
+_local_lock = threading.Lock()
+
+
+def get_local_embedder() -> LocalEmbedder:
+    global _local
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                _local = LocalEmbedder(
+                    settings.RAG_LOCAL_EMBED_MODEL,
+                    threads=settings.RAG_LOCAL_EMBED_THREADS,
+                    quantize=settings.RAG_LOCAL_EMBED_QUANTIZE,
+                    batch_size=settings.RAG_LOCAL_EMBED_BATCH_SIZE,
+                )
+    return _local
+
+
+# ================================================================
+#  Function 1: embedding_model_id
+#  Identifier stored in DocumentChunk.embedding_model / EmbeddingCache
+#  and used in the query-embedding cache key
+# ================================================================
+def embedding_model_id() -> str:
+    if settings.RAG_EMBEDDING_BACKEND == "local":
+        return get_local_embedder().model_id
+    return settings.OLLAMA_EMBED_MODEL
+
+
+# ================================================================
+#  Function 2: embed_texts
+#  texts → list of vectors (same order), through the configured backend
+# ================================================================
+def embed_texts(texts) -> list[list[float]]:
+    if settings.RAG_EMBEDDING_BACKEND == "local":
+        return get_local_embedder().encode(texts)
+    return ollama_client.embed(texts, model=settings.OLLAMA_EMBED_MODEL)
@@ -3,97 +3,161 @@
 #  The full RAG embedding pipeline for a single Document
 #
 #  FLOW OVERVIEW:
-#  Step 1 → Read file from MinIO via Django FileField
+#  Step 1 → Read file from MinIO into a spooled in-memory buffer (ranged GETs)
 #  Step 2 → Extract raw text (PDF / DOCX / PPTX / TXT)
 #  Step 3 → Split text into overlapping chunks
-#  Step 4 → Generate vector embeddings per chunk via Ollama
-#  Step 5 → Save all chunks + vectors to DocumentChunk (pgvector)
+#  Step 4 → Generate vector embeddings in batches via Ollama (bounded concurrency)
+#           or in-process sentence-transformers (RAG_EMBEDDING_BACKEND="local")
+#           Texts already in EmbeddingCache (same model + sha256) are not re-embedded
+#  Step 5 → Save chunks + vectors to DocumentChunk (pgvector)
+#           Incremental mode only inserts / deletes / re-numbers the chunks that changed
 #  Step 6 → Mark Document.is_embedded = True
+#  Step 7 → Bump the group's corpus version so cached RAG answers are invalidated
+#           and patch the group's on-disk vector snapshot (if snapshots are enabled)
+#
+#  Very large files use the streaming variant (stream_embeddings_for_document):
+#  the same steps run page by page / batch by batch with flat memory use
 # ===============================================================
 
 
 # ---------------- Step 0: Imports & Config ----------------
+import io
 import os
+import time
+import hashlib
+import logging
 import tempfile
+import threading
+import uuid
+from contextlib import closing
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
 # File parsers for each supported format
 from pypdf import PdfReader                # Extracts text page-by-page from PDF
 from docx import Document as DocxDocument  # Reads DOCX paragraph objects
 from pptx import Presentation              # Reads PPTX slide shapes
 
+# Process-pool PDF extraction for long documents (Django-free module)
+from .pdf_extract import extract_pdf_text_parallel
+
 # LangChain splitter — handles smart splitting that respects word/sentence boundaries
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-# Ollama Python client — used to call the local embedding model
-from ollama import Client
+# Embedding backend — Ollama (shared pooled client) or in-process sentence-transformers
+from .embedders import embed_texts, embedding_model_id
+
+# Same key normalization django-storages applies before talking to S3
+from storages.utils import clean_name
+from backend.storage import get_s3_client  # Shared, pooled boto3 client for ranged GETs
 
 # Django models
-from .models import Document, DocumentChunk
+from .models import Document, DocumentChunk, EmbeddingCache
+from .bulk_load import insert_chunks  # COPY-based (or bulk_create) chunk loader
+from .corpus import bump_corpus_version  # Invalidates cached RAG answers of the group
+from .vector_snapshots import refresh_document_snapshot  # Incremental .npy snapshot update
 
-# Ollama host — read from environment so it works in Docker or local dev
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 # The embedding model must be pulled in Ollama before this runs: `ollama pull all-minilm:l6-v2`
-EMBEDDING_MODEL_NAME = "all-minilm:l6-v2"
+# (or RAG_EMBEDDING_BACKEND="local" to run it in-process)
+# Stored on every chunk — "all-minilm:l6-v2" for Ollama, "st:<hf model>[:int8]" for local
+EMBEDDING_MODEL_NAME = embedding_model_id()
+
+logger = logging.getLogger(__name__)
 
 
 # ================================================================
-#  Function 1: extract_text_from_fileobj
-#  Entry point for reading a Django FileField
-#
-#  Problem: Django FileField (backed by MinIO) gives us a file-like object,
-#  but PDF/DOCX/PPTX parsers require a real path on disk.
-#  Solution: Stream the file into a temp file, parse the temp file, then delete it.
+#  Helper: _copy_s3_ranges
+#  Copies an S3/MinIO object into `buf` with sequential ranged GETs
+#  Each GET fetches RAG_EXTRACT_RANGE_BYTES, so at most one part is held
+#  in flight regardless of the object size
 # ================================================================
-def extract_text_from_fileobj(django_file, mime_type: str) -> str:
+def _copy_s3_ranges(storage, name: str, buf):
+    client = get_s3_client()  # Shared per-process client (backend/storage.py), not a per-thread one
+    key = storage._normalize_name(clean_name(name))
+    part = settings.RAG_EXTRACT_RANGE_BYTES
 
-    # ---------------- Step 1a: Determine File Extension ----------------
-    # Used as the suffix for the temp file so parsers can identify the format
-    suffix = "." + (django_file.name.split(".")[-1] if "." in django_file.name else "")
+    size = client.head_object(Bucket=storage.bucket_name, Key=key)["ContentLength"]
+    for start in range(0, size, part):
+        end = min(start + part, size) - 1
+        resp = client.get_object(Bucket=storage.bucket_name, Key=key, Range=f"bytes={start}-{end}")
+        for block in resp["Body"].iter_chunks(chunk_size=64 * 1024):
+            buf.write(block)
 
-    # ---------------- Step 1b: Write to Temp File ----------------
-    # django_file.chunks() streams the file in memory-safe blocks (avoids loading all at once)
-    # delete=False → we manage cleanup manually (in the finally block below)
-    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-        for chunk in django_file.chunks():
-            tmp.write(chunk)
-        temp_path = tmp.name  # e.g., /tmp/tmpXYZ.pdf
 
-    # ---------------- Step 1c: Parse + Cleanup ----------------
+# ================================================================
+#  Function 1a: open_document_buffer
+#  Returns a seekable buffer holding the bytes of a Django FileField
+#
+#  SpooledTemporaryFile keeps the bytes in memory and only rolls over
+#  to a temp file on disk once it grows past RAG_EXTRACT_MAX_MEMORY_BYTES,
+#  so typical documents never touch local disk
+#  S3-backed files are read with ranged GETs; any other storage via .chunks()
+# ================================================================
+def open_document_buffer(django_file):
+    buf = tempfile.SpooledTemporaryFile(max_size=settings.RAG_EXTRACT_MAX_MEMORY_BYTES)
     try:
-        return extract_text_from_path(temp_path, mime_type)
-    finally:
-        # Always delete the temp file even if parsing fails
-        try:
-            os.remove(temp_path)
-        except OSError:
-            pass
+        storage = getattr(django_file, "storage", None)
+        if hasattr(storage, "bucket_name") and hasattr(storage, "connection"):
+            _copy_s3_ranges(storage, django_file.name, buf)
+        else:
+            for chunk in django_file.chunks():
+                buf.write(chunk)
+    except Exception:
+        buf.close()
+        raise
+
+    buf.seek(0)
+    return buf
+
+
+# ================================================================
+#  Function 1b: extract_text_from_fileobj
+#  Entry point for reading a Django FileField
+#
+#  pypdf, python-docx and python-pptx all accept file-like objects,
+#  so the file is parsed straight from the spooled buffer — no named temp file
+# ================================================================
+def extract_text_from_fileobj(django_file, mime_type: str) -> str:
+    with open_document_buffer(django_file) as buf:
+        return extract_text_from_stream(buf, mime_type, django_file.name)
 
 
 # ================================================================
-#  Function 2: extract_text_from_path
-#  Reads a local file path and extracts all readable text
-#  Dispatches to the correct parser based on mime_type or extension
+#  Function 2a: extract_text_from_stream
+#  Extracts all readable text from a seekable binary file object
+#  Dispatches to the correct parser based on mime_type or filename extension
 # ================================================================
-def extract_text_from_path(file_path: str, mime_type: str) -> str:
+def extract_text_from_stream(fileobj, mime_type: str, filename: str = "") -> str:
     mime_type = (mime_type or "").lower()
-    ext = os.path.splitext(file_path)[1].lower()  # e.g., ".pdf", ".docx"
+    ext = os.path.splitext(filename or "")[1].lower()  # e.g., ".pdf", ".docx"
 
     # ---------------- Step 2a: PDF Parsing ----------------
     # PdfReader extracts text page by page — joins all pages with newline
+    # Long PDFs are split across a process pool when RAG_PDF_EXTRACT_WORKERS > 1
+    # (page parsing is CPU-bound, so threads would not help)
     if "pdf" in mime_type or ext == ".pdf":
-        reader = PdfReader(file_path)
+        reader = PdfReader(fileobj)
+        page_count = len(reader.pages)
+        workers = settings.RAG_PDF_EXTRACT_WORKERS
+        if workers > 1 and page_count >= settings.RAG_PDF_PARALLEL_MIN_PAGES:
+            fileobj.seek(0)
+            return extract_pdf_text_parallel(fileobj.read(), page_count, workers)
         return "\n".join(page.extract_text() or "" for page in reader.pages)
 
     # ---------------- Step 2b: DOCX Parsing ----------------
     # DocxDocument reads paragraphs — joins them with newline
     if "word" in mime_type or ext in (".docx",):
-        doc = DocxDocument(file_path)
+        doc = DocxDocument(fileobj)
         return "\n".join(p.text for p in doc.paragraphs)
 
     # ---------------- Step 2c: PPTX Parsing ----------------
     # Iterates every slide and every shape on the slide that has text
     if "ppt" in mime_type or ext in (".pptx",):
-        pres = Presentation(file_path)
+        pres = Presentation(fileobj)
         texts = []
         for slide in pres.slides:
             for shape in slide.shapes:
@@ -104,8 +168,16 @@ def extract_text_from_path(file_path: str, mime_type: str) -> str:
     # ---------------- Step 2d: TXT / Fallback ----------------
     # Everything else is treated as plain text
     # errors="ignore" skips unreadable bytes instead of crashing
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
+    return fileobj.read().decode("utf-8", errors="ignore")
+
+
+# ================================================================
+#  Function 2b: extract_text_from_path
+#  Same as extract_text_from_stream for a file already on local disk
+# ================================================================
+def extract_text_from_path(file_path: str, mime_type: str) -> str:
+    with open(file_path, "rb") as f:
+        return extract_text_from_stream(f, mime_type, file_path)
 
 
 # ================================================================
@@ -117,34 +189,545 @@ def extract_text_from_path(file_path: str, mime_type: str) -> str:
 #  chunk_size=1000 → ~750 words per chunk (good for LLaMA context)
 #  chunk_overlap=200 → 200 chars of the previous chunk repeated at the start of the next
 # ================================================================
-def chunk_text(text: str):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,    # Max characters per chunk
-        chunk_overlap=200,  # Characters shared between adjacent chunks
+CHUNK_SIZE = 1000    # Max characters per chunk
+CHUNK_OVERLAP = 200  # Characters shared between adjacent chunks
+
+
+def _make_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
         length_function=len,
     )
-    return splitter.split_text(text)  # Returns list[str]
+
+
+def chunk_text(text: str):
+    return _make_splitter().split_text(text)  # Returns list[str]
+
+
+# ================================================================
+#  Function 3b: iter_text_segments
+#  Streaming counterpart of extract_text_from_stream
+#  Yields the text piece by piece instead of returning one big string:
+#   PDF  → one page at a time
+#   DOCX → one paragraph at a time
+#   PPTX → one slide at a time
+#   TXT  → fixed-size blocks
+#  Each segment already carries the "\n" separator the non-streaming path would add
+#
+#  position → optional dict, kept up to date with the share of the file read so
+#  far: {"done": pages/paragraphs/slides/bytes read, "total": their count}
+# ================================================================
+TEXT_BLOCK_CHARS = 64 * 1024
+
+
+def iter_text_segments(fileobj, mime_type: str, filename: str = "", position=None):
+    mime_type = (mime_type or "").lower()
+    ext = os.path.splitext(filename or "")[1].lower()
+    if position is None:
+        position = {}
+
+    def units(items):
+        position["total"] = len(items)
+        for done, item in enumerate(items, start=1):
+            position["done"] = done
+            yield item
+
+    if "pdf" in mime_type or ext == ".pdf":
+        for page in units(PdfReader(fileobj).pages):
+            yield (page.extract_text() or "") + "\n"
+        return
+
+    if "word" in mime_type or ext in (".docx",):
+        for p in units(DocxDocument(fileobj).paragraphs):
+            yield p.text + "\n"
+        return
+
+    if "ppt" in mime_type or ext in (".pptx",):
+        for slide in units(Presentation(fileobj).slides):
+            yield "".join(shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text"))
+        return
+
+    # TXT / fallback — decode incrementally so multi-byte characters split across blocks survive
+    position["total"] = fileobj.seek(0, io.SEEK_END)
+    fileobj.seek(0)
+    reader = io.TextIOWrapper(fileobj, encoding="utf-8", errors="ignore")
+    try:
+        while True:
+            block = reader.read(TEXT_BLOCK_CHARS)
+            if not block:
+                break
+            position["done"] = fileobj.tell()  # Bytes consumed (includes the decoder's read-ahead)
+            yield block
+    finally:
+        reader.detach()  # Leave the underlying buffer open — the caller owns it
+
+
+# ================================================================
+#  Function 3c: iter_chunks
+#  Incremental chunking over a stream of text segments
+#
+#  Keeps a small rolling buffer: once it holds at least two chunks' worth of text
+#  it is split, every chunk except the last is emitted, and the last one is carried
+#  over as the start of the next buffer. The carried chunk already begins with the
+#  overlap from its predecessor, so overlap is preserved across page boundaries
+#  Memory stays bounded by ~2 chunks + one segment, whatever the document size
+# ================================================================
+def iter_chunks(segments):
+    splitter = _make_splitter()
+    buffer = ""
+
+    for segment in segments:
+        buffer += segment
+        if len(buffer) < 2 * CHUNK_SIZE:
+            continue
+        pieces = splitter.split_text(buffer)
+        if len(pieces) > 1:
+            yield from pieces[:-1]
+            buffer = pieces[-1]
+
+    # Flush whatever is left once the document ends
+    if buffer.strip():
+        yield from splitter.split_text(buffer)
+
+
+# ================================================================
+#  Helper: _embed_batch
+#  Embeds ONE batch of chunks through the configured backend
+#  Ollama: one /api/embed round trip per batch, over the shared keep-alive pool
+#  local:  one sentence-transformers encode() per batch
+#  Returns (vectors, seconds) so the caller can report per-batch timing
+#  Raises ValueError unless the backend returned exactly one vector per text —
+#  a shifted vector would be cached under the wrong text for good
+# ================================================================
+def _embed_batch(batch_no: int, batch: list[str]):
+    started = time.perf_counter()
+    vectors = embed_texts(batch)
+    elapsed = time.perf_counter() - started
+    if len(vectors) != len(batch):
+        raise ValueError(f"Embedding backend returned {len(vectors)} vectors for {len(batch)} texts")
+
+    logger.info(
+        "embed batch %d: %d chunks in %.3fs (%.1f chunks/s)",
+        batch_no, len(batch), elapsed, len(batch) / elapsed if elapsed else 0.0,
+    )
+    return vectors, elapsed
+
+
+# ================================================================
+#  Helper: chunk_hash
+#  sha256 of the chunk text — the content address used by EmbeddingCache
+# ================================================================
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ================================================================
+#  Embedding cache helpers
+#  _cache_counters are process-wide totals since start-up
+#  embedding_cache_stats() exposes them (hits / misses / hit_rate)
+# ================================================================
+_cache_counters = {"hits": 0, "misses": 0}
+_cache_counters_lock = threading.Lock()
+
+# Max hashes per IN (...) lookup — keeps each cache query a reasonable size
+CACHE_LOOKUP_BATCH = 1000
+
+
+def _record_cache_result(hits: int, misses: int):
+    with _cache_counters_lock:
+        _cache_counters["hits"] += hits
+        _cache_counters["misses"] += misses
+
+
+def embedding_cache_stats() -> dict:
+    with _cache_counters_lock:
+        hits, misses = _cache_counters["hits"], _cache_counters["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def _lookup_cached_embeddings(hashes) -> dict:
+    # Returns {content_hash: vector} for every hash already in the cache
+    found = {}
+    hashes = list(hashes)
+    for i in range(0, len(hashes), CACHE_LOOKUP_BATCH):
+        rows = EmbeddingCache.objects.filter(
+            embedding_model=EMBEDDING_MODEL_NAME,
+            content_hash__in=hashes[i:i + CACHE_LOOKUP_BATCH],
+        ).values_list("content_hash", "embedding")
+        found.update(rows)
+    return found
+
+
+def _store_cached_embeddings(vectors_by_hash: dict):
+    # ignore_conflicts → another worker may have cached the same text meanwhile
+    EmbeddingCache.objects.bulk_create(
+        [
+            EmbeddingCache(embedding_model=EMBEDDING_MODEL_NAME, content_hash=h, embedding=vec)
+            for h, vec in vectors_by_hash.items()
+        ],
+        batch_size=CACHE_LOOKUP_BATCH,
+        ignore_conflicts=True,
+    )
 
 
 # ================================================================
 #  Function 4: embed_chunks
-#  Sends each chunk to Ollama and collects the embedding vectors
+#  Returns one embedding vector per chunk, calling Ollama only for
+#  texts that are not in EmbeddingCache yet
 #
 #  all-minilm:l6-v2 → produces 384-dimensional float vectors
 #  Each vector represents the semantic meaning of that chunk in high-dimensional space
 #  CosineDistance can then find the most semantically similar chunks for any query
+#
+#  batch_size  → chunks per embed() call (RAG_EMBED_BATCH_SIZE)
+#  concurrency → max batches in flight at once (RAG_EMBED_CONCURRENCY)
+#  stats       → optional dict, filled with cache hits/misses + per-batch timings
+#  progress    → optional callback(done, total), called after each batch
+#                (always from the calling thread, so it may safely touch the DB)
+#  use_cache   → override RAG_EMBED_CACHE_ENABLED for this call
+# ================================================================
+def embed_chunks(chunks, batch_size=None, concurrency=None, stats=None, progress=None, use_cache=None):
+    chunks = list(chunks)
+    if not chunks:
+        return []
+
+    batch_size = batch_size or settings.RAG_EMBED_BATCH_SIZE
+    concurrency = concurrency or settings.RAG_EMBED_CONCURRENCY
+    if use_cache is None:
+        use_cache = settings.RAG_EMBED_CACHE_ENABLED
+
+    # ---------------- Step 4a: Cache Lookup ----------------
+    # Identical texts (inside this document or across documents) share one vector
+    hashes = [chunk_hash(c) for c in chunks]
+    known = _lookup_cached_embeddings(set(hashes)) if use_cache else {}
+
+    # Unique texts still missing, in first-seen order
+    missing = {}
+    for h, c in zip(hashes, chunks):
+        if h not in known and h not in missing:
+            missing[h] = c
+
+    hits = len(chunks) - len(missing)
+    if use_cache:
+        _record_cache_result(hits, len(missing))
+    if progress is not None and hits:
+        progress(hits, len(chunks))
+
+    # ---------------- Step 4b: Split Misses Into Batches ----------------
+    missing_hashes = list(missing.keys())
+    missing_texts = list(missing.values())
+    batches = [missing_texts[i:i + batch_size] for i in range(0, len(missing_texts), batch_size)]
+    hash_batches = [missing_hashes[i:i + batch_size] for i in range(0, len(missing_hashes), batch_size)]
+
+    # ---------------- Step 4c: Embed Batches Concurrently ----------------
+    # max_workers bounds how many batches this document has in flight against Ollama
+    # (OLLAMA_MAX_CONCURRENCY additionally caps the whole process)
+    # pool.map() keeps results in input order → vectors line up with texts
+    started = time.perf_counter()
+    results = []
+    if batches:
+        done = hits
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+            for batch, result in zip(batches, pool.map(
+                lambda item: _embed_batch(item[0], item[1]),
+                enumerate(batches),
+            )):
+                results.append(result)
+                done += len(batch)
+                if progress is not None:
+                    progress(done, len(chunks))
+    total_seconds = time.perf_counter() - started
+
+    # ---------------- Step 4d: Store New Vectors ----------------
+    # Each batch's vectors pair with that batch's hashes (_embed_batch checked the counts)
+    fresh = {}
+    for batch_hashes, (vectors, _) in zip(hash_batches, results):
+        fresh.update(zip(batch_hashes, vectors))
+    if use_cache and fresh:
+        _store_cached_embeddings(fresh)
+
+    # ---------------- Step 4e: Assemble + Report ----------------
+    embeddings = [known[h] if h in known else fresh[h] for h in hashes]
+
+    if stats is not None:
+        stats["cache_hits"] = hits
+        stats["cache_misses"] = len(missing)
+        stats["batches"] = [
+            {"size": len(batch), "seconds": round(seconds, 4)}
+            for batch, (_, seconds) in zip(batches, results)
+        ]
+        stats["total_seconds"] = round(total_seconds, 4)
+
+    return embeddings  # list[vector] — one per chunk, in input order
+
+
 # ================================================================
-def embed_chunks(chunks):
-    # Client() reads OLLAMA_HOST from environment internally
-    client = Client()
+#  Helper: _new_chunk
+#  Builds one unsaved DocumentChunk row for the given document
+# ================================================================
+def _new_chunk(doc: Document, idx: int, text: str, content_hash: str, vec, now):
+    return DocumentChunk(
+        document=doc,
+        follow_group=doc.follow_group,  # Denormalized tenant id → join-free filtered ANN search
+        chunk_index=idx,           # Position of this chunk in the document
+        text=text,                 # The raw text shown as context to the LLM
+        content_hash=content_hash, # sha256(text) — used to diff on the next re-embed
+        embedding=vec,             # The pgvector float[] used for similarity search
+        embedding_model=EMBEDDING_MODEL_NAME,
+        embedding_created_at=now,
+    )
 
-    embeddings = []
-    for chunk in chunks:
-        # client.embeddings() returns {"embedding": [float, float, ...]}
-        resp = client.embeddings(model=EMBEDDING_MODEL_NAME, prompt=chunk)
-        embeddings.append(resp["embedding"])
 
-    return embeddings  # list[list[float]] — one vector per chunk
+# ================================================================
+#  Helper: _diff_chunks
+#  Matches the new chunk list against the rows already stored for the document
+#
+#  Returns (moved, to_insert, to_delete):
+#   moved     → existing rows whose text is unchanged but whose chunk_index changed
+#               (chunk_index already updated on the instance)
+#   to_insert → [(idx, text, hash)] for chunks with no matching row
+#   to_delete → ids of rows no longer present in the new chunk list
+#
+#  Only rows embedded with the current model and with a stored hash can be reused
+# ================================================================
+def _diff_chunks(rows, chunks, hashes):
+    reusable = {}
+    to_delete = []
+    for row in rows:
+        if row.content_hash and row.embedding_model == EMBEDDING_MODEL_NAME:
+            reusable.setdefault(row.content_hash, []).append(row)
+        else:
+            to_delete.append(row.id)
+
+    moved, to_insert = [], []
+    for idx, (text, h) in enumerate(zip(chunks, hashes)):
+        pool = reusable.get(h)
+        if not pool:
+            to_insert.append((idx, text, h))
+            continue
+        # Prefer the row that is already at this position → no write needed
+        row = next((r for r in pool if r.chunk_index == idx), pool[0])
+        pool.remove(row)
+        if row.chunk_index != idx:
+            row.chunk_index = idx
+            moved.append(row)
+
+    # Whatever is left in the pools no longer exists in the document
+    for pool in reusable.values():
+        to_delete.extend(r.id for r in pool)
+
+    return moved, to_insert, to_delete
+
+
+# ================================================================
+#  Helper: _save_chunks_incremental
+#  Re-embed mode that writes only what changed:
+#   - INSERT chunks whose text is new
+#   - DELETE chunks whose text disappeared
+#   - UPDATE chunk_index in place for chunks that only moved
+#  Unchanged chunks are not touched at all → no dead tuples, no HNSW churn
+#
+#  Embedding of the new texts happens before the transaction (slow network calls
+#  should not hold row locks); the diff is then recomputed under the document lock
+#  in case another process changed the chunks meanwhile
+# ================================================================
+def _save_chunks_incremental(doc: Document, chunks, hashes, progress=None):
+    fields = ("id", "chunk_index", "content_hash", "embedding_model")
+
+    # ---------------- Step 1: First Diff + Embed New Texts ----------------
+    rows = list(DocumentChunk.objects.filter(document=doc).only(*fields))
+    _, to_insert, _ = _diff_chunks(rows, chunks, hashes)
+
+    reused = len(chunks) - len(to_insert)
+    if progress is not None:
+        progress(reused, len(chunks))
+    vectors = embed_chunks(
+        [text for _, text, _ in to_insert],
+        progress=(lambda done, total: progress(reused + done, len(chunks))) if progress else None,
+    )
+    vectors_by_hash = {h: vec for (_, _, h), vec in zip(to_insert, vectors)}
+
+    # ---------------- Step 2: Apply the Diff Atomically ----------------
+    now = timezone.now()
+    with transaction.atomic():
+        # Serializes concurrent re-embeds of the same document
+        Document.objects.select_for_update().filter(pk=doc.pk).first()
+
+        rows = list(DocumentChunk.objects.filter(document=doc).only(*fields))
+        moved, to_insert, to_delete = _diff_chunks(rows, chunks, hashes)
+
+        # Rare race: a text we did not embed above — fetch it (usually a cache hit)
+        late = [(text, h) for _, text, h in to_insert if h not in vectors_by_hash]
+        if late:
+            vectors_by_hash.update(zip(
+                [h for _, h in late],
+                embed_chunks([text for text, _ in late]),
+            ))
+
+        if to_delete:
+            DocumentChunk.objects.filter(id__in=to_delete).delete()
+        if moved:
+            for row in moved:
+                row.updated_at = now  # bulk_update() does not apply auto_now
+            DocumentChunk.objects.bulk_update(moved, ["chunk_index", "updated_at"])
+        if to_insert:
+            insert_chunks([
+                _new_chunk(doc, idx, text, h, vectors_by_hash[h], now)
+                for idx, text, h in to_insert
+            ])
+
+    logger.info(
+        "incremental re-embed %s: %d inserted, %d deleted, %d moved, %d unchanged",
+        doc.id, len(to_insert), len(to_delete), len(moved),
+        len(chunks) - len(to_insert) - len(moved),
+    )
+
+
+# ================================================================
+#  Helper: _replace_chunks
+#  Full re-embed mode: delete every chunk of the document and insert the new list
+#  Both statements run in one transaction so searches never see a half-empty document
+# ================================================================
+def _replace_chunks(doc: Document, chunks, hashes, progress=None):
+    vectors = embed_chunks(chunks, progress=progress)
+
+    now = timezone.now()
+    objs = [
+        _new_chunk(doc, idx, text, h, vec, now)
+        for idx, (text, h, vec) in enumerate(zip(chunks, hashes, vectors))
+    ]
+
+    with transaction.atomic():
+        DocumentChunk.objects.filter(document=doc).delete()
+        # insert_chunks → COPY (or bulk_create) — far fewer round trips than individual saves
+        insert_chunks(objs)
+
+
+# ================================================================
+#  Function 5a: stream_embeddings_for_document
+#  Bounded-memory variant of the pipeline for very large documents
+#
+#  extract (page by page) → chunk (incrementally) → embed (per batch) → insert (per batch)
+#  Nothing but the current batch is ever held in memory. Each batch is
+#  committed straight into DocumentChunk, tagged with this run's ingest_run,
+#  and the corpus version is bumped → early pages are searchable while the
+#  rest of the file is still processed. The document's previous rows stay
+#  until the run has finished and are then deleted in one statement; until
+#  then a re-embedded document can return both copies of a passage
+#  (pack_context drops the duplicate). If anything fails, only this run's
+#  rows are deleted and the previous chunks are left as they were
+#
+#  incremental → vectors of the document's previous rows are reused for
+#  unchanged texts (looked up per batch by content_hash), so re-embedding an
+#  edited file only sends changed chunks to Ollama. Unlike
+#  _save_chunks_incremental() every row is still rewritten — the in-place
+#  diff would need all previous rows in memory
+#
+#  progress(done, total): done = chunks written so far, total = an estimate from
+#  the share of the file read (pages / paragraphs / slides / bytes), exact at the end
+# ================================================================
+def stream_embeddings_for_document(doc: Document, progress=None, incremental=None):
+    if incremental is None:
+        incremental = settings.RAG_INCREMENTAL_REEMBED
+    batch_size = settings.RAG_STREAM_BATCH_SIZE
+    run = uuid.uuid4()
+    started = timezone.now()
+    position = {}
+    written = 0
+
+    try:
+        # closing() → the extractor generator is finished while the buffer is still open
+        with open_document_buffer(doc.file) as buf, closing(
+            iter_text_segments(buf, doc.mime_type or "", doc.file.name, position=position)
+        ) as segments:
+            chunks = iter_chunks(segments)
+
+            while True:
+                batch = list(islice(chunks, batch_size))
+                if not batch:
+                    break
+
+                hashes = [chunk_hash(text) for text in batch]
+                vectors = _previous_vectors(doc, hashes, run) if incremental else {}
+                missing = [(h, text) for h, text in zip(hashes, batch) if h not in vectors]
+                if missing:
+                    vectors.update(zip([h for h, _ in missing], embed_chunks([text for _, text in missing])))
+
+                now = timezone.now()
+                rows = []
+                for i, (text, h) in enumerate(zip(batch, hashes)):
+                    row = _new_chunk(doc, written + i, text, h, vectors[h], now)
+                    row.ingest_run = run
+                    rows.append(row)
+                insert_chunks(rows)
+                written += len(batch)
+                bump_corpus_version(doc.follow_group)  # Cached answers / memory index see the new rows
+
+                if progress is not None:
+                    progress(written, _estimate_total(written, position))
+    except BaseException:
+        DocumentChunk.objects.filter(document=doc, ingest_run=run).delete()
+        if written:
+            bump_corpus_version(doc.follow_group)
+        raise
+
+    if written == 0:
+        return 0  # No parseable text — the old chunks stay as they are
+
+    _finish_ingest_run(doc, run, started)
+    bump_corpus_version(doc.follow_group)
+    refresh_document_snapshot(doc.follow_group, doc.id)
+    return written
+
+
+def _estimate_total(written: int, position: dict) -> int:
+    done, total = position.get("done", 0), position.get("total", 0)
+    if not done or not total:
+        return 0  # Unknown yet — the job reports no percentage
+    return max(written, round(written * total / done))
+
+
+# ================================================================
+#  Helper: _previous_vectors
+#  {content_hash: embedding} of the document's rows from before this run
+#  that match one of `hashes` and were embedded with the current model
+# ================================================================
+def _previous_vectors(doc: Document, hashes, run) -> dict:
+    rows = (
+        DocumentChunk.objects
+        .filter(document=doc, content_hash__in=set(hashes), embedding_model=EMBEDDING_MODEL_NAME)
+        .exclude(ingest_run=run)
+        .values_list("content_hash", "embedding")
+    )
+    return {h: vec for h, vec in rows}
+
+
+# ================================================================
+#  Helper: _finish_ingest_run
+#  Drops the rows the document had before the run (one DELETE) and marks it
+#  embedded. Rows of a concurrent run that started later are kept — that run
+#  removes this one's rows when it finishes
+# ================================================================
+def _finish_ingest_run(doc: Document, run, started):
+    now = timezone.now()
+    with transaction.atomic():
+        # Serializes with concurrent re-embeds of the same document
+        Document.objects.select_for_update().filter(pk=doc.pk).first()
+        (
+            DocumentChunk.objects
+            .filter(document=doc, created_at__lt=started)
+            .exclude(ingest_run=run)
+            .delete()
+        )
+        # update() → Document.save() would re-read the file size from MinIO
+        Document.objects.filter(pk=doc.pk).update(is_embedded=True, updated_at=now)
+        doc.is_embedded = True
 
 
 # ================================================================
@@ -156,11 +739,29 @@ def embed_chunks(chunks):
 #   1. Read file from MinIO (via Django FileField)
 #   2. Extract raw text (format-aware)
 #   3. Split text into chunks
-#   4. Generate one embedding vector per chunk via Ollama
-#   5. Delete old chunks (re-embed support) and bulk-insert new ones
+#   4. Generate one embedding vector per new chunk via Ollama
+#   5. Save chunks:
+#      incremental=True  → diff against stored chunks (insert / delete / move only)
+#      incremental=False → delete all old chunks and bulk-insert the new ones
 #   6. Mark Document.is_embedded = True
+#   7. Bump the group's corpus version (invalidates cached RAG answers)
+#      and patch the group's vector snapshot with this document's rows
+#
+#  Files of RAG_STREAMING_INGEST_MIN_BYTES or more are handed to
+#  stream_embeddings_for_document() (bounded memory, searchable batch by batch)
+#
+#  incremental → defaults to RAG_INCREMENTAL_REEMBED
+#  progress    → optional callback(done, total) in chunks — used by the
+#                embedding_worker command to report job progress
 # ================================================================
-def create_embeddings_for_document(doc: Document):
+def create_embeddings_for_document(doc: Document, progress=None, incremental=None):
+    if incremental is None:
+        incremental = settings.RAG_INCREMENTAL_REEMBED
+
+    # Very large files go through the bounded-memory streaming pipeline instead
+    stream_min = settings.RAG_STREAMING_INGEST_MIN_BYTES
+    if stream_min and (doc.file_size or 0) >= stream_min:
+        return stream_embeddings_for_document(doc, progress=progress, incremental=incremental)
 
     # ---------------- Step 5a: Extract Text from File ----------------
     # doc.file is the Django FileField — stored in MinIO, accessed via streaming
@@ -173,32 +774,25 @@ def create_embeddings_for_document(doc: Document):
 
     # ---------------- Step 5b: Chunk the Text ----------------
     chunks = chunk_text(text)
+    hashes = [chunk_hash(c) for c in chunks]
+    if progress is not None:
+        progress(0, len(chunks))
 
-    # ---------------- Step 5c: Generate Embeddings ----------------
-    vectors = embed_chunks(chunks)
-
-    # ---------------- Step 5d: Save Chunks to DB ----------------
-    # Delete existing chunks first — supports re-embedding if the file changes
-    DocumentChunk.objects.filter(document=doc).delete()
-
-    objs = []
-    for idx, (chunk_text_value, vec) in enumerate(zip(chunks, vectors)):
-        objs.append(
-            DocumentChunk(
-                document=doc,
-                chunk_index=idx,           # Position of this chunk in the document
-                text=chunk_text_value,     # The raw text shown as context to the LLM
-                embedding=vec,             # The pgvector float[] used for similarity search
-                embedding_model=EMBEDDING_MODEL_NAME,
-            )
-        )
-
-    # bulk_create inserts all rows in one SQL statement — much faster than individual saves
-    DocumentChunk.objects.bulk_create(objs)
+    # ---------------- Step 5c: Embed + Save Chunks to DB ----------------
+    if incremental:
+        _save_chunks_incremental(doc, chunks, hashes, progress=progress)
+    else:
+        _replace_chunks(doc, chunks, hashes, progress=progress)
 
-    # ---------------- Step 5e: Mark Document as Embedded ----------------
+    # ---------------- Step 5d: Mark Document as Embedded ----------------
     # is_embedded = True unlocks rag_chat and doc_chat for this document
     doc.is_embedded = True
     doc.save(update_fields=["is_embedded", "updated_at"])
 
-    return len(objs)  # Returned to the API response as "chunks_created"
\ No newline at end of file
+    # ---------------- Step 5e: Invalidate Cached Answers ----------------
+    # New corpus version → answer cache keys of this group no longer match
+    # The snapshot is patched with just this document's rows (no-op when disabled)
+    bump_corpus_version(doc.follow_group)
+    refresh_document_snapshot(doc.follow_group, doc.id)
+
+    return len(chunks)  # Returned to the API response as "chunks_created"
@@ -0,0 +1,239 @@
+# ===============================================================
+#  file_upload/jobs.py
+#  Background embedding queue backed by the EmbeddingJob table
+#
+#  FLOW OVERVIEW:
+#  Step 1 → enqueue_embedding_job()  — called by the embed_file_async view
+#           (enqueue_embedding_jobs() for many new documents at once)
+#  Step 2 → claim_next_job()          — called by each embedding_worker process
+#           SELECT ... FOR UPDATE SKIP LOCKED → many workers, no double claims
+#  Step 3 → run_job()                 — runs the pipeline, reports progress,
+#                                       keeps a heartbeat, marks the job done /
+#                                       failed — only while it still owns the job
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Document, EmbeddingJob
+from .embedding_file import create_embeddings_for_document
+
+
+# ================================================================
+#  Helper: default_worker_id
+#  "<hostname>:<pid>" — identifies which process on which node holds a job
+# ================================================================
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ================================================================
+#  Function 1: enqueue_embedding_job
+#  Creates a queued job for the document and returns immediately
+#  If the document already has a queued/running job, that job is returned
+#  instead — double-clicking "embed" does not embed the file twice
+# ================================================================
+def enqueue_embedding_job(doc: Document, user=None) -> EmbeddingJob:
+    active = (
+        EmbeddingJob.objects
+        .filter(document=doc, status__in=[EmbeddingJob.Status.QUEUED, EmbeddingJob.Status.RUNNING])
+        .order_by("-created_at")
+        .first()
+    )
+    if active is not None:
+        return active
+
+    return EmbeddingJob.objects.create(
+        document=doc,
+        follow_group=doc.follow_group,
+        requested_by=user,
+    )
+
+
+# ================================================================
+#  Function 1b: enqueue_embedding_jobs
+#  One queued job per document in a single INSERT — used by bulk uploads,
+#  where the documents are brand new and cannot have an active job yet
+# ================================================================
+def enqueue_embedding_jobs(docs, user=None) -> list[EmbeddingJob]:
+    return EmbeddingJob.objects.bulk_create([
+        EmbeddingJob(document=doc, follow_group=doc.follow_group, requested_by=user)
+        for doc in docs
+    ])
+
+
+# ================================================================
+#  Function 2: claim_next_job
+#  Atomically picks the oldest claimable job and marks it running
+#
+#  Claimable =
+#   a) status=queued, or
+#   b) status=running but the heartbeat is older than RAG_EMBED_JOB_STALE_SECONDS
+#      (the worker that held it crashed) and attempts are still below the limit
+#  Stale running jobs that already used every attempt are marked failed first,
+#  so they do not show "running" forever
+#
+#  FOR UPDATE SKIP LOCKED → rows being claimed by another worker are skipped
+#  instead of waited on, so N workers each get a different job in parallel
+# ================================================================
+def claim_next_job(worker_id: str):
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.RAG_EMBED_JOB_STALE_SECONDS)
+
+    # ---------------- Step 2a: Give Up on Exhausted Jobs ----------------
+    EmbeddingJob.objects.filter(
+        status=EmbeddingJob.Status.RUNNING,
+        heartbeat_at__lt=stale_before,
+        attempts__gte=settings.RAG_EMBED_JOB_MAX_ATTEMPTS,
+    ).update(
+        status=EmbeddingJob.Status.FAILED,
+        error=f"Worker stopped responding; gave up after {settings.RAG_EMBED_JOB_MAX_ATTEMPTS} attempts.",
+        finished_at=now,
+    )
+
+    # ---------------- Step 2b: Claim ----------------
+    with transaction.atomic():
+        job = (
+            EmbeddingJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=EmbeddingJob.Status.QUEUED)
+                | Q(
+                    status=EmbeddingJob.Status.RUNNING,
+                    heartbeat_at__lt=stale_before,
+                    attempts__lt=settings.RAG_EMBED_JOB_MAX_ATTEMPTS,
+                )
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = EmbeddingJob.Status.RUNNING
+        job.worker = worker_id
+        job.attempts += 1
+        job.started_at = now
+        job.heartbeat_at = now
+        job.chunks_done = 0
+        job.error = ""
+        job.save(update_fields=[
+            "status", "worker", "attempts", "started_at",
+            "heartbeat_at", "chunks_done", "error",
+        ])
+
+    return job
+
+
+class JobLost(Exception):
+    # Raised inside the pipeline once another worker has re-claimed the job
+    pass
+
+
+# ================================================================
+#  Helper: owned
+#  Queryset matching the job only while THIS claim still holds it
+#  (same worker and same attempt — a re-claim changes at least the attempt)
+# ================================================================
+def owned(job: EmbeddingJob):
+    return EmbeddingJob.objects.filter(
+        pk=job.pk,
+        status=EmbeddingJob.Status.RUNNING,
+        worker=job.worker,
+        attempts=job.attempts,
+    )
+
+
+# ================================================================
+#  Helper: Heartbeat
+#  Background thread refreshing heartbeat_at every RAG_EMBED_JOB_HEARTBEAT_SECONDS
+#  while the pipeline runs — text extraction of a large PDF/DOCX reports no
+#  progress for minutes, and without it the job would look abandoned
+#  .lost becomes True once the job was re-claimed by someone else; run_job()
+#  checks it at every progress report and once the pipeline returns (a thread
+#  cannot interrupt the extraction itself — the first report after it stops
+#  the run, before any chunk is embedded)
+# ================================================================
+class Heartbeat(threading.Thread):
+
+    def __init__(self, job: EmbeddingJob):
+        super().__init__(name=f"heartbeat-{job.pk}", daemon=True)
+        self.job = job
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.wait(settings.RAG_EMBED_JOB_HEARTBEAT_SECONDS):
+                if not owned(self.job).update(heartbeat_at=timezone.now()):
+                    self.lost = True
+                    return
+        finally:
+            connection.close()  # This thread's own DB connection
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ================================================================
+#  Function 3: run_job
+#  Runs the embedding pipeline for a claimed job
+#  Progress is written with a single UPDATE per batch; a Heartbeat thread keeps
+#  heartbeat_at fresh in between. Every write is conditional on still owning
+#  the job, so a worker that was presumed dead never overwrites the new owner
+#  Any exception is stored on the job instead of crashing the worker loop
+# ================================================================
+def run_job(job: EmbeddingJob) -> EmbeddingJob:
+    heartbeat = Heartbeat(job)
+
+    # ---------------- Step 3a: Progress Callback ----------------
+    # Also the point where a worker that lost its job stops early — already
+    # known from the heartbeat, or found out by this UPDATE matching no row
+    def progress(done, total):
+        if heartbeat.lost:
+            raise JobLost()
+        updated = owned(job).update(
+            chunks_done=done,
+            chunks_total=total,
+            heartbeat_at=timezone.now(),
+        )
+        if not updated:
+            raise JobLost()
+
+    # ---------------- Step 3b: Run Pipeline ----------------
+    # On failure the progress counters are left as the last batch wrote them
+    heartbeat.start()
+    fields = {}
+    try:
+        count = create_embeddings_for_document(job.document, progress=progress)
+        if heartbeat.lost:
+            raise JobLost()  # Finished after being re-claimed — the new owner's run counts
+    except JobLost:
+        job.refresh_from_db()  # Another worker owns it now — report its state, write nothing
+        return job
+    except Exception as e:
+        fields = {"status": EmbeddingJob.Status.FAILED, "error": f"{type(e).__name__}: {e}"}
+    else:
+        fields = {"status": EmbeddingJob.Status.DONE, "chunks_total": count, "chunks_done": count}
+    finally:
+        heartbeat.stop()
+
+    # ---------------- Step 3c: Record Outcome (only if still ours) ----------------
+    now = timezone.now()
+    fields.update(finished_at=now, heartbeat_at=now)
+    if owned(job).update(**fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
+    else:
+        job.refresh_from_db()
+    return job
@@ -0,0 +1,80 @@
+# ===============================================================
+#  file_upload/management/commands/bench_chunk_insert.py
+#  `python manage.py bench_chunk_insert --document <uuid> --rows 20000`
+#  Compares DocumentChunk.objects.bulk_create() with the COPY loader
+#
+#  Synthetic chunks (random 384-dim vectors + ~1000 chars of text) are attached
+#  to an existing document and inserted inside a transaction that is always
+#  rolled back — the database is left unchanged
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from file_upload.bulk_load import copy_chunks
+from file_upload.embedding_file import EMBEDDING_MODEL_NAME
+from file_upload.models import Document, DocumentChunk, EMBEDDING_DIMENSIONS
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark bulk_create vs COPY for DocumentChunk inserts (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--document", required=True, help="UUID of an existing Document to attach rows to.")
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            doc = Document.objects.get(id=options["document"])
+        except Document.DoesNotExist:
+            raise CommandError("Document not found")
+
+        rows, batch_size = options["rows"], options["batch_size"]
+
+        # ---------------- Step 1: Build Synthetic Rows ----------------
+        rng = random.Random(0)
+        texts = ["".join(rng.choices(string.ascii_letters + " ", k=1000)) for _ in range(min(rows, 100))]
+
+        def make_objs():
+            return [
+                DocumentChunk(
+                    document=doc,
+                    follow_group=doc.follow_group,
+                    chunk_index=i,
+                    text=texts[i % len(texts)],
+                    embedding=[rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSIONS)],
+                    embedding_model=EMBEDDING_MODEL_NAME,
+                )
+                for i in range(rows)
+            ]
+
+        # ---------------- Step 2: Time One Loader Inside a Rolled-Back Transaction ----------------
+        def timed(label, insert):
+            objs = make_objs()
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    insert(objs)
+                    elapsed = time.perf_counter() - started
+                    raise _Rollback()
+            except _Rollback:
+                pass
+            self.stdout.write(f"{label:<12} {elapsed:.3f}s ({rows / elapsed:,.0f} rows/s)")
+            return elapsed
+
+        bulk_s = timed("bulk_create", lambda objs: DocumentChunk.objects.bulk_create(objs, batch_size=batch_size))
+        copy_s = timed("copy", lambda objs: copy_chunks(objs, batch_size=batch_size))
+
+        # ---------------- Step 3: Report ----------------
+        self.stdout.write(self.style.SUCCESS(f"COPY speedup: {bulk_s / copy_s:.2f}x ({rows} rows, batch {batch_size})"))
@@ -0,0 +1,98 @@
+# ===============================================================
+#  file_upload/management/commands/bench_embeddings.py
+#  `python manage.py bench_embeddings --texts 512 --queries 50 --int8`
+#  Compares the Ollama embedding path with in-process sentence-transformers
+#
+#  For each backend:
+#   throughput → --texts synthetic ~1000-char chunks embedded in --batch-size batches
+#   latency    → --queries single short questions embedded one at a time (p50 / p95)
+#   agreement  → mean cosine similarity of its vectors vs the first backend that ran
+#                (how interchangeable the vectors are for search)
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import random
+import statistics
+import string
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import ollama_client
+from file_upload.embedders import LocalEmbedder
+
+
+class Command(BaseCommand):
+    help = "Benchmark Ollama vs in-process sentence-transformers embeddings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--texts", type=int, default=256, help="Chunks for the throughput run.")
+        parser.add_argument("--queries", type=int, default=30, help="Single-text calls for the latency run.")
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument("--threads", type=int, default=settings.RAG_LOCAL_EMBED_THREADS,
+                            help="torch CPU threads for the local backends (0 = default).")
+        parser.add_argument("--int8", action="store_true", help="Also benchmark the int8-quantized local model.")
+        parser.add_argument("--skip-ollama", action="store_true")
+        parser.add_argument("--skip-local", action="store_true")
+
+    def handle(self, *args, **options):
+        # ---------------- Step 1: Synthetic Inputs ----------------
+        rng = random.Random(0)
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(2000)]
+        texts = [" ".join(rng.choices(words, k=160))[:1000] for _ in range(options["texts"])]
+        queries = [" ".join(rng.choices(words, k=8)) + "?" for _ in range(options["queries"])]
+        batch_size = options["batch_size"]
+
+        # ---------------- Step 2: Backends to Compare ----------------
+        backends = []
+        if not options["skip_ollama"]:
+            backends.append(("ollama", lambda batch: ollama_client.embed(batch, model=settings.OLLAMA_EMBED_MODEL)))
+        if not options["skip_local"]:
+            local = LocalEmbedder(settings.RAG_LOCAL_EMBED_MODEL, threads=options["threads"], batch_size=batch_size)
+            backends.append(("local fp32", local.encode))
+            if options["int8"]:
+                local_q = LocalEmbedder(settings.RAG_LOCAL_EMBED_MODEL, threads=options["threads"],
+                                        quantize=True, batch_size=batch_size)
+                backends.append(("local int8", local_q.encode))
+        if not backends:
+            raise CommandError("Nothing to benchmark")
+
+        # ---------------- Step 3: Run Each Backend ----------------
+        reference, reference_label = None, None
+        for label, encode in backends:
+            try:
+                encode(queries[:1])  # Warm-up: connection / model load is not measured
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{label:<11} unavailable: {e}"))
+                continue
+
+            started = time.perf_counter()
+            vectors = []
+            for i in range(0, len(texts), batch_size):
+                vectors.extend(encode(texts[i:i + batch_size]))
+            elapsed = time.perf_counter() - started
+
+            latencies = []
+            for q in queries:
+                t0 = time.perf_counter()
+                encode([q])
+                latencies.append((time.perf_counter() - t0) * 1000)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+            line = (
+                f"{label:<11} {len(texts) / elapsed:8.1f} chunks/s   "
+                f"query p50 {statistics.median(latencies):6.1f} ms  p95 {p95:6.1f} ms"
+            )
+
+            # ---------------- Step 4: Agreement With the First Backend ----------------
+            current = np.asarray(vectors, dtype=np.float32)
+            current /= np.linalg.norm(current, axis=1, keepdims=True)
+            if reference is None:
+                reference, reference_label = current, label
+            else:
+                line += f"   cosine vs {reference_label}: {float((current * reference).sum(axis=1).mean()):.4f}"
+            self.stdout.write(line)
@@ -0,0 +1,67 @@
+# ===============================================================
+#  file_upload/management/commands/bench_pdf_extract.py
+#  `python manage.py bench_pdf_extract manual.pdf --workers 4 --repeat 3`
+#  Compares serial vs process-parallel PDF text extraction on a local file
+#
+#  Reports best-of-N wall time for each path, the speedup, and whether
+#  both paths produced identical text (they must — order is preserved)
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import io
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from pypdf import PdfReader
+
+from file_upload.pdf_extract import extract_pdf_text_serial, extract_pdf_text_parallel
+
+
+class Command(BaseCommand):
+    help = "Benchmark serial vs parallel PDF text extraction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Local PDF file to parse.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Process pool size.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per path (best time is reported).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"{path} does not exist")
+
+        # ---------------- Step 1: Load the File Once ----------------
+        with open(path, "rb") as f:
+            data = f.read()
+        page_count = len(PdfReader(io.BytesIO(data)).pages)
+        self.stdout.write(f"{path}: {page_count} pages, {len(data) / 1e6:.1f} MB")
+
+        # ---------------- Step 2: Time Both Paths ----------------
+        def best_of(fn):
+            best, text = None, None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                text = fn()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best, text
+
+        serial_s, serial_text = best_of(lambda: extract_pdf_text_serial(io.BytesIO(data)))
+        parallel_s, parallel_text = best_of(
+            lambda: extract_pdf_text_parallel(data, page_count, options["workers"])
+        )
+
+        # ---------------- Step 3: Report ----------------
+        self.stdout.write(f"serial:   {serial_s:.3f}s ({page_count / serial_s:.1f} pages/s)")
+        self.stdout.write(
+            f"parallel: {parallel_s:.3f}s ({page_count / parallel_s:.1f} pages/s, "
+            f"{options['workers']} workers)"
+        )
+        self.stdout.write(f"speedup:  {serial_s / parallel_s:.2f}x")
+
+        if serial_text == parallel_text:
+            self.stdout.write(self.style.SUCCESS("output identical"))
+        else:
+            self.stdout.write(self.style.ERROR("output differs between serial and parallel paths"))
@@ -0,0 +1,59 @@
+# ===============================================================
+#  file_upload/management/commands/build_vector_snapshots.py
+#  `python manage.py build_vector_snapshots --group 3 --ivf-lists 64`
+#  Writes full .npy vector snapshots (file_upload/vector_snapshots.py)
+#
+#  Without --group every group small enough for the memory index
+#  (≤ RAG_MEMORY_INDEX_MAX_CHUNKS chunks) is written. After that the embedding
+#  pipeline keeps each snapshot current incrementally
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from file_upload.models import DocumentChunk
+from file_upload.vector_snapshots import build_group_snapshot, snapshots_enabled
+
+
+class Command(BaseCommand):
+    help = "Write memory-mappable .npy vector snapshots for the in-process memory index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", type=int, action="append", help="follow_group to snapshot (repeatable).")
+        parser.add_argument(
+            "--ivf-lists", type=int, default=None,
+            help="k-means lists per group (default RAG_VECTOR_SNAPSHOT_IVF_LISTS, 0 = flat).",
+        )
+
+    def handle(self, *args, **options):
+        if not snapshots_enabled():
+            raise CommandError("RAG_VECTOR_SNAPSHOT_DIR is not set")
+
+        # ---------------- Step 1: Pick Groups ----------------
+        groups = options["group"]
+        if not groups:
+            groups = list(
+                DocumentChunk.objects
+                .filter(embedding__isnull=False)
+                .values("follow_group")
+                .annotate(n=Count("id"))
+                .filter(n__lte=settings.RAG_MEMORY_INDEX_MAX_CHUNKS)
+                .order_by("follow_group")
+                .values_list("follow_group", flat=True)
+            )
+
+        # ---------------- Step 2: Write One Snapshot per Group ----------------
+        for group_id in groups:
+            started = time.perf_counter()
+            meta = build_group_snapshot(group_id, ivf_lists=options["ivf_lists"])
+            self.stdout.write(
+                f"group {group_id}: {meta['count']} chunks, version {meta['version']}, "
+                f"{meta['ivf_lists']} IVF lists, {time.perf_counter() - started:.2f}s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"{len(groups)} snapshot(s) written to {settings.RAG_VECTOR_SNAPSHOT_DIR}"))
@@ -0,0 +1,66 @@
+# ===============================================================
+#  file_upload/management/commands/embedding_worker.py
+#  `python manage.py embedding_worker`
+#  Long-running worker that processes queued EmbeddingJob rows
+#
+#  Run one per CPU/node as needed — workers coordinate through the
+#  database only (SELECT ... FOR UPDATE SKIP LOCKED in claim_next_job)
+#
+#  Options:
+#   --once           → exit when the queue is empty (cron / one-off backfills)
+#   --poll-interval  → seconds to sleep when no job is available
+#   --worker-id      → name stored on claimed jobs (default "<hostname>:<pid>")
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from file_upload.jobs import claim_next_job, run_job, default_worker_id
+
+
+class Command(BaseCommand):
+    help = "Process queued document embedding jobs (safe to run on several nodes at once)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when no queued job is left.")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Idle sleep in seconds.")
+        parser.add_argument("--worker-id", default=None, help="Identifier stored on claimed jobs.")
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or default_worker_id()
+        self.stdout.write(f"embedding_worker {worker_id} started")
+
+        try:
+            while True:
+                # ---------------- Step 1: Fresh DB Connection ----------------
+                # Long-lived processes must drop connections that hit CONN_MAX_AGE or broke
+                close_old_connections()
+
+                # ---------------- Step 2: Claim a Job ----------------
+                job = claim_next_job(worker_id)
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                # ---------------- Step 3: Run It ----------------
+                self.stdout.write(f"job {job.id}: embedding document {job.document_id}")
+                job = run_job(job)
+
+                if job.status == job.Status.DONE:
+                    self.stdout.write(self.style.SUCCESS(f"job {job.id}: done ({job.chunks_done} chunks)"))
+                elif job.status == job.Status.FAILED:
+                    self.stdout.write(self.style.ERROR(f"job {job.id}: failed — {job.error}"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"job {job.id}: re-claimed by {job.worker}, stopped"))
+
+        except KeyboardInterrupt:
+            # A job interrupted here stays "running" and is re-claimed once its heartbeat goes stale
+            pass
+
+        self.stdout.write(f"embedding_worker {worker_id} stopped")
@@ -0,0 +1,101 @@
+# ===============================================================
+#  file_upload/management/commands/eval_vector_recall.py
+#  `python manage.py eval_vector_recall --group 7 --queries 100 --k 10`
+#  Measures recall@k and latency of each RAG_VECTOR_QUANTIZATION mode
+#  against an exact (sequential-scan) search on one tenant's real chunks
+#
+#  Queries are embeddings of randomly sampled chunks of the group
+#  Also prints the on-disk size of each ANN index, so the memory saved by
+#  halfvec / binary can be weighed against the recall lost
+#  A compact index only exists for the configured quantization — build the
+#  others temporarily with `sync_vector_indexes --quantization <mode>` to compare
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from pgvector.django import CosineDistance
+
+from file_upload.models import DocumentChunk
+from file_upload.retrieval import search_group_chunks, QUANTIZED_ORDER
+from file_upload.vector_indexes import FLOAT32_INDEX, QUANTIZED_INDEXES
+
+ANN_INDEXES = {
+    "none": FLOAT32_INDEX,
+    **{mode: name for mode, (name, _expression) in QUANTIZED_INDEXES.items()},
+}
+
+
+class Command(BaseCommand):
+    help = "Recall@k / latency of float32 vs halfvec vs binary ANN search for one group."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", type=int, required=True, help="follow_group to evaluate on.")
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--ef-search", type=int, default=None, help="Override RAG_HNSW_EF_SEARCH.")
+        parser.add_argument("--modes", default=",".join(["none", *QUANTIZED_ORDER]))
+
+    def handle(self, *args, **options):
+        group, k = options["group"], options["k"]
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+
+        # ---------------- Step 1: Sample Query Vectors ----------------
+        ids = list(
+            DocumentChunk.objects
+            .filter(follow_group=group, embedding__isnull=False)
+            .values_list("id", flat=True)
+        )
+        if not ids:
+            raise CommandError(f"Group {group} has no embedded chunks")
+        sample = random.Random(0).sample(ids, min(options["queries"], len(ids)))
+        queries = [
+            list(vec) for vec in
+            DocumentChunk.objects.filter(id__in=sample).values_list("embedding", flat=True)
+        ]
+        self.stdout.write(f"group {group}: {len(ids)} chunks, {len(queries)} queries, k={k}")
+
+        # ---------------- Step 2: Exact Ground Truth ----------------
+        # Index scans disabled → sequential scan with the exact cosine distance
+        truth = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_indexscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+            for vec in queries:
+                exact = (
+                    DocumentChunk.objects
+                    .filter(follow_group=group)
+                    .order_by(CosineDistance("embedding", vec))
+                    .values_list("id", flat=True)[:k]
+                )
+                truth.append({str(i) for i in exact})
+
+        # ---------------- Step 3: Each Mode ----------------
+        for mode in modes:
+            recalls, latencies = [], []
+            for vec, expected in zip(queries, truth):
+                started = time.perf_counter()
+                found = search_group_chunks(
+                    group, vec, top_k=k, ef_search=options["ef_search"], mode="vector", quantization=mode,
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(expected & {c["id"] for c in found}) / max(len(expected), 1))
+
+            self.stdout.write(
+                f"{mode:<8} recall@{k} mean {statistics.mean(recalls):.4f}  min {min(recalls):.2f}   "
+                f"p50 {statistics.median(latencies):6.2f} ms   index {self._index_size(mode)}"
+            )
+
+    def _index_size(self, mode) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_relation_size(to_regclass(%s)))",
+                [ANN_INDEXES.get(mode, "")],
+            )
+            return cursor.fetchone()[0] or "n/a"
+
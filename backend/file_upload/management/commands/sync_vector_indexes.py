@@ -0,0 +1,49 @@
+# ===============================================================
+#  file_upload/management/commands/sync_vector_indexes.py
+#  `python manage.py sync_vector_indexes [--quantization halfvec]`
+#  Builds the compact HNSW index of RAG_VECTOR_QUANTIZATION (or --quantization)
+#  and drops the compact index of any other mode (file_upload/vector_indexes.py)
+#
+#  Indexes are built and dropped CONCURRENTLY, so chunk INSERTs keep running
+#  Run it after changing RAG_VECTOR_QUANTIZATION, then restart the app
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from file_upload.vector_indexes import QUANTIZED_INDEXES, sync_quantized_indexes, index_sizes
+
+
+class Command(BaseCommand):
+    help = "Create the compact ANN index of the configured vector quantization and drop unused ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--quantization", choices=["none", *QUANTIZED_INDEXES], default=None,
+            help="Mode to build for (default RAG_VECTOR_QUANTIZATION).",
+        )
+
+    def handle(self, *args, **options):
+        quantization = options["quantization"] or settings.RAG_VECTOR_QUANTIZATION
+
+        # ---------------- Step 1: Create / Drop ----------------
+        # CONCURRENTLY cannot run inside a transaction — the cursor is in autocommit here
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            created, dropped = sync_quantized_indexes(cursor, quantization, concurrently=True)
+            sizes = index_sizes(cursor)
+
+        for name in created:
+            self.stdout.write(f"created {name}")
+        for name in dropped:
+            self.stdout.write(f"dropped {name}")
+
+        # ---------------- Step 2: Report ----------------
+        for name, size in sizes.items():
+            self.stdout.write(f"{name:<32} {'-' if size is None else f'{size / 1024 ** 2:.1f} MiB'}")
+        self.stdout.write(self.style.SUCCESS(f"quantization={quantization} ({time.perf_counter() - started:.1f}s)"))
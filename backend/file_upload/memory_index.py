@@ -0,0 +1,254 @@
+# ===============================================================
+#  file_upload/memory_index.py
+#  In-process vector index for small tenants (RAG_RETRIEVAL_ENGINE="memory")
+#
+#  For a group with a few thousand chunks, brute force in NumPy beats an
+#  ANN scan in Postgres: one (n × 384) @ (384,) dot product + argpartition
+#  is well under a millisecond, and the only DB access left per search is
+#  the indexed CorpusVersion lookup
+#
+#  FLOW OVERVIEW:
+#  Step 1 → Read the group's corpus version
+#  Step 2 → Reuse the cached TenantIndex if it was built for that version,
+#           otherwise (re)load every chunk of the group into one contiguous
+#           float32 matrix of L2-normalized vectors
+#  Step 3 → Cosine similarity = matrix @ normalized query → top-k via argpartition
+#
+#  Groups with more than RAG_MEMORY_INDEX_MAX_CHUNKS chunks (or bigger than
+#  RAG_MEMORY_INDEX_MAX_BYTES) are never loaded (search() returns None → the
+#  caller falls back to Postgres); that verdict is cached per corpus version
+#  Loaded groups are kept in an LRU capped at RAG_MEMORY_INDEX_MAX_BYTES in total
+#
+#  With RAG_VECTOR_SNAPSHOT_DIR set, Step 2 first memory-maps the group's .npy
+#  snapshot (vector_snapshots.py) when it matches the corpus version; chunk
+#  text is then fetched for the k results only. Postgres loads are written
+#  back as snapshots on a background thread, and warm_from_snapshots() maps
+#  them all at startup
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import Length
+
+from .corpus import get_corpus_version
+from .models import DocumentChunk, EMBEDDING_DIMENSIONS
+from .vector_snapshots import (
+    snapshots_enabled, read_snapshot, schedule_loaded_snapshot, list_snapshot_groups,
+    normalize_rows as _normalize,
+)
+
+
+# ================================================================
+#  Class: TenantIndex
+#  One group's chunks, frozen at one corpus version
+#  matrix row i ↔ ids[i] / document_ids[i] / texts[i] / chunk_indexes[i]
+#  texts is None for snapshot-backed indexes (matrix is a read-only memmap,
+#  ids are 36-byte strings) → top_k() fetches text + chunk_index of its k rows
+#  centroids / offsets → optional IVF lists of the snapshot; only the
+#  `probes` lists closest to the query are scanned
+# ================================================================
+class TenantIndex:
+
+    def __init__(self, version, ids, document_ids, texts, matrix, centroids=None, offsets=None, chunk_indexes=None):
+        self.version = version
+        self.ids = ids
+        self.document_ids = document_ids
+        self.texts = texts
+        self.chunk_indexes = chunk_indexes
+        self.matrix = matrix  # float32, C-contiguous, rows L2-normalized
+        self.centroids = centroids
+        self.offsets = offsets
+        self.probes = settings.RAG_VECTOR_SNAPSHOT_IVF_PROBES
+        text_bytes = sum(len(t) for t in texts) if texts is not None else 0
+        self.nbytes = matrix.nbytes + text_bytes + 100 * len(ids)  # vectors + text + row overhead
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(
+            snapshot.version, snapshot.ids, snapshot.document_ids, None, snapshot.vectors,
+            centroids=snapshot.centroids, offsets=snapshot.offsets,
+        )
+
+    # ---------------- Candidate rows ----------------
+    # None → every row; with IVF lists → the rows of the nearest `probes` lists
+    def _candidates(self, query):
+        if self.centroids is None or self.probes >= len(self.centroids):
+            return None
+        lists = np.argpartition(-(self.centroids @ query), self.probes - 1)[:self.probes]
+        return np.concatenate([np.arange(self.offsets[j], self.offsets[j + 1]) for j in lists])
+
+    # ---------------- top-k ----------------
+    # argpartition finds the k best in O(n); only those k are then sorted
+    def top_k(self, query, k):
+        rows = self._candidates(query)
+        scores = (self.matrix if rows is None else self.matrix[rows]) @ query
+        if len(scores) == 0:
+            return []
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        if rows is not None:
+            best = rows[best]
+
+        ids = [_as_str(self.ids[i]) for i in best]
+        if self.texts is not None:
+            rows = [(self.texts[i], self.chunk_indexes[i]) for i in best]
+        else:
+            by_id = {
+                str(pk): (text, chunk_index)
+                for pk, text, chunk_index in DocumentChunk.objects.filter(id__in=ids).values_list("id", "text", "chunk_index")
+            }
+            rows = [by_id.get(chunk_id, (None, None)) for chunk_id in ids]
+        return [
+            {"id": chunk_id, "text": text, "document_id": _as_str(self.document_ids[i]), "chunk_index": chunk_index}
+            for chunk_id, (text, chunk_index), i in zip(ids, rows, best)
+            if text is not None  # Row deleted after the snapshot's version was read
+        ]
+
+
+def _as_str(value):
+    return value.decode("ascii") if isinstance(value, bytes) else value
+
+
+# ================================================================
+#  Class: MemoryIndexCache
+#  group_id → TenantIndex, least recently used evicted first
+# ================================================================
+class MemoryIndexCache:
+
+    def __init__(self, max_bytes: int, max_chunks: int):
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        self._indexes = OrderedDict()
+        self._too_large = {}  # group_id → corpus version at which the group did not fit
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+    # ---------------- Step 2: Load One Group ----------------
+    # The version is read BEFORE the chunks: a concurrent bump can only make
+    # the index look older than its data (→ reloaded next time), never newer
+    # None → the group does not fit (too many chunks or bytes); the size is
+    # checked with one aggregate BEFORE any row is fetched
+    def _load(self, group_id, version):
+        snapshot = read_snapshot(group_id)
+        if snapshot is not None and snapshot.version == version and snapshot.count <= self.max_chunks:
+            index = TenantIndex.from_snapshot(snapshot)
+            return index if index.nbytes <= self.max_bytes else None
+
+        qs = DocumentChunk.objects.filter(follow_group=group_id, embedding__isnull=False)
+        size = qs.aggregate(chunks=Count("id"), text_bytes=Sum(Length("text")))
+        estimate = size["chunks"] * (EMBEDDING_DIMENSIONS * 4 + 100) + (size["text_bytes"] or 0)
+        if size["chunks"] > self.max_chunks or estimate > self.max_bytes:
+            return None
+
+        ids, document_ids, texts, chunk_indexes, vectors = [], [], [], [], []
+        rows = qs.values_list("id", "document_id", "text", "chunk_index", "embedding")
+        for chunk_id, document_id, text, chunk_index, embedding in rows:
+            ids.append(str(chunk_id))
+            document_ids.append(str(document_id))
+            texts.append(text)
+            chunk_indexes.append(chunk_index)
+            vectors.append(embedding)
+
+        matrix = np.array(vectors, dtype=np.float32).reshape(len(vectors), EMBEDDING_DIMENSIONS)
+        matrix = np.ascontiguousarray(_normalize(matrix))
+        if snapshots_enabled():
+            schedule_loaded_snapshot(group_id, version, ids, document_ids, matrix)  # Next cold start maps it
+        return TenantIndex(version, ids, document_ids, texts, matrix, chunk_indexes=chunk_indexes)
+
+    def _store(self, group_id, index):
+        with self._lock:
+            self.loads += 1
+            self._indexes[group_id] = index
+            self._indexes.move_to_end(group_id)
+            while sum(i.nbytes for i in self._indexes.values()) > self.max_bytes:
+                self._indexes.popitem(last=False)
+                self.evictions += 1
+
+    # A group that did not fit is remembered with its corpus version: until the
+    # version changes its searches go straight to Postgres, without re-reading
+    # the snapshot or re-counting its chunks
+    def _get(self, group_id):
+        version = get_corpus_version(group_id)
+
+        with self._lock:
+            if self._too_large.get(group_id) == version:
+                self.fallbacks += 1
+                return None
+            index = self._indexes.get(group_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(group_id)
+                self.hits += 1
+                return index
+
+        index = self._load(group_id, version)  # Outside the lock — other groups keep searching
+        if index is None or index.nbytes > self.max_bytes:
+            with self._lock:
+                self._indexes.pop(group_id, None)
+                self._too_large[group_id] = version
+                self.fallbacks += 1
+            return None
+
+        self._store(group_id, index)
+        return index
+
+    # ---------------- Startup warm-up ----------------
+    # Maps every snapshot without touching the database — each index keeps the
+    # version it was written at and _get() still checks it on first search
+    def warm_from_snapshots(self) -> int:
+        warmed = 0
+        for group_id in list_snapshot_groups():
+            snapshot = read_snapshot(group_id)
+            if snapshot is None or snapshot.count > self.max_chunks:
+                continue
+            index = TenantIndex.from_snapshot(snapshot)
+            if self.stats()["bytes"] + index.nbytes > self.max_bytes:
+                break
+            self._store(group_id, index)
+            warmed += 1
+        return warmed
+
+    # ---------------- Step 3: Search ----------------
+    # Returns list[dict] like search_similar_chunks(), or None when the
+    # group is too large for memory (caller uses Postgres instead)
+    def search(self, group_id, query_vector, top_k=10):
+        index = self._get(group_id)
+        if index is None:
+            return None
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        return index.top_k(query, top_k)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._too_large.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "groups": len(self._indexes),
+                "chunks": sum(len(i.ids) for i in self._indexes.values()),
+                "bytes": sum(i.nbytes for i in self._indexes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "fallbacks": self.fallbacks,
+                "too_large_groups": len(self._too_large),
+            }
+
+
+# ---------------- Process-wide instance ----------------
+memory_index = MemoryIndexCache(
+    max_bytes=settings.RAG_MEMORY_INDEX_MAX_BYTES,
+    max_chunks=settings.RAG_MEMORY_INDEX_MAX_CHUNKS,
+)
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:26
+
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+def backfill_chunk_follow_group(apps, schema_editor):
+    Document = apps.get_model("file_upload", "Document")
+    DocumentChunk = apps.get_model("file_upload", "DocumentChunk")
+    for doc_id, group_id in Document.objects.values_list("id", "follow_group"):
+        DocumentChunk.objects.filter(document_id=doc_id).update(follow_group=group_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0003_document_follow_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='follow_group',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_chunk_follow_group, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='embedding',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=384, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='doc_chunk_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=models.Index(fields=['follow_group'], name='doc_chunk_follow_group_idx'),
+        ),
+    ]
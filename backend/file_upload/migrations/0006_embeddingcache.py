@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:28
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0005_embeddingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('embedding_model', models.CharField(max_length=255)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=384)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'documents_embedding_cache',
+                'constraints': [models.UniqueConstraint(fields=('embedding_model', 'content_hash'), name='embedding_cache_model_hash_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:38
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0009_corpusversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SemanticCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('follow_group', models.PositiveIntegerField()),
+                ('corpus_version', models.PositiveBigIntegerField()),
+                ('history_digest', models.CharField(max_length=64)),
+                ('embedding_model', models.CharField(max_length=255)),
+                ('question', models.TextField()),
+                ('question_embedding', pgvector.django.vector.VectorField(dimensions=384)),
+                ('answer', models.TextField()),
+                ('chunks', models.JSONField(default=list)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'documents_semantic_cache',
+                'indexes': [models.Index(fields=['follow_group', 'corpus_version'], name='semantic_cache_scope_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:43
+#
+# Builds ONLY the compact HNSW index of the configured RAG_VECTOR_QUANTIZATION
+# (nothing for the default "none"). Switch later with
+# `python manage.py sync_vector_indexes` — see file_upload/vector_indexes.py
+
+from django.conf import settings
+from django.db import migrations
+
+
+INDEXES = {
+    "halfvec": (
+        "doc_chunk_embedding_half_hnsw",
+        "(embedding::halfvec(384)) halfvec_cosine_ops",
+    ),
+    "binary": (
+        "doc_chunk_embedding_bit_hnsw",
+        "(binary_quantize(embedding)::bit(384)) bit_hamming_ops",
+    ),
+}
+
+
+def create_configured_index(apps, schema_editor):
+    quantization = getattr(settings, "RAG_VECTOR_QUANTIZATION", "none")
+    if quantization not in INDEXES:
+        return
+    name, expression = INDEXES[quantization]
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {name} ON documents_document_chunk "
+        f"USING hnsw ({expression}) WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    for name, _expression in INDEXES.values():
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0010_semanticcacheentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_configured_index, drop_indexes),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0012_chatsession_chatturn'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['follow_group', '-created_at', '-id'], name='document_group_created_idx'),
+        ),
+    ]
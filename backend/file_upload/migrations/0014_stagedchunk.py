@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:15
+
+import django.db.models.deletion
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0013_document_group_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run', models.UUIDField()),
+                ('chunk_index', models.IntegerField()),
+                ('text', models.TextField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=384)),
+                ('embedding_model', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(db_column='document_id', on_delete=django.db.models.deletion.CASCADE, related_name='staged_chunks', to='file_upload.document')),
+            ],
+            options={
+                'db_table': 'documents_document_chunk_staging',
+                'indexes': [models.Index(fields=['run', 'chunk_index'], name='staged_chunk_run_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_upload', '0014_stagedchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='ingest_run',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.DeleteModel(
+            name='StagedChunk',
+        ),
+    ]
@@ -1,11 +1,19 @@
 # ===============================================================
 #  file_upload/models.py
-#  Two models power the RAG (Retrieval-Augmented Generation) system:
+#  These models power the RAG (Retrieval-Augmented Generation) system:
 #
 #  Document      → stores the uploaded file metadata + MinIO file reference
 #  DocumentChunk → stores split text segments + their pgvector embeddings
 #
+#  EmbeddingJob  → one queued/background run of the embedding pipeline for a Document
+#  EmbeddingCache → content-addressed store of vectors keyed by (model, sha256(text))
+#  CorpusVersion → per-company counter bumped whenever the searchable corpus changes
+#  SemanticCacheEntry → question embedding + finished answer, reused for paraphrased questions
+#  ChatSession   → one server-side conversation (rag_chat or doc_chat) + its rolling summary
+#  ChatTurn      → one user question or assistant answer inside a ChatSession
+#
 #  Relationship: one Document → many DocumentChunks (after embedding)
+#                one Document → many EmbeddingJobs (one per embed request)
 # ===============================================================
 
 
@@ -14,7 +22,9 @@ import uuid
 import mimetypes
 from django.conf import settings
 from django.db import models
-from pgvector.django import VectorField   # PostgreSQL pgvector extension — stores float[] as a vector column
+from django.contrib.postgres.search import SearchVector, SearchVectorField  # Full-text search column
+from django.contrib.postgres.indexes import GinIndex
+from pgvector.django import VectorField, HnswIndex   # pgvector — vector columns + ANN index
 from storages.backends.s3boto3 import S3Boto3Storage  # Sends files to MinIO instead of local disk
 
 
@@ -23,6 +33,11 @@ from storages.backends.s3boto3 import S3Boto3Storage  # Sends files to MinIO ins
 # Reused on the file field so all uploads land in the configured bucket
 s3_storage = S3Boto3Storage()
 
+# ---------------- Step 1b: Embedding Dimensions ----------------
+# all-minilm:l6-v2 produces 384-dim vectors
+# pgvector can only build an ANN index on a fixed-dimension column, so the size is pinned here
+EMBEDDING_DIMENSIONS = 384
+
 
 # ================================================================
 #  Model 1: Document
@@ -84,6 +99,11 @@ class Document(models.Model):
     class Meta:
         db_table = "documents_document"
         ordering = ["-created_at"]  # Newest files appear first in queries
+        indexes = [
+            # list_files: one group's files newest first, id breaks created_at ties
+            # → every keyset page is a short range scan, however many files the group has
+            models.Index(fields=["follow_group", "-created_at", "-id"], name="document_group_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.original_filename} ({self.id})"
@@ -113,12 +133,32 @@ class DocumentChunk(models.Model):
         related_name="chunks",
     )
 
+    # ---------------- Step 3b-2: Denormalized Company Group ----------------
+    # Copy of document.follow_group stored on every chunk
+    # Lets the vector search filter by tenant on this table alone — no join to documents_document,
+    # so Postgres can combine the tenant filter with the HNSW index scan
+    follow_group = models.PositiveIntegerField(default=0)
+
     # ---------------- Step 3c: Chunk Position & Content ----------------
     # chunk_index tracks the order of this chunk within the document
     # text holds the raw text of this chunk (what gets searched and shown as context)
     chunk_index = models.IntegerField()
     text = models.TextField()
 
+    # ---------------- Step 3c-2: Full-Text Search Column ----------------
+    # Generated by Postgres from text (to_tsvector('english', text)) — never written by Django
+    # GIN-indexed below; used by the lexical leg of hybrid retrieval so exact terms
+    # (invoice numbers, names, error codes) are found even when embeddings miss them
+    search_vector = models.GeneratedField(
+        expression=SearchVector("text", config="english"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    # sha256 of text — lets incremental re-embedding diff old vs new chunk lists
+    # without comparing full texts (blank for chunks created before this field existed)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+
     # ---------------- Step 3d: Optional Metadata ----------------
     # JSON blob for storing extra info (page number, section title, etc.)
     # Currently not populated but reserved for future use
@@ -126,9 +166,10 @@ class DocumentChunk(models.Model):
 
     # ---------------- Step 3e: Vector Embedding ----------------
     # VectorField is a pgvector column — stores the float[] output of the embedding model
-    # CosineDistance queries run directly against this column using a pgvector index
+    # CosineDistance queries run directly against this column using the HNSW index below
+    # dimensions is fixed → required for the ANN index
     # null=True → field is empty until embed_file is called
-    embedding = VectorField(null=True, blank=True)
+    embedding = VectorField(dimensions=EMBEDDING_DIMENSIONS, null=True, blank=True)
 
     # ---------------- Step 3f: Embedding Provenance ----------------
     # Tracks which embedding model was used (e.g., "all-minilm:l6-v2")
@@ -136,6 +177,12 @@ class DocumentChunk(models.Model):
     embedding_model = models.CharField(max_length=255)
     embedding_created_at = models.DateTimeField(null=True, blank=True)
 
+    # ---------------- Step 3f-2: Streaming Ingest Run ----------------
+    # Set by stream_embeddings_for_document() on the rows it writes batch by batch;
+    # the previous rows of the document are deleted once the run has finished
+    # null → written by the regular (in-memory) pipeline
+    ingest_run = models.UUIDField(null=True, blank=True)
+
     # ---------------- Step 3g: Timestamps ----------------
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -143,6 +190,267 @@ class DocumentChunk(models.Model):
     class Meta:
         db_table = "documents_document_chunk"
         ordering = ["document", "chunk_index"]  # Chunks are ordered by document then position
+        indexes = [
+            # HNSW approximate-nearest-neighbour index for CosineDistance ordering
+            # m / ef_construction are pgvector's defaults — trade build time for recall here
+            HnswIndex(
+                name="doc_chunk_embedding_hnsw",
+                fields=["embedding"],
+                m=16,
+                ef_construction=64,
+                opclasses=["vector_cosine_ops"],
+            ),
+            # Compact (halfvec / binary) HNSW indexes for RAG_VECTOR_QUANTIZATION are
+            # created only when that setting asks for them — see file_upload/vector_indexes.py
+            # Tenant filter used by every group-wide RAG search
+            models.Index(fields=["follow_group"], name="doc_chunk_follow_group_idx"),
+            # Full-text index for the lexical leg of hybrid retrieval
+            GinIndex(fields=["search_vector"], name="doc_chunk_search_vector_gin"),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.chunk_index} of {self.document_id}"
+
+
+# ================================================================
+#  Model 3: EmbeddingJob
+#  One background run of create_embeddings_for_document() for a Document
+#
+#  Flow: embed_file_async API → EmbeddingJob(status=queued)
+#        → `manage.py embedding_worker` claims it with SELECT ... FOR UPDATE SKIP LOCKED
+#        → status=running (progress counters updated per batch)
+#        → status=done / failed
+#  Several workers on different nodes can poll the same table safely —
+#  SKIP LOCKED makes each worker skip rows another worker is claiming
+# ================================================================
+class EmbeddingJob(models.Model):
+
+    # ---------------- Step 4a: Status Enum ----------------
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    # ---------------- Step 4b: Primary Key ----------------
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # ---------------- Step 4c: Target Document + Ownership ----------------
+    # CASCADE → deleting the Document also removes its job history
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        db_column="document_id",
+        related_name="embedding_jobs",
+    )
+    # Same company namespace as Document.follow_group — status lookups are group-scoped
+    follow_group = models.PositiveIntegerField(default=0)
+    # Who asked for the job (kept even if the user is later removed)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="embedding_jobs",
+    )
+
+    # ---------------- Step 4d: State + Progress ----------------
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED)
+    chunks_total = models.IntegerField(default=0)  # Known once the text has been chunked
+    chunks_done = models.IntegerField(default=0)   # Incremented after every embedded batch
+    error = models.TextField(blank=True)           # Exception text when status=failed
+
+    # ---------------- Step 4e: Worker Bookkeeping ----------------
+    # worker       → "<hostname>:<pid>" of the process that claimed the job
+    # attempts     → how many times the job was claimed (stale jobs are re-claimed)
+    # heartbeat_at → refreshed by the worker while the job runs; a running job whose
+    #                heartbeat is too old is treated as abandoned by a crashed worker
+    worker = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+
+    # ---------------- Step 4f: Timestamps ----------------
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "documents_embedding_job"
+        ordering = ["-created_at"]
+        indexes = [
+            # Workers claim the oldest queued job first
+            models.Index(fields=["status", "created_at"], name="embedding_job_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"EmbeddingJob {self.id} ({self.status}) for {self.document_id}"
+
+
+
+# ================================================================
+#  Model 4: EmbeddingCache
+#  Content-addressed cache of embedding vectors
+#  Key: (embedding_model, sha256 of the chunk text)
+#
+#  embed_chunks() looks chunks up here before calling Ollama, so
+#  re-embedding an unchanged file and shared boilerplate (headers, disclaimers,
+#  templates) across documents never hits the model twice
+#  Not tenant-scoped on purpose — the key is derived from the text itself,
+#  and the vector reveals nothing the caller didn't already send
+# ================================================================
+class EmbeddingCache(models.Model):
+    embedding_model = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64)  # sha256 hex digest of the chunk text
+    embedding = VectorField(dimensions=EMBEDDING_DIMENSIONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "documents_embedding_cache"
+        constraints = [
+            # One vector per (model, text) — also the lookup index
+            models.UniqueConstraint(
+                fields=["embedding_model", "content_hash"],
+                name="embedding_cache_model_hash_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.embedding_model}:{self.content_hash[:12]}"
+
+
+# ================================================================
+#  Model 5: CorpusVersion
+#  One row per company group — version increments every time a document
+#  of the group is embedded (or re-embedded) or deleted
+#
+#  Answer caches put the version in their key, so a cached answer is only
+#  ever served for the exact corpus it was generated from — bumping the
+#  version invalidates every cached answer of the group at once
+# ================================================================
+class CorpusVersion(models.Model):
+    follow_group = models.PositiveIntegerField(unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "documents_corpus_version"
+
+    def __str__(self):
+        return f"group {self.follow_group} @ v{self.version}"
+
+
+# ================================================================
+#  Model 6: SemanticCacheEntry
+#  One answered rag_chat question: its embedding + the answer and sources
+#
+#  Before retrieval, rag_chat looks for the nearest earlier question of the
+#  same group, corpus version and chat history — if it is similar enough
+#  (RAG_SEMANTIC_CACHE_THRESHOLD), the stored answer is returned and the
+#  LLM is never called
+#
+#  No ANN index on purpose: the (follow_group, corpus_version) index narrows
+#  a lookup to a few hundred rows at most, and an exact distance scan over
+#  those never misses the true nearest question the way a filtered HNSW scan can
+# ================================================================
+class SemanticCacheEntry(models.Model):
+    # ---------------- Step 6a: Scope ----------------
+    follow_group = models.PositiveIntegerField()
+    corpus_version = models.PositiveBigIntegerField()  # CorpusVersion.version the answer was built from
+    history_digest = models.CharField(max_length=64)   # sha256 of the chat history sent with the question
+    embedding_model = models.CharField(max_length=255)
+
+    # ---------------- Step 6b: Question ----------------
+    question = models.TextField()
+    question_embedding = VectorField(dimensions=EMBEDDING_DIMENSIONS)
+
+    # ---------------- Step 6c: Cached Answer ----------------
+    answer = models.TextField()
+    chunks = models.JSONField(default=list)  # Sources returned alongside the answer
+
+    # ---------------- Step 6d: Usage ----------------
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "documents_semantic_cache"
+        indexes = [
+            models.Index(fields=["follow_group", "corpus_version"], name="semantic_cache_scope_idx"),
+        ]
+
+    def __str__(self):
+        return f"group {self.follow_group} v{self.corpus_version}: {self.question[:50]}"
+
+
+# ================================================================
+#  Model 7: ChatSession
+#  A conversation stored server-side — clients send session_id instead of
+#  re-sending the whole history with every question
+#
+#  Prompts carry `summary` (turns 0 .. summarized_turns-1, compacted by the
+#  LLM in the background — see chat_sessions.py) plus the latest turns verbatim
+#  document → set for doc_chat sessions, NULL for group-wide rag_chat sessions
+# ================================================================
+class ChatSession(models.Model):
+    # ---------------- Step 7a: Identity + Scope ----------------
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="chat_sessions",
+    )
+    follow_group = models.PositiveIntegerField(default=0)
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,  # A doc_chat conversation is meaningless without its file
+        null=True,
+        blank=True,
+        related_name="chat_sessions",
+    )
+    title = models.CharField(max_length=255, blank=True)
+
+    # ---------------- Step 7b: Rolling Summary ----------------
+    summary = models.TextField(blank=True)
+    summarized_turns = models.PositiveIntegerField(default=0)  # Turns already folded into summary
+    turn_count = models.PositiveIntegerField(default=0)        # Next ChatTurn.position
+
+    # ---------------- Step 7c: Timestamps ----------------
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "documents_chat_session"
+        ordering = ["-updated_at"]
+        indexes = [
+            models.Index(fields=["user", "-updated_at"], name="chat_session_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"ChatSession {self.id} ({self.turn_count} turns)"
+
+
+# ================================================================
+#  Model 8: ChatTurn
+#  One message of a ChatSession — position is 0, 1, 2, ... in order
+# ================================================================
+class ChatTurn(models.Model):
+
+    class Role(models.TextChoices):
+        USER = "user", "User"
+        ASSISTANT = "assistant", "Assistant"
+
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name="turns")
+    position = models.PositiveIntegerField()
+    role = models.CharField(max_length=16, choices=Role.choices)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "documents_chat_turn"
+        ordering = ["session", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["session", "position"], name="chat_turn_position_unique"),
+        ]
 
     def __str__(self):
-        return f"Chunk {self.chunk_index} of {self.document_id}"
\ No newline at end of file
+        return f"{self.role} #{self.position} of {self.session_id}"
@@ -0,0 +1,78 @@
+# ===============================================================
+#  file_upload/pagination.py
+#  Keyset (cursor) pagination for list_files
+#
+#  OFFSET pages get slower the deeper they go (Postgres still walks every
+#  skipped row). A keyset page starts where the previous one ended instead:
+#
+#  FLOW OVERVIEW:
+#  Step 1 → Rows are ordered by (-created_at, -id) — id makes the order total,
+#           so two files uploaded in the same microsecond are never skipped
+#  Step 2 → The cursor encodes (created_at, id) of the last row of a page
+#  Step 3 → The next page is WHERE (created_at, id) < cursor LIMIT n+1,
+#           a range scan on document_group_created_idx; the extra row only
+#           tells whether another page exists
+#
+#  Cursors are opaque base64 strings — clients pass back next_cursor as is
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import base64
+import binascii
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# ================================================================
+#  Helper 1: encode_cursor / decode_cursor
+#  cursor = urlsafe base64 of {"t": created_at ISO 8601, "id": document UUID}
+# ================================================================
+def encode_cursor(doc) -> str:
+    raw = json.dumps({"t": doc.created_at.isoformat(), "id": str(doc.id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        created_at = parse_datetime(data["t"])
+        doc_id = uuid.UUID(data["id"])
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor.")
+    if created_at is None:
+        raise InvalidCursor("Invalid cursor.")
+    return created_at, doc_id
+
+
+# ================================================================
+#  Function 1: keyset_page
+#  qs     → Document queryset (already filtered by group / filters)
+#  cursor → next_cursor of the previous page, or None for the first page
+#  limit  → rows per page
+#  Returns (rows, next_cursor) — next_cursor is None on the last page
+#  Raises InvalidCursor for a cursor this module did not produce
+# ================================================================
+def keyset_page(qs, cursor, limit: int):
+    qs = qs.order_by("-created_at", "-id")
+
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        # created_at__lte bounds the index range scan; the OR resolves ties on id
+        qs = qs.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=doc_id)
+        )
+
+    rows = list(qs[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,84 @@
+# ===============================================================
+#  file_upload/pdf_extract.py
+#  Serial and process-parallel PDF text extraction
+#
+#  Kept free of Django imports on purpose: ProcessPoolExecutor workers
+#  import this module, and under the "spawn"/"forkserver" start methods
+#  they would otherwise need a configured Django app registry
+#
+#  FLOW (parallel mode):
+#  Step 1 → Read the PDF bytes once in the parent process
+#  Step 2 → Split the page range into small contiguous slices
+#  Step 3 → Each worker opens the PDF once (initializer) and extracts its slices
+#  Step 4 → Slices come back in order (pool.map) and are joined with "\n"
+#           → identical output to the serial path
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+# Slices per worker — more, smaller slices even out pages that are slow to parse
+SLICES_PER_WORKER = 4
+
+# Per-process PdfReader, created once by _init_worker()
+_worker_reader = None
+
+
+# ================================================================
+#  Function 1: extract_pdf_text_serial
+#  Current single-threaded behaviour — one page after another
+# ================================================================
+def extract_pdf_text_serial(fileobj) -> str:
+    reader = PdfReader(fileobj)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+# ================================================================
+#  Worker helpers (run inside the pool processes)
+# ================================================================
+def _init_worker(data: bytes):
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(data))
+
+
+def _extract_slice(page_range):
+    start, stop = page_range
+    return "\n".join(
+        _worker_reader.pages[i].extract_text() or ""
+        for i in range(start, stop)
+    )
+
+
+# ================================================================
+#  Helper: page_slices
+#  Splits [0, page_count) into contiguous (start, stop) ranges
+# ================================================================
+def page_slices(page_count: int, workers: int):
+    pieces = max(1, min(page_count, workers * SLICES_PER_WORKER))
+    size = -(-page_count // pieces)  # ceil division
+    return [(i, min(i + size, page_count)) for i in range(0, page_count, size)]
+
+
+# ================================================================
+#  Function 2: extract_pdf_text_parallel
+#  Splits the page range across a ProcessPoolExecutor of `workers` processes
+#  and reassembles the text in page order
+#
+#  data       → the raw PDF bytes (sent once to each worker)
+#  page_count → len(reader.pages), already known by the caller
+# ================================================================
+def extract_pdf_text_parallel(data: bytes, page_count: int, workers: int) -> str:
+    if page_count == 0:
+        return ""
+
+    slices = page_slices(page_count, workers)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(slices)),
+        initializer=_init_worker,
+        initargs=(data,),
+    ) as pool:
+        return "\n".join(pool.map(_extract_slice, slices))
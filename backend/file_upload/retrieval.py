@@ -0,0 +1,340 @@
+# ===============================================================
+#  file_upload/retrieval.py
+#  Vector search over DocumentChunk for the RAG views
+#
+#  FLOW OVERVIEW (_search_scope):
+#  Step 1 → Open a short transaction and apply per-query ANN search params
+#           (hnsw.ef_search / ivfflat.probes via SET LOCAL)
+#  Step 2 → Filter chunks by tenant using the denormalized follow_group column
+#  Step 3 → Order by CosineDistance → served by the HNSW index
+#  Step 4 → Return plain dicts that build_prompt() can consume
+#
+#  RETRIEVAL MODES (RAG_RETRIEVAL_MODE, or mode= per call):
+#  "vector" → ANN search on the embedding only
+#  "hybrid" → ANN search + full-text search (GIN on search_vector),
+#             merged with reciprocal rank fusion in ONE SQL round trip
+#
+#  QUANTIZATION (RAG_VECTOR_QUANTIZATION, or quantization= per call):
+#  "none"    → ANN search on the float32 HNSW index
+#  "halfvec" / "binary" → coarse ANN search on the compact expression index,
+#             then the top RAG_QUANTIZED_RERANK_CANDIDATES are re-ranked
+#             with the exact float32 cosine distance
+#  Measure recall with `python manage.py eval_vector_recall --group <id>`
+#
+#  ENGINE (RAG_RETRIEVAL_ENGINE, or engine= per call):
+#  "postgres" → everything above
+#  "memory"   → group-wide vector-only searches run on an in-process NumPy
+#               matrix (memory_index.py); large groups still use Postgres
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from pgvector import Vector  # Formats the query vector as a pgvector literal for raw SQL
+from pgvector.django import CosineDistance  # Annotates chunks with their vector distance from the query
+
+from .memory_index import memory_index  # Per-group NumPy matrices for RAG_RETRIEVAL_ENGINE="memory"
+from .models import DocumentChunk, EMBEDDING_DIMENSIONS
+from .utils import get_group_id  # Resolves company group_id for any user
+
+
+# ================================================================
+#  Helper 1: vector_search_params
+#  Context manager that applies ANN search parameters for ONE query
+#
+#  ef_search → HNSW candidate list size (higher = better recall, slower)
+#  probes    → IVFFlat lists scanned (only used if an IVFFlat index exists)
+#  iterative_scan → pgvector >= 0.8 keeps scanning the index until enough rows
+#                   pass the tenant filter (e.g., "relaxed_order")
+#
+#  set_config(..., is_local=true) is the parameterized form of SET LOCAL —
+#  the values only live until the surrounding transaction ends,
+#  so they never leak into other requests sharing the connection
+# ================================================================
+@contextmanager
+def vector_search_params(ef_search=None, probes=None, min_ef_search=0):
+    if ef_search is None:
+        ef_search = settings.RAG_HNSW_EF_SEARCH
+    # An HNSW scan returns at most ef_search rows — the quantized coarse
+    # search needs at least as many as it is going to re-rank
+    ef_search = max(ef_search or 0, min_ef_search)
+    if probes is None:
+        probes = settings.RAG_IVFFLAT_PROBES
+    iterative_scan = settings.RAG_HNSW_ITERATIVE_SCAN
+
+    with transaction.atomic():
+        # SET LOCAL is Postgres-only — other backends just run the plain query
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                if ef_search:
+                    cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", [str(int(ef_search))])
+                if probes:
+                    cursor.execute("SELECT set_config('ivfflat.probes', %s, true)", [str(int(probes))])
+                if iterative_scan:
+                    cursor.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", [iterative_scan])
+        yield
+
+
+# ================================================================
+#  Helper 2: _chunk_to_dict
+#  Shapes a DocumentChunk row into the dict format used by build_prompt()
+# ================================================================
+def _chunk_to_dict(c):
+    return {
+        "id": str(c.id),
+        "text": c.text,           # The text that will be injected as LLM context
+        "document_id": str(c.document_id),
+        "chunk_index": c.chunk_index,  # Lets the context packer merge neighbouring chunks
+    }
+
+
+# ================================================================
+#  Helper 3: _nearest_sql
+#  SQL (a sub-select) for the nearest chunks of one scope → (id, distance)
+#  ordered by EXACT cosine distance, LIMIT %(candidates)s
+#
+#  quantization="none" → plain ORDER BY on the float32 HNSW index
+#  otherwise           → inner ORDER BY on the compact index picks
+#                        %(rerank)s coarse candidates, the outer query
+#                        re-ranks only those with the float32 vectors
+#
+#  QUANTIZED_ORDER expressions must stay identical to the index expressions
+#  in vector_indexes.QUANTIZED_INDEXES, or PostgreSQL will not use those indexes
+# ================================================================
+QUANTIZED_ORDER = {
+    "halfvec": (
+        f"embedding::halfvec({EMBEDDING_DIMENSIONS}) <=> %(query_vector)s::halfvec({EMBEDDING_DIMENSIONS})"
+    ),
+    "binary": (
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS}) <~> binary_quantize(%(query_vector)s::vector)"
+    ),
+}
+
+
+def _resolve_quantization(quantization) -> str:
+    quantization = quantization or settings.RAG_VECTOR_QUANTIZATION
+    if quantization not in ("none", *QUANTIZED_ORDER):
+        raise ValueError(f"Unknown vector quantization: {quantization!r}")
+    return quantization
+
+
+def _nearest_sql(table, scope, quantization) -> str:
+    if quantization == "none":
+        return f"""
+        SELECT id, embedding <=> %(query_vector)s::vector AS distance
+        FROM {table}
+        WHERE {scope}
+        ORDER BY distance
+        LIMIT %(candidates)s
+        """
+    return f"""
+        SELECT id, embedding <=> %(query_vector)s::vector AS distance
+        FROM (
+            SELECT id, embedding
+            FROM {table}
+            WHERE {scope}
+            ORDER BY {QUANTIZED_ORDER[quantization]}
+            LIMIT %(rerank)s
+        ) AS coarse
+        ORDER BY distance
+        LIMIT %(candidates)s
+        """
+
+
+def _rerank_size(top_k) -> int:
+    return max(top_k, settings.RAG_QUANTIZED_RERANK_CANDIDATES)
+
+
+# ================================================================
+#  Helper 4: _quantized_search
+#  Vector-only search through a compact index + exact rerank
+# ================================================================
+def _quantized_search(scope_column, scope_value, query_vector, top_k, quantization):
+    table = DocumentChunk._meta.db_table
+    nearest = _nearest_sql(table, f"{scope_column} = %(scope)s", quantization)
+    sql = f"""
+    SELECT c.id, c.text, c.document_id, c.chunk_index
+    FROM ({nearest}) AS nearest
+    JOIN {table} AS c ON c.id = nearest.id
+    ORDER BY nearest.distance
+    """
+    params = {
+        "scope": scope_value,
+        "query_vector": Vector(query_vector).to_text(),
+        "candidates": top_k,
+        "rerank": _rerank_size(top_k),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {"id": str(chunk_id), "text": text, "document_id": str(document_id), "chunk_index": chunk_index}
+        for chunk_id, text, document_id, chunk_index in rows
+    ]
+
+
+# ================================================================
+#  Helper 5: _hybrid_search
+#  Runs both retrieval legs in one statement and fuses them with RRF
+#
+#  vec leg → top-N chunks by cosine distance (HNSW index)
+#  lex leg → top-N chunks by ts_rank_cd for websearch_to_tsquery(question) (GIN index)
+#  fusion  → score = Σ 1 / (RAG_HYBRID_RRF_K + rank) over the legs a chunk appears in
+#
+#  scope_column is a trusted column name ("follow_group" / "document_id");
+#  the scope value and everything user-supplied go through query parameters
+# ================================================================
+HYBRID_SQL = """
+WITH vec AS (
+    SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+    FROM ({nearest}) AS nearest
+),
+lex AS (
+    SELECT id, ROW_NUMBER() OVER (ORDER BY score DESC) AS rank
+    FROM (
+        SELECT c.id, ts_rank_cd(c.search_vector, q.query) AS score
+        FROM {table} AS c, websearch_to_tsquery('english', %(question)s) AS q(query)
+        WHERE {scope} AND c.search_vector @@ q.query
+        ORDER BY score DESC
+        LIMIT %(candidates)s
+    ) AS matched
+)
+SELECT c.id, c.text, c.document_id, c.chunk_index,
+       COALESCE(1.0 / (%(rrf_k)s + vec.rank), 0) + COALESCE(1.0 / (%(rrf_k)s + lex.rank), 0) AS score
+FROM vec
+FULL OUTER JOIN lex ON lex.id = vec.id
+JOIN {table} AS c ON c.id = COALESCE(vec.id, lex.id)
+ORDER BY score DESC
+LIMIT %(top_k)s
+"""
+
+
+def _hybrid_search(scope_column, scope_value, query_vector, question, top_k, quantization="none"):
+    table = DocumentChunk._meta.db_table
+    scope = f"{scope_column} = %(scope)s"
+    sql = HYBRID_SQL.format(
+        table=table,
+        scope=scope,
+        nearest=_nearest_sql(table, scope, quantization),
+    )
+    candidates = max(top_k, settings.RAG_HYBRID_CANDIDATES)
+    params = {
+        "scope": scope_value,
+        "query_vector": Vector(query_vector).to_text(),
+        "question": question,
+        "candidates": candidates,
+        "rerank": _rerank_size(candidates),
+        "rrf_k": settings.RAG_HYBRID_RRF_K,
+        "top_k": top_k,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {"id": str(chunk_id), "text": text, "document_id": str(document_id), "chunk_index": chunk_index}
+        for chunk_id, text, document_id, chunk_index, _score in rows
+    ]
+
+
+def _use_hybrid(mode, question) -> bool:
+    mode = mode or settings.RAG_RETRIEVAL_MODE
+    return mode == "hybrid" and bool(question) and connection.vendor == "postgresql"
+
+
+# ================================================================
+#  Helper 6: _search_scope
+#  Shared body of every search — scope_column is "follow_group" or "document_id"
+# ================================================================
+def _search_scope(scope_column, scope_value, query_vector, top_k, ef_search, probes,
+                  question, mode, quantization):
+    quantization = _resolve_quantization(quantization)
+    if connection.vendor != "postgresql":
+        quantization = "none"
+    hybrid = _use_hybrid(mode, question)
+
+    # ---------------- Step 1: Search Params ----------------
+    # The quantized coarse scan must be allowed to return every row it re-ranks
+    min_ef_search = 0
+    if quantization != "none":
+        min_ef_search = _rerank_size(max(top_k, settings.RAG_HYBRID_CANDIDATES) if hybrid else top_k)
+
+    with vector_search_params(ef_search=ef_search, probes=probes, min_ef_search=min_ef_search):
+        # ---------------- Step 2a: Hybrid Retrieval ----------------
+        if hybrid:
+            return _hybrid_search(scope_column, scope_value, query_vector, question, top_k, quantization)
+
+        # ---------------- Step 2b: Quantized Vector Search + Rerank ----------------
+        if quantization != "none":
+            return _quantized_search(scope_column, scope_value, query_vector, top_k, quantization)
+
+        # ---------------- Step 2c: Vector Similarity Query ----------------
+        # .annotate(distance=CosineDistance(...)) → adds a computed "distance" column
+        # .order_by("distance") → closest chunks come first (HNSW index scan)
+        # [:top_k] → SQL LIMIT — only return the best matches
+        # .only(...) → skip fetching the 384-float embedding column we don't need
+        qs = (
+            DocumentChunk.objects
+            .filter(**{scope_column: scope_value})
+            .only("id", "text", "document_id", "chunk_index")
+            .annotate(distance=CosineDistance("embedding", query_vector))
+            .order_by("distance")[:top_k]
+        )
+        rows = list(qs)  # Evaluate inside the transaction so SET LOCAL applies
+
+    # ---------------- Step 3: Serialize to Dict ----------------
+    # Returns plain dicts so build_prompt() can consume them without ORM awareness
+    return [_chunk_to_dict(c) for c in rows]
+
+
+# ================================================================
+#  Search 1: search_similar_chunks
+#  Finds the top-K document chunks most semantically similar to the query vector
+#  Scoped to the user's company group
+#
+#  Uses pgvector CosineDistance annotation → lower distance = more similar
+#  ef_search / probes can be passed per call to trade recall for latency
+#  question + mode="hybrid" → also match the question's terms via full-text search
+#  quantization → "none" / "halfvec" / "binary" (defaults to RAG_VECTOR_QUANTIZATION)
+# ================================================================
+def search_similar_chunks(user, query_vector, top_k=10, ef_search=None, probes=None,
+                          question=None, mode=None, quantization=None, engine=None):
+    # Chunks carry their own follow_group, so no join to documents_document is needed
+    # Chunks only exist for documents that went through the embedding pipeline
+    return search_group_chunks(
+        get_group_id(user), query_vector, top_k=top_k, ef_search=ef_search, probes=probes,
+        question=question, mode=mode, quantization=quantization, engine=engine,
+    )
+
+
+# ================================================================
+#  Search 1b: search_group_chunks
+#  search_similar_chunks() for an already-resolved group id
+#  (used directly by management commands that have no request user)
+# ================================================================
+def search_group_chunks(group_id, query_vector, top_k=10, ef_search=None, probes=None,
+                        question=None, mode=None, quantization=None, engine=None):
+    # ---------------- In-Process Engine ----------------
+    # Hybrid searches need the full-text index → always Postgres
+    if (engine or settings.RAG_RETRIEVAL_ENGINE) == "memory" and not _use_hybrid(mode, question):
+        found = memory_index.search(group_id, query_vector, top_k=top_k)
+        if found is not None:
+            return found
+
+    return _search_scope("follow_group", group_id, query_vector, top_k, ef_search, probes,
+                         question, mode, quantization)
+
+
+# ================================================================
+#  Search 2: search_document_chunks
+#  Same as search_similar_chunks but restricted to ONE document
+#  Used by doc_chat ("chat with this file")
+# ================================================================
+def search_document_chunks(document_id, query_vector, top_k=10, ef_search=None, probes=None,
+                           question=None, mode=None, quantization=None):
+    return _search_scope("document_id", document_id, query_vector, top_k, ef_search, probes,
+                         question, mode, quantization)
@@ -0,0 +1,181 @@
+# ===============================================================
+#  file_upload/semantic_cache.py
+#  Semantic answer cache for rag_chat
+#
+#  The exact-match answer_cache (caching.py) only helps when a question is
+#  repeated word for word. Here the question EMBEDDING is the key: a new
+#  question reuses the answer of the nearest earlier question if their
+#  cosine similarity is at least RAG_SEMANTIC_CACHE_THRESHOLD
+#
+#  Sentence embeddings barely move when only an identifier changes
+#  ("invoice 1042" vs "invoice 1043", another date or name), so a close
+#  embedding alone is not enough: the identifier tokens of both questions
+#  (numbers, anything with a digit, capitalised names) must also be equal
+#
+#  FLOW OVERVIEW:
+#  Step 1 → lookup_semantic_answer(): nearest SemanticCacheEntries with the same
+#           group + corpus version + history digest + embedding model, the
+#           first one above the threshold with the same identifiers wins
+#  Step 2 → store_semantic_answer(): save a freshly generated answer, drop
+#           the group's entries from older corpus versions (they can never
+#           match) and keep at most RAG_SEMANTIC_CACHE_MAX_ENTRIES of the
+#           current one (least recently used go first)
+#
+#  Off by default (RAG_SEMANTIC_CACHE_ENABLED) — turn it on for corpora whose
+#  questions rarely hinge on one identifier
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from pgvector.django import CosineDistance
+
+from .models import SemanticCacheEntry
+
+
+# Nearest entries checked per lookup — the closest one may differ only by an
+# identifier while the next one is a real paraphrase
+CANDIDATES = 5
+
+# Words that carry an identifier: numbers / codes ("1042", "q3", "2024-05-01")
+# and capitalised words not starting a sentence (names: "Acme", "Müller")
+_DIGIT_TOKEN = re.compile(r"\w*\d[\w./-]*")
+_NAME_TOKEN = re.compile(r"(?<!^)(?<![.?!]\s)\b[^\W\d_][\w'-]*", re.UNICODE)
+
+# Process-wide lookup counters — exposed by semantic_cache_stats()
+_counters = {"hits": 0, "misses": 0, "identifier_mismatches": 0}
+_counters_lock = threading.Lock()
+
+
+def _record(hit: bool, identifier_mismatch=False):
+    with _counters_lock:
+        _counters["hits" if hit else "misses"] += 1
+        if identifier_mismatch:
+            _counters["identifier_mismatches"] += 1
+
+
+# ================================================================
+#  Helper: identifier_tokens
+#  Raw question text → set of its identifier tokens, case-folded
+#  Names are detected on the ORIGINAL text (capitalisation is the only hint),
+#  numbers on any text
+# ================================================================
+def identifier_tokens(question: str) -> frozenset:
+    text = (question or "").strip()
+    digits = {t.strip("./-").lower() for t in _DIGIT_TOKEN.findall(text)}
+    names = {t.lower() for t in _NAME_TOKEN.findall(text) if t[0].isupper() and t != "I"}
+    return frozenset(digits | names)
+
+
+def semantic_cache_stats() -> dict:
+    with _counters_lock:
+        hits, misses = _counters["hits"], _counters["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "identifier_mismatches": _counters["identifier_mismatches"],
+        "threshold": settings.RAG_SEMANTIC_CACHE_THRESHOLD,
+    }
+
+
+# ================================================================
+#  Function 1: lookup_semantic_answer
+#  Returns {"answer", "chunks", "question", "similarity"} or None
+#  similarity = 1 - cosine distance of the two question embeddings
+#  question   → raw question text, for the identifier check
+# ================================================================
+def lookup_semantic_answer(group_id, corpus_version, history_digest, embedding_model, query_vector, question):
+    if not settings.RAG_SEMANTIC_CACHE_ENABLED:
+        return None
+
+    # ---------------- Step 1a: Nearest Cached Question in Scope ----------------
+    qs = SemanticCacheEntry.objects.filter(
+        follow_group=group_id,
+        corpus_version=corpus_version,
+        history_digest=history_digest,
+        embedding_model=embedding_model,
+    )
+    if settings.RAG_SEMANTIC_CACHE_TTL:
+        qs = qs.filter(created_at__gte=timezone.now() - timedelta(seconds=settings.RAG_SEMANTIC_CACHE_TTL))
+
+    candidates = (
+        qs.defer("question_embedding")
+        .annotate(distance=CosineDistance("question_embedding", query_vector))
+        .filter(distance__lte=1 - settings.RAG_SEMANTIC_CACHE_THRESHOLD)
+        .order_by("distance")[:CANDIDATES]
+    )
+
+    # ---------------- Step 1b: Same Identifiers ----------------
+    # Threshold already applied in SQL; a close question about another
+    # invoice / date / name is not the same question
+    wanted = identifier_tokens(question)
+    entry, mismatch = None, False
+    for candidate in candidates:
+        if identifier_tokens(candidate.question) == wanted:
+            entry = candidate
+            break
+        mismatch = True
+
+    if entry is None:
+        _record(hit=False, identifier_mismatch=mismatch)
+        return None
+
+    _record(hit=True)
+    SemanticCacheEntry.objects.filter(pk=entry.pk).update(
+        hit_count=F("hit_count") + 1,
+        last_hit_at=timezone.now(),
+    )
+    return {
+        "answer": entry.answer,
+        "chunks": entry.chunks,
+        "question": entry.question,
+        "similarity": round(1 - entry.distance, 4),
+    }
+
+
+# ================================================================
+#  Function 2: store_semantic_answer
+#  Saves one generated answer; entries of older corpus versions of the
+#  group are deleted in the same call, and the current version keeps its
+#  RAG_SEMANTIC_CACHE_MAX_ENTRIES most recently used entries
+# ================================================================
+def store_semantic_answer(group_id, corpus_version, history_digest, embedding_model,
+                          question, query_vector, answer, chunks):
+    if not settings.RAG_SEMANTIC_CACHE_ENABLED:
+        return
+
+    SemanticCacheEntry.objects.filter(
+        follow_group=group_id,
+        corpus_version__lt=corpus_version,
+    ).delete()
+
+    SemanticCacheEntry.objects.create(
+        follow_group=group_id,
+        corpus_version=corpus_version,
+        history_digest=history_digest,
+        embedding_model=embedding_model,
+        question=question,
+        question_embedding=query_vector,
+        answer=answer,
+        chunks=chunks,
+    )
+
+    # ---------------- Step 2b: Cap the Current Version ----------------
+    # A busy group can ask thousands of questions without the corpus changing
+    overflow = list(
+        SemanticCacheEntry.objects
+        .filter(follow_group=group_id, corpus_version=corpus_version)
+        .order_by(Coalesce("last_hit_at", "created_at").desc(), "-pk")
+        .values_list("pk", flat=True)[settings.RAG_SEMANTIC_CACHE_MAX_ENTRIES:]
+    )
+    if overflow:
+        SemanticCacheEntry.objects.filter(pk__in=overflow).delete()
@@ -1,15 +1,17 @@
 # ===============================================================
 #  file_upload/serializers.py
-#  Single serializer: DocumentSerializer
-#  Handles reading Document rows (GET) and creating new ones (POST upload)
-#  Automatically populates metadata fields (mime_type, file_size, group) on create
+#  DocumentSerializer     → reading Document rows (GET) and creating new ones (POST upload)
+#                           Automatically populates metadata fields (mime_type, file_size, group) on create
+#  EmbeddingJobSerializer → read-only status of a background embedding job
+#  ChatSessionSerializer  → server-side chat session (ChatSessionDetailSerializer adds its turns)
 # ===============================================================
 
 
 # ---------------- Step 0: Imports ----------------
 from rest_framework import serializers
-from .models import Document
+from .models import Document, EmbeddingJob, ChatSession, ChatTurn
 from .utils import get_group_id  # Resolves which company group the user belongs to
+from backend.storage import file_url  # Cached presigned URLs for FileFields
 
 
 # ================================================================
@@ -49,9 +51,10 @@ class DocumentSerializer(serializers.ModelSerializer):
 
     # ---------------- Step 2: Compute File URL ----------------
     # Called automatically by DRF for the file_url field
-    # Returns the MinIO storage URL (could be a presigned URL depending on storage config)
+    # Returns the MinIO presigned URL — re-used from backend/storage.py's cache, so
+    # listing N documents does not sign N URLs on every request
     def get_file_url(self, obj):
-        return obj.file.url if obj.file else None
+        return file_url(obj.file)
 
     # ---------------- Step 3: Custom Create Logic ----------------
     # Runs when upload_file view calls serializer.save()
@@ -75,4 +78,78 @@ class DocumentSerializer(serializers.ModelSerializer):
         # SUB user  → group_id = follow_user_id (their MAIN user's ID)
         validated_data["follow_group"] = get_group_id(user)
 
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+# ================================================================
+#  EmbeddingJobSerializer
+#  Used by: embed_file_async (202 response), embedding_job_status (polling)
+#  Read-only — jobs are created and updated server-side only
+# ================================================================
+class EmbeddingJobSerializer(serializers.ModelSerializer):
+
+    # progress → 0-100 percentage computed from the chunk counters
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = EmbeddingJob
+        fields = [
+            "id",
+            "document",
+            "status",
+            "chunks_total",
+            "chunks_done",
+            "progress",
+            "error",
+            "attempts",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        if obj.status == EmbeddingJob.Status.DONE:
+            return 100
+        if not obj.chunks_total:
+            return 0
+        return int(obj.chunks_done * 100 / obj.chunks_total)
+
+
+# ================================================================
+#  ChatSessionSerializer / ChatSessionDetailSerializer
+#  Used by: chat_sessions (list / create), chat_session_detail (GET)
+#  Read-only — sessions are created from a document_id + title in the view,
+#  turns and the summary are written by chat_sessions.py
+# ================================================================
+class ChatTurnSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ChatTurn
+        fields = ["position", "role", "content", "created_at"]
+        read_only_fields = fields
+
+
+class ChatSessionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ChatSession
+        fields = [
+            "id",
+            "document",
+            "title",
+            "turn_count",
+            "summarized_turns",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class ChatSessionDetailSerializer(ChatSessionSerializer):
+
+    turns = ChatTurnSerializer(many=True, read_only=True)
+
+    class Meta(ChatSessionSerializer.Meta):
+        fields = ChatSessionSerializer.Meta.fields + ["summary", "turns"]
+        read_only_fields = fields
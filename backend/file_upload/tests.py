@@ -1,3 +1,764 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from file_upload import bulk_upload, chat_sessions, direct_upload, embedding_file, jobs, vector_snapshots, views
+from file_upload.caching import answer_cache
+from file_upload.context_packing import pack_context
+from file_upload.corpus import bump_corpus_version
+from file_upload.direct_upload import TOKEN_SALT, DirectUploadError, finish_direct_upload, read_upload_token
+from file_upload.memory_index import MemoryIndexCache
+from file_upload.models import (
+    ChatSession, ChatTurn, Document, DocumentChunk, EmbeddingCache, EmbeddingJob, SemanticCacheEntry,
+)
+from file_upload.pagination import encode_cursor
+from file_upload.semantic_cache import lookup_semantic_answer, store_semantic_answer
+
+User = get_user_model()
+
+
+def make_document(user, name="report.pdf", **fields):
+    # bulk_create → skips Document.save(), which would ask MinIO for the file size
+    fields.setdefault("mime_type", "application/pdf")
+    return Document.objects.bulk_create([Document(
+        user=user, follow_group=user.id, file=f"uploads/{name}", original_filename=name, **fields,
+    )])[0]
+
+
+CHUNKS = [{"text": "Invoices are paid within 30 days.", "document_id": None, "chunk_index": 0, "distance": 0.1}]
+
+
+# ================================================================
+#  Streaming chat endpoints (rag_chat_stream / doc_chat_stream)
+#  EventSource / fetch clients send "Accept: text/event-stream"
+# ================================================================
+class ChatStreamTests(TestCase):
+
+    def setUp(self):
+        answer_cache.clear()
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patches = [
+            mock.patch.object(views, "embed_query", return_value=[0.0] * 384),
+            mock.patch.object(views, "lookup_semantic_answer", return_value=None),
+            mock.patch.object(views, "store_semantic_answer"),
+            mock.patch.object(views, "search_similar_chunks", return_value=CHUNKS),
+            mock.patch.object(views, "search_document_chunks", return_value=CHUNKS),
+            mock.patch.object(views.ollama_client, "chat_stream", return_value=iter(["30 ", "days."])),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def post(self, name, body):
+        return self.client.post(f"/file_upload/{name}/", body, format="json", HTTP_ACCEPT="text/event-stream")
+
+    def read_events(self, response):
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_rag_chat_stream_accepts_event_stream(self):
+        response = self.post("rag_chat_stream", {"question": "When are invoices paid?"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = self.read_events(response)
+        self.assertIn("event: sources", body)
+        self.assertIn('event: done\ndata: {"answer": "30 days."', body)
+
+    def test_doc_chat_stream_accepts_event_stream(self):
+        doc = make_document(self.user, "terms.pdf", is_embedded=True)
+        response = self.post("doc_chat_stream", {"document_id": str(doc.id), "question": "When are invoices paid?"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn("event: done", self.read_events(response))
+
+    def test_stream_errors_are_json(self):
+        response = self.post("rag_chat_stream", {"question": ""})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json(), {"error": "question is required"})
+
+        response = self.post("doc_chat_stream", {"document_id": "00000000-0000-0000-0000-000000000000", "question": "x"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+
+# ================================================================
+#  Embedding job queue (jobs.claim_next_job / jobs.run_job)
+# ================================================================
+@override_settings(RAG_EMBED_JOB_STALE_SECONDS=600, RAG_EMBED_JOB_MAX_ATTEMPTS=3)
+class EmbeddingJobQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.doc = make_document(self.user)
+
+    def make_job(self, **fields):
+        return EmbeddingJob.objects.create(document=self.doc, follow_group=self.user.id, **fields)
+
+    def stale(self):
+        return timezone.now() - timedelta(seconds=601)
+
+    def test_claims_oldest_queued_job(self):
+        first, second = self.make_job(), self.make_job()
+        job = jobs.claim_next_job("w1")
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual((job.status, job.worker, job.attempts), (EmbeddingJob.Status.RUNNING, "w1", 1))
+        self.assertEqual(jobs.claim_next_job("w2").pk, second.pk)
+        self.assertIsNone(jobs.claim_next_job("w3"))
+
+    def test_reclaims_only_stale_running_jobs(self):
+        self.make_job(status=EmbeddingJob.Status.RUNNING, worker="w1", attempts=1, heartbeat_at=timezone.now())
+        self.assertIsNone(jobs.claim_next_job("w2"))
+
+        stale = self.make_job(status=EmbeddingJob.Status.RUNNING, worker="w1", attempts=1, heartbeat_at=self.stale())
+        job = jobs.claim_next_job("w2")
+        self.assertEqual((job.pk, job.worker, job.attempts), (stale.pk, "w2", 2))
+
+    def test_exhausted_stale_job_is_marked_failed(self):
+        job = self.make_job(status=EmbeddingJob.Status.RUNNING, worker="w1", attempts=3, heartbeat_at=self.stale())
+        self.assertIsNone(jobs.claim_next_job("w2"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, EmbeddingJob.Status.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_job_records_success(self):
+        self.make_job()
+        job = jobs.claim_next_job("w1")
+
+        def pipeline(doc, progress):
+            progress(2, 4)
+            job_row = EmbeddingJob.objects.get(pk=job.pk)
+            self.assertEqual((job_row.chunks_done, job_row.chunks_total), (2, 4))
+            return 4
+
+        with mock.patch.object(jobs, "create_embeddings_for_document", side_effect=pipeline):
+            job = jobs.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.chunks_done, job.chunks_total), (EmbeddingJob.Status.DONE, 4, 4))
+
+    def test_run_job_records_failure(self):
+        self.make_job()
+        job = jobs.claim_next_job("w1")
+        with mock.patch.object(jobs, "create_embeddings_for_document", side_effect=RuntimeError("boom")):
+            jobs.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, EmbeddingJob.Status.FAILED)
+        self.assertEqual(job.error, "RuntimeError: boom")
+
+    def test_reclaimed_job_is_not_overwritten(self):
+        self.make_job()
+        job = jobs.claim_next_job("w1")
+
+        def pipeline(doc, progress):
+            # w1 stalls, w2 re-claims the job, then w1 finishes anyway
+            EmbeddingJob.objects.filter(pk=job.pk).update(heartbeat_at=self.stale())
+            self.assertEqual(jobs.claim_next_job("w2").pk, job.pk)
+            return 7
+
+        with mock.patch.object(jobs, "create_embeddings_for_document", side_effect=pipeline):
+            result = jobs.run_job(job)
+        self.assertEqual((result.status, result.worker), (EmbeddingJob.Status.RUNNING, "w2"))
+
+    def test_progress_after_reclaim_stops_the_old_worker(self):
+        self.make_job()
+        job = jobs.claim_next_job("w1")
+        calls = []
+
+        def pipeline(doc, progress):
+            EmbeddingJob.objects.filter(pk=job.pk).update(worker="w2", attempts=2)
+            progress(1, 10)
+            calls.append("after progress")
+            return 10
+
+        with mock.patch.object(jobs, "create_embeddings_for_document", side_effect=pipeline):
+            result = jobs.run_job(job)
+        self.assertEqual(calls, [])
+        self.assertEqual(result.worker, "w2")
+
+
+# The heartbeat thread has its own DB connection → needs committed rows
+class EmbeddingJobHeartbeatTests(TransactionTestCase):
+
+    @override_settings(RAG_EMBED_JOB_HEARTBEAT_SECONDS=0.05)
+    def test_heartbeat_refreshes_while_pipeline_is_silent(self):
+        user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        EmbeddingJob.objects.create(document=make_document(user), follow_group=user.id)
+        job = jobs.claim_next_job("w1")
+        beats = []
+
+        def pipeline(doc, progress):
+            # Long extraction with no progress() calls
+            for _ in range(3):
+                time.sleep(0.1)
+                beats.append(EmbeddingJob.objects.get(pk=job.pk).heartbeat_at)
+            return 1
+
+        with mock.patch.object(jobs, "create_embeddings_for_document", side_effect=pipeline):
+            jobs.run_job(job)
+        self.assertGreater(beats[-1], job.started_at)
+        self.assertGreater(beats[-1], beats[0])
+
+    @override_settings(RAG_EMBED_JOB_HEARTBEAT_SECONDS=0.05)
+    def test_lost_heartbeat_stops_the_worker_at_its_next_report(self):
+        user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        EmbeddingJob.objects.create(document=make_document(user), follow_group=user.id)
+        job = jobs.claim_next_job("w1")
+        calls = []
+
+        def pipeline(doc, progress):
+            # Long silent extraction, during which another worker re-claims the job
+            EmbeddingJob.objects.filter(pk=job.pk).update(worker="w2", attempts=2)
+            time.sleep(0.2)
+            with CaptureQueriesContext(connection) as queries:
+                try:
+                    progress(0, 10)
+                finally:
+                    calls.append(len(queries))  # Known from the heartbeat → no UPDATE sent
+            calls.append("embedded")
+            return 10
+
+        with mock.patch.object(jobs, "create_embeddings_for_document", side_effect=pipeline):
+            result = jobs.run_job(job)
+        self.assertEqual(calls, [0])
+        self.assertEqual((result.worker, result.chunks_total), ("w2", 0))
+
+
+# ================================================================
+#  Streaming ingest (embedding_file.stream_embeddings_for_document)
+#  Batches are searchable as they land; the previous chunks go at the end
+# ================================================================
+@override_settings(RAG_STREAM_BATCH_SIZE=16, RAG_VECTOR_SNAPSHOT_DIR="")
+class StreamingIngestTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.doc = make_document(self.user, "notes.txt", mime_type="text/plain", is_embedded=True)
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=self.doc, follow_group=self.user.id, chunk_index=0, text="old text",
+                          embedding=[0.1] * 384, embedding_model="old-model"),
+        ])
+        # ~150 KB → several 64 KB read blocks, ~190 chunks, ~12 batches of 16
+        text = "".join(f"Paragraph {i}: " + "word " * 150 + "\n\n" for i in range(200))
+        buffer = mock.patch.object(embedding_file, "open_document_buffer", side_effect=lambda f: io.BytesIO(text.encode()))
+        buffer.start()
+        self.addCleanup(buffer.stop)
+        self.calls = []
+
+    def texts(self):
+        return list(DocumentChunk.objects.filter(document=self.doc).values_list("text", flat=True))
+
+    def embed(self, fail_on_call=None):
+        def embed_chunks(batch, **kwargs):
+            self.calls.append(len(batch))
+            if len(self.calls) == fail_on_call:
+                # Earlier batches are already searchable, next to the old chunks
+                texts = self.texts()
+                self.assertIn("old text", texts)
+                self.assertEqual(len(texts), 1 + 16 * (fail_on_call - 1))
+                raise RuntimeError("embedding backend down")
+            return [[0.2] * 384 for _ in batch]
+
+        return mock.patch.object(embedding_file, "embed_chunks", side_effect=embed_chunks)
+
+    def stream(self, **kwargs):
+        with self.embed():
+            return embedding_file.stream_embeddings_for_document(self.doc, **kwargs)
+
+    def test_batches_are_searchable_and_old_chunks_go_at_the_end(self):
+        reports = []
+        count = self.stream(progress=lambda d, t: reports.append((d, t)))
+
+        chunks = list(DocumentChunk.objects.filter(document=self.doc).order_by("chunk_index"))
+        self.assertEqual(len(chunks), count)
+        self.assertEqual([c.chunk_index for c in chunks], list(range(count)))
+        self.assertNotIn("old text", [c.text for c in chunks])
+        self.assertEqual(len({c.ingest_run for c in chunks}), 1)
+
+        # Estimated totals, not done == total from the first batch
+        self.assertLess(reports[0][0], reports[0][1])
+        self.assertTrue(all(done <= total for done, total in reports))
+
+    def test_failed_stream_keeps_old_chunks(self):
+        with self.embed(fail_on_call=3), self.assertRaises(RuntimeError):
+            embedding_file.stream_embeddings_for_document(self.doc)
+        self.assertEqual(self.texts(), ["old text"])
+
+    def test_incremental_restream_reuses_stored_vectors(self):
+        count = self.stream(incremental=True)
+        self.assertEqual(sum(self.calls), count)
+
+        self.calls.clear()
+        self.assertEqual(self.stream(incremental=True), count)
+        self.assertEqual(self.calls, [])  # Every text unchanged → nothing sent to the backend
+        self.assertEqual(DocumentChunk.objects.filter(document=self.doc).count(), count)
+
+        self.calls.clear()
+        self.stream(incremental=False)
+        self.assertEqual(sum(self.calls), count)
+
+
+# ================================================================
+#  Batch embedding (embedding_file.embed_chunks)
+#  Vectors are cached by text hash → a miscounted batch must never be stored
+# ================================================================
+@override_settings(RAG_EMBED_CACHE_ENABLED=True, RAG_EMBED_BATCH_SIZE=2, RAG_EMBED_CONCURRENCY=2)
+class EmbedChunksTests(TestCase):
+
+    def vectors(self, texts):
+        return [[float(len(t))] + [0.0] * 383 for t in texts]
+
+    def test_vectors_follow_their_texts_across_batches(self):
+        texts = ["a", "bb", "ccc", "dddd", "bb"]
+        with mock.patch.object(embedding_file, "embed_texts", side_effect=self.vectors):
+            vectors = embedding_file.embed_chunks(texts)
+        self.assertEqual([v[0] for v in vectors], [1.0, 2.0, 3.0, 4.0, 2.0])
+
+    def test_short_batch_raises_and_caches_nothing(self):
+        with mock.patch.object(embedding_file, "embed_texts", side_effect=lambda texts: self.vectors(texts)[:-1]):
+            with self.assertRaisesMessage(ValueError, "returned 1 vectors for 2 texts"):
+                embedding_file.embed_chunks(["a", "bb", "ccc"])
+        self.assertFalse(EmbeddingCache.objects.exists())
+
+
+# ================================================================
+#  In-memory vector index (memory_index.MemoryIndexCache)
+#  A group that does not fit is remembered per corpus version
+# ================================================================
+@override_settings(RAG_VECTOR_SNAPSHOT_DIR="")
+class MemoryIndexTooLargeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        doc = make_document(self.user)
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=doc, follow_group=self.user.id, chunk_index=i, text=f"chunk {i}",
+                          embedding=[0.1] * 384, embedding_model="m")
+            for i in range(3)
+        ])
+
+    def search(self, cache):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(cache.search(self.user.id, [0.1] * 384))
+        return len(queries)
+
+    def test_too_many_chunks_is_remembered_until_the_version_changes(self):
+        cache = MemoryIndexCache(max_bytes=10 * 1024 * 1024, max_chunks=2)
+        self.assertEqual(self.search(cache), 2)  # version + size aggregate
+        self.assertEqual(self.search(cache), 1)  # version only
+        self.assertEqual(cache.stats()["too_large_groups"], 1)
+
+        bump_corpus_version(self.user.id)
+        self.assertEqual(self.search(cache), 2)
+
+    def test_too_many_bytes_is_rejected_before_loading_rows(self):
+        cache = MemoryIndexCache(max_bytes=1024, max_chunks=100)
+        self.assertEqual(self.search(cache), 2)
+        self.assertEqual(self.search(cache), 1)
+        self.assertEqual(cache.stats()["loads"], 0)
+
+
+# ================================================================
+#  Semantic answer cache (semantic_cache.py)
+# ================================================================
+@override_settings(RAG_SEMANTIC_CACHE_ENABLED=True, RAG_SEMANTIC_CACHE_THRESHOLD=0.95,
+                   RAG_SEMANTIC_CACHE_TTL=0, RAG_SEMANTIC_CACHE_MAX_ENTRIES=3)
+class SemanticCacheTests(TestCase):
+    scope = {"group_id": 1, "corpus_version": 4, "history_digest": "h", "embedding_model": "m"}
+
+    def vector(self, i=0):
+        vec = [1.0] + [0.0] * 383
+        vec[1] = i * 0.001  # Near-identical embeddings, as for questions differing by one number
+        return vec
+
+    def store(self, question, i=0):
+        store_semantic_answer(**self.scope, question=question, query_vector=self.vector(i),
+                              answer=f"answer to {question}", chunks=[])
+
+    def lookup(self, question, i=0):
+        return lookup_semantic_answer(**self.scope, query_vector=self.vector(i), question=question)
+
+    def test_paraphrase_hits(self):
+        self.store("What is the total of invoice 1042?")
+        hit = self.lookup("what's the total for invoice 1042")
+        self.assertEqual(hit["answer"], "answer to What is the total of invoice 1042?")
+
+    def test_different_identifier_misses(self):
+        self.store("What is the total of invoice 1042?")
+        self.store("What did Acme order in March?", i=1)
+        self.assertIsNone(self.lookup("What is the total of invoice 1043?"))
+        self.assertIsNone(self.lookup("What did Globex order in March?", i=1))
+
+    def test_skips_closer_entry_with_other_identifier(self):
+        self.store("What is the total of invoice 1043?")
+        self.store("What is the total of invoice 1042?", i=1)
+        hit = self.lookup("Total of invoice 1042?")
+        self.assertEqual(hit["question"], "What is the total of invoice 1042?")
+
+    def test_entries_per_version_are_capped(self):
+        for n in range(5):
+            self.store(f"Question {n}?", i=n)
+        questions = set(SemanticCacheEntry.objects.values_list("question", flat=True))
+        self.assertEqual(questions, {"Question 2?", "Question 3?", "Question 4?"})
+
+
+# ================================================================
+#  Vector snapshot refresh (vector_snapshots.refresh_document_snapshot)
+#  Patched, never rebuilt — also when several documents changed since
+# ================================================================
+class SnapshotRefreshTests(TestCase):
+
+    def setUp(self):
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        snapshot_settings = override_settings(RAG_VECTOR_SNAPSHOT_DIR=snapshot_dir.name, RAG_VECTOR_SNAPSHOT_IVF_LISTS=0)
+        snapshot_settings.enable()
+        self.addCleanup(snapshot_settings.disable)
+
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.group = self.user.id
+        self.docs = [make_document(self.user, f"doc{n}.pdf") for n in range(3)]
+        for doc in self.docs:
+            self.add_chunks(doc)
+        vector_snapshots.build_group_snapshot(self.group)
+
+    def add_chunks(self, doc, count=2):
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=doc, follow_group=self.group, chunk_index=i, text=f"{doc.original_filename} {i}",
+                          embedding=[float(i + 1)] + [0.0] * 383, embedding_model="m")
+            for i in range(count)
+        ])
+
+    def snapshot_ids(self):
+        return sorted(i.decode() for i in vector_snapshots.read_snapshot(self.group).ids)
+
+    def live_ids(self):
+        return sorted(str(i) for i in DocumentChunk.objects.filter(follow_group=self.group).values_list("id", flat=True))
+
+    def test_concurrent_changes_are_patched_by_chunk_id(self):
+        # Two documents changed, two bumps → the snapshot is two versions behind
+        DocumentChunk.objects.filter(document=self.docs[0]).delete()
+        bump_corpus_version(self.group)
+        DocumentChunk.objects.filter(document=self.docs[1]).delete()
+        self.add_chunks(self.docs[1], count=3)
+        bump_corpus_version(self.group)
+
+        with mock.patch.object(vector_snapshots, "fetch_group_rows", wraps=vector_snapshots.fetch_group_rows) as fetch:
+            vector_snapshots.refresh_document_snapshot(self.group, self.docs[1].id)
+        self.assertEqual(len(fetch.call_args.kwargs["chunk_ids"]), 3)  # Only the new rows
+        self.assertEqual(self.snapshot_ids(), self.live_ids())
+        self.assertEqual(vector_snapshots.read_snapshot(self.group).version, 2)
+
+    @override_settings(RAG_MEMORY_INDEX_MAX_CHUNKS=4)
+    def test_groups_over_the_memory_index_cap_are_skipped(self):
+        self.add_chunks(make_document(self.user, "extra.pdf"))
+        bump_corpus_version(self.group)
+        vector_snapshots.refresh_document_snapshot(self.group, self.docs[0].id)
+        self.assertEqual(vector_snapshots.read_snapshot(self.group).version, 0)
+
+
+# Postgres loads are written back as snapshots off the search request
+class MemoryIndexWriteThroughTests(TestCase):
+
+    def setUp(self):
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        snapshot_settings = override_settings(RAG_VECTOR_SNAPSHOT_DIR=snapshot_dir.name, RAG_VECTOR_SNAPSHOT_WRITE_ASYNC=True)
+        snapshot_settings.enable()
+        self.addCleanup(snapshot_settings.disable)
+
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=make_document(self.user), follow_group=self.user.id, chunk_index=0, text="chunk",
+                          embedding=[1.0] + [0.0] * 383, embedding_model="m"),
+        ])
+
+    def test_search_queues_the_snapshot_write(self):
+        cache = MemoryIndexCache(max_bytes=10 * 1024 * 1024, max_chunks=100)
+        with mock.patch.object(vector_snapshots, "_writer") as writer:
+            self.assertEqual(len(cache.search(self.user.id, [1.0] + [0.0] * 383)), 1)
+            self.assertIsNone(vector_snapshots.read_snapshot(self.user.id))  # Not written inline
+
+            # Queued once per group, however many loads happen meanwhile
+            cache.clear()
+            cache.search(self.user.id, [1.0] + [0.0] * 383)
+            self.assertEqual(writer.submit.call_count, 1)
+
+        fn, *args = writer.submit.call_args.args
+        fn(*args)
+        self.assertEqual(vector_snapshots.read_snapshot(self.user.id).count, 1)
+
+
+# ================================================================
+#  Bulk upload (bulk_upload.upload_documents)
+#  Same basename → different object keys; a rollback only deletes its own
+# ================================================================
+class BulkUploadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        storage = mock.patch.object(bulk_upload, "s3_storage")
+        self.storage = storage.start()
+        self.addCleanup(storage.stop)
+        self.storage.save.side_effect = lambda name, content, max_length=None: name
+
+    def files(self):
+        return [SimpleUploadedFile("report.pdf", b"first"), SimpleUploadedFile("report.pdf", b"second")]
+
+    def test_same_filename_gets_distinct_keys(self):
+        existing = make_document(self.user, "report.pdf")
+        results = bulk_upload.upload_documents(self.user, self.files())
+        keys = [r["document"].file.name for r in results]
+        self.assertEqual(len(set(keys) | {existing.file.name}), 3)
+        self.assertTrue(all(k.startswith("uploads/") and k.endswith("/report.pdf") for k in keys))
+
+    def test_long_filename_keeps_its_extension(self):
+        name = "quarterly-report-" + "x" * 120 + ".final.pdf"
+        [result] = bulk_upload.upload_documents(self.user, [SimpleUploadedFile(name, b"data")])
+        key = result["document"].file.name
+        self.assertEqual(len(key), Document._meta.get_field("file").max_length)
+        self.assertRegex(key, r"^uploads/[0-9a-f]{32}/quarterly-report-x+\.final\.pdf$")
+        self.assertEqual(result["document"].original_filename, name)
+
+    def test_filename_with_no_room_for_its_basename_is_rejected(self):
+        name = "a." + "b" * 80 + ".pdf"  # The suffixes alone overflow the key
+        [result] = bulk_upload.upload_documents(self.user, [SimpleUploadedFile(name, b"data")])
+        self.assertIsNone(result["document"])
+        self.assertIn("too long", result["error"])
+
+    def test_rollback_deletes_only_its_own_objects(self):
+        existing = make_document(self.user, "report.pdf")
+        with mock.patch.object(bulk_upload.Document.objects, "bulk_create", side_effect=RuntimeError("db down")), \
+                self.assertRaises(RuntimeError):
+            bulk_upload.upload_documents(self.user, self.files())
+        deleted = [c.args[0] for c in self.storage.delete.call_args_list]
+        self.assertEqual(len(deleted), 2)
+        self.assertNotIn(existing.file.name, deleted)
+
+
+# ================================================================
+#  list_files keyset pages (pagination.keyset_page)
+# ================================================================
+class ListFilesPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for n in range(5):
+            make_document(self.user, f"file{n}.pdf")
+
+    def page(self, **params):
+        response = self.client.get("/file_upload/list_files/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, limit):
+        ids, cursor = [], None
+        while True:
+            body = self.page(limit=limit, **({"cursor": cursor} if cursor else {}))
+            ids.extend(row["id"] for row in body["results"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_every_file_once(self):
+        expected = [str(i) for i in Document.objects.order_by("-created_at", "-id").values_list("id", flat=True)]
+        self.assertEqual(self.walk(limit=2), expected)
+
+    def test_created_at_ties_are_broken_by_id(self):
+        # Same microsecond for every row → only id orders them
+        Document.objects.update(created_at=timezone.now())
+        expected = sorted((str(i) for i in Document.objects.values_list("id", flat=True)), reverse=True)
+        self.assertEqual(self.walk(limit=2), expected)
+
+    def test_last_page_has_no_cursor(self):
+        self.assertIsNone(self.page(limit=5)["next_cursor"])
+        self.assertIsNotNone(self.page(limit=4)["next_cursor"])
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ["not-a-cursor", "eyJ0IjoxfQ", encode_cursor(Document.objects.first())[:-6]]:
+            response = self.client.get("/file_upload/list_files/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.json(), {"error": "Invalid cursor."})
+
+
+# ================================================================
+#  Prompt context packing (context_packing.pack_context)
+# ================================================================
+@override_settings(RAG_CONTEXT_CHARS_PER_TOKEN=4, RAG_CONTEXT_DEDUP_THRESHOLD=0.8)
+class PackContextTests(TestCase):
+    overlap = "shared sentence repeated by the splitter overlap. "
+
+    def chunk(self, text, document_id="d1", chunk_index=None):
+        return {"text": text, "document_id": document_id, "chunk_index": chunk_index}
+
+    def test_adjacent_chunks_are_merged_without_the_overlap(self):
+        first = "Invoices are due in thirty days. " + self.overlap
+        second = self.overlap + "Late payments cost two percent."
+        passages, stats = pack_context([self.chunk(second, chunk_index=4), self.chunk(first, chunk_index=3)], budget=1000)
+        self.assertEqual(passages, ["Invoices are due in thirty days. " + self.overlap + "Late payments cost two percent."])
+        self.assertEqual((stats["chunks"], stats["passages"]), (2, 1))
+        self.assertGreater(stats["tokens_saved"], 0)
+
+    def test_duplicates_of_a_more_relevant_passage_are_dropped(self):
+        text = "The warranty covers parts and labour for two full years from delivery."
+        passages, _stats = pack_context([
+            self.chunk(text, "d1", 0),
+            self.chunk(text.upper(), "d2", 7),          # Copy of the same file
+            self.chunk("parts and labour for two full years", "d3", 2),  # Contained in the first
+            self.chunk("Returns are accepted within 14 days.", "d4", 1),
+        ], budget=1000)
+        self.assertEqual(passages, [text, "Returns are accepted within 14 days."])
+
+    def test_budget_keeps_the_most_relevant_passages(self):
+        best, long, short = "a" * 40, "b " * 100, "c" * 20  # 10, 50 and 5 tokens
+        passages, stats = pack_context([
+            self.chunk(best, "d1"), self.chunk(long, "d2"), self.chunk(short, "d3"),
+        ], budget=20)
+        self.assertEqual(passages, [best, short])  # long does not fit, short still does
+        self.assertEqual(stats["tokens_after"], 15)
+
+    def test_oversized_best_passage_is_cut_to_the_budget(self):
+        passages, stats = pack_context([self.chunk("word " * 100)], budget=10)
+        self.assertEqual(len(passages), 1)
+        self.assertLessEqual(stats["tokens_after"], 10)
+
+
+# ================================================================
+#  Direct upload tokens (direct_upload.read_upload_token)
+# ================================================================
+class UploadTokenTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.other = User.objects.create_user(username="other", email="other@example.com", password="x", user_type="main")
+        self.claims = {"key": "uploads/abc/report.pdf", "filename": "report.pdf", "size": 10, "uid": self.user.id}
+
+    def test_own_token_is_accepted(self):
+        token = signing.dumps(self.claims, salt=TOKEN_SALT)
+        self.assertEqual(read_upload_token(self.user, token), self.claims)
+
+    def test_other_users_token_is_rejected(self):
+        token = signing.dumps(self.claims, salt=TOKEN_SALT)
+        with self.assertRaisesMessage(DirectUploadError, "Invalid upload token."):
+            read_upload_token(self.other, token)
+
+    def test_tampered_or_foreign_tokens_are_rejected(self):
+        token = signing.dumps(self.claims, salt=TOKEN_SALT)
+        for bad in [token[:-2] + "xx", signing.dumps(self.claims, salt="other.salt"), ""]:
+            with self.assertRaisesMessage(DirectUploadError, "Invalid upload token."):
+                read_upload_token(self.user, bad)
+
+    @override_settings(FILE_PRESIGNED_UPLOAD_EXPIRY=0, FILE_PRESIGNED_COMPLETE_GRACE=0)
+    def test_expired_token_is_rejected(self):
+        token = signing.dumps(self.claims, salt=TOKEN_SALT)
+        time.sleep(1.1)
+        with self.assertRaisesMessage(DirectUploadError, "Upload token has expired."):
+            read_upload_token(self.user, token)
+
+
+# Two "complete" calls for one key at once → one Document, one job
+# (threads need their own DB connections → committed rows)
+class FinishDirectUploadRaceTests(TransactionTestCase):
+
+    def test_concurrent_completes_create_one_document(self):
+        user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        token = signing.dumps(
+            {"key": "uploads/abc/report.pdf", "filename": "report.pdf", "size": 10, "uid": user.id}, salt=TOKEN_SALT,
+        )
+        client = mock.Mock()
+
+        def slow_head(**kwargs):
+            time.sleep(0.2)  # Second call arrives while the first is still verifying
+            return {"ContentLength": 10}
+
+        client.head_object.side_effect = slow_head
+        results = []
+
+        def complete():
+            try:
+                results.append(finish_direct_upload(user, token, embed=True))
+            finally:
+                connection.close()
+
+        with mock.patch.object(direct_upload, "get_s3_client", return_value=client):
+            threads = [threading.Thread(target=complete) for _ in range(2)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0].pk, results[1][0].pk)
+        self.assertEqual(Document.objects.count(), 1)
+        self.assertEqual(EmbeddingJob.objects.count(), 1)
+        self.assertEqual(client.head_object.call_count, 1)
+
+
+# ================================================================
+#  Rolling chat summary (chat_sessions.summarize_session)
+#  The write is a compare-and-set on summarized_turns
+# ================================================================
+@override_settings(RAG_CHAT_RECENT_TURNS=2)
+class SessionSummaryTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username="owner", email="owner@example.com", password="x", user_type="main")
+        self.session = ChatSession.objects.create(user=user, follow_group=user.id, turn_count=6)
+        ChatTurn.objects.bulk_create([
+            ChatTurn(session=self.session, position=n, role=ChatTurn.Role.USER if n % 2 == 0 else ChatTurn.Role.ASSISTANT,
+                     content=f"turn {n}")
+            for n in range(6)
+        ])
+
+    def test_folds_turns_older_than_the_recent_window(self):
+        with mock.patch.object(chat_sessions.ollama_client, "chat", return_value=" summary of turns 0-3 ") as chat:
+            self.assertTrue(chat_sessions.summarize_session(self.session.pk))
+        self.assertIn("USER: turn 0", chat.call_args.args[0][0]["content"])
+        self.assertNotIn("turn 4", chat.call_args.args[0][0]["content"])
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.summary, self.session.summarized_turns), ("summary of turns 0-3", 4))
+
+    def test_concurrent_summary_wins_and_is_kept(self):
+        def other_worker_finishes_first(*args, **kwargs):
+            ChatSession.objects.filter(pk=self.session.pk).update(summary="other worker", summarized_turns=4)
+            return "stale summary"
+
+        with mock.patch.object(chat_sessions.ollama_client, "chat", side_effect=other_worker_finishes_first):
+            self.assertFalse(chat_sessions.summarize_session(self.session.pk))
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.summary, self.session.summarized_turns), ("other worker", 4))
+
+    def test_prompt_keeps_every_turn_the_summary_lags_behind(self):
+        # Summary covers turn 0 only: turns 1-5 are more than one recent window
+        ChatSession.objects.filter(pk=self.session.pk).update(summary="user said hi", summarized_turns=1)
+        self.session.refresh_from_db()
+        history = chat_sessions.prompt_history(self.session)
+        self.assertEqual(history[0], {"role": "summary", "content": "user said hi"})
+        self.assertEqual([h["content"] for h in history[1:]], [f"turn {n}" for n in range(1, 6)])
+
+    @override_settings(RAG_CHAT_HISTORY_TOKEN_BUDGET=5, RAG_CONTEXT_CHARS_PER_TOKEN=4)
+    def test_history_budget_keeps_recent_turns_and_queues_a_summary(self):
+        with mock.patch.object(chat_sessions, "schedule_summary") as schedule:
+            history = chat_sessions.prompt_history(self.session)
+        self.assertEqual([h["content"] for h in history], ["turn 4", "turn 5"])  # 2 tokens each
+        schedule.assert_called_once_with(self.session.pk)
+
+    def test_nothing_to_fold(self):
+        ChatSession.objects.filter(pk=self.session.pk).update(summarized_turns=4)
+        with mock.patch.object(chat_sessions.ollama_client, "chat") as chat:
+            self.assertFalse(chat_sessions.summarize_session(self.session.pk))
+        chat.assert_not_called()
@@ -19,6 +19,17 @@ urlpatterns = [
     # POST (multipart) → upload a new file; auto-fills metadata and group_id
     path("upload_file/", views.upload_file, name="upload_file"),
 
+    # POST (multipart, repeated "files") → upload many files at once, optionally queue embedding
+    path("bulk_upload_files/", views.bulk_upload_files, name="bulk_upload_files"),
+
+    # Direct browser → MinIO uploads (file bytes never pass through Django)
+    # POST presigned_upload → presigned PUT / multipart part URLs + upload_token
+    # POST complete_upload  → HEAD-verify the object and create the Document
+    # POST abort_upload     → cancel an unfinished multipart upload
+    path("presigned_upload/", views.presigned_upload, name="presigned_upload"),
+    path("complete_upload/", views.complete_upload, name="complete_upload"),
+    path("abort_upload/", views.abort_upload, name="abort_upload"),
+
     # DELETE → remove a file from MinIO + DB (only the uploader can delete their own file)
     path("delete_file/", views.delete_file, name="delete_file"),
 
@@ -41,4 +52,27 @@ urlpatterns = [
     # POST → same as rag_chat but restricted to a SINGLE document's chunks
     # Useful for "chat with this file" use cases
     path("doc_chat/", views.doc_chat, name="doc_chat"),
+
+    # ---------------- Step 6: Background Embedding ----------------
+    # POST → queue the embedding pipeline and return 202 with the job at once
+    # GET  → poll the job's status / progress until it is "done" or "failed"
+    path("embed_file_async/", views.embed_file_async, name="embed_file_async"),
+    path("embedding_job_status/<uuid:job_id>/", views.embedding_job_status, name="embedding_job_status"),
+
+    # ---------------- Step 7: Streaming RAG Chat ----------------
+    # POST → same bodies as rag_chat / doc_chat, answer streamed as Server-Sent Events
+    # Events: sources → token (many) → done (or error)
+    path("rag_chat_stream/", views.rag_chat_stream, name="rag_chat_stream"),
+    path("doc_chat_stream/", views.doc_chat_stream, name="doc_chat_stream"),
+
+    # ---------------- Step 8: Cache Metrics ----------------
+    # GET → hit/miss counters of the RAG caches in this worker process (staff only)
+    path("rag_cache_stats/", views.rag_cache_stats, name="rag_cache_stats"),
+
+    # ---------------- Step 9: Chat Sessions ----------------
+    # GET/POST → list / create server-side conversations for rag_chat and doc_chat
+    # GET/DELETE → one session with its summary and turns / remove it
+    # Send "session_id" to the chat endpoints instead of re-sending "history"
+    path("chat_sessions/", views.chat_sessions, name="chat_sessions"),
+    path("chat_session_detail/<uuid:session_id>/", views.chat_session_detail, name="chat_session_detail"),
 ]
\ No newline at end of file
@@ -0,0 +1,94 @@
+# ===============================================================
+#  file_upload/vector_indexes.py
+#  Compact (quantized) HNSW indexes on DocumentChunk.embedding
+#
+#  RAG_VECTOR_QUANTIZATION="halfvec" / "binary" searches a compact expression
+#  index first and re-ranks with the float32 vectors (retrieval.py). An HNSW
+#  index costs memory and write time on every chunk INSERT, so only the index
+#  of the CONFIGURED quantization exists — none at all for the default "none"
+#
+#  FLOW OVERVIEW:
+#  Step 1 → migration 0011 builds the index of RAG_VECTOR_QUANTIZATION (if any)
+#  Step 2 → after changing the setting, `python manage.py sync_vector_indexes`
+#           builds the new index CONCURRENTLY and drops the unused one
+#
+#  The indexes are not in DocumentChunk.Meta (model state would force both
+#  on every install); they are plain SQL kept here
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+from .models import DocumentChunk, EMBEDDING_DIMENSIONS
+
+
+TABLE = DocumentChunk._meta.db_table
+FLOAT32_INDEX = "doc_chunk_embedding_hnsw"  # Declared in DocumentChunk.Meta, always present
+
+# quantization → (index name, indexed expression + operator class)
+# The expressions must stay identical to retrieval.QUANTIZED_ORDER, or
+# PostgreSQL will not use the index for the coarse ORDER BY
+QUANTIZED_INDEXES = {
+    "halfvec": (
+        "doc_chunk_embedding_half_hnsw",
+        f"(embedding::halfvec({EMBEDDING_DIMENSIONS})) halfvec_cosine_ops",
+    ),
+    "binary": (
+        "doc_chunk_embedding_bit_hnsw",
+        f"(binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})) bit_hamming_ops",
+    ),
+}
+
+
+# ================================================================
+#  Helper 1: create_index_sql / drop_index_sql
+#  Same HNSW parameters as the float32 index (m=16, ef_construction=64)
+#  concurrently=True → no write lock on the table while building
+#  (not allowed inside a transaction block)
+# ================================================================
+def create_index_sql(quantization: str, concurrently=False) -> str:
+    name, expression = QUANTIZED_INDEXES[quantization]
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {TABLE} USING hnsw ({expression}) WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def drop_index_sql(quantization: str, concurrently=False) -> str:
+    name, _expression = QUANTIZED_INDEXES[quantization]
+    return f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}"
+
+
+# ================================================================
+#  Function 1: sync_quantized_indexes
+#  Makes the database hold exactly the compact index of `quantization`
+#  cursor → any DB-API cursor (a migration's schema_editor.connection too)
+#  Returns (created, dropped) index names
+# ================================================================
+def sync_quantized_indexes(cursor, quantization: str, concurrently=False):
+    if quantization != "none" and quantization not in QUANTIZED_INDEXES:
+        raise ValueError(f"Unknown vector quantization: {quantization!r}")
+
+    existing = index_sizes(cursor)
+    created, dropped = [], []
+    for mode, (name, _expression) in QUANTIZED_INDEXES.items():
+        if mode == quantization and existing[name] is None:
+            cursor.execute(create_index_sql(mode, concurrently))
+            created.append(name)
+        elif mode != quantization and existing[name] is not None:
+            cursor.execute(drop_index_sql(mode, concurrently))
+            dropped.append(name)
+    return created, dropped
+
+
+# ================================================================
+#  Function 2: index_sizes
+#  → {index name: bytes on disk, or None when the index does not exist}
+#  for the float32 index and every compact one
+# ================================================================
+def index_sizes(cursor) -> dict:
+    names = [FLOAT32_INDEX, *(name for name, _expression in QUANTIZED_INDEXES.values())]
+    sizes = {}
+    for name in names:
+        cursor.execute("SELECT pg_relation_size(to_regclass(%s))", [name])
+        sizes[name] = cursor.fetchone()[0]
+    return sizes
@@ -0,0 +1,412 @@
+# ===============================================================
+#  file_upload/vector_snapshots.py
+#  On-disk .npy snapshots of each group's chunk vectors
+#
+#  The in-process memory index (memory_index.py) would otherwise rebuild every
+#  group from Postgres after each restart / deploy. A snapshot is opened with
+#  np.load(mmap_mode="r") instead: nothing is read until a search touches it,
+#  and every worker process maps the same files → one copy in the OS page cache
+#
+#  LAYOUT (under RAG_VECTOR_SNAPSHOT_DIR):
+#  group_<id>/CURRENT                  → name of the live version directory
+#  group_<id>/v<version>/vectors.npy   → float32 (n × 384), rows L2-normalized
+#  group_<id>/v<version>/ids.npy       → chunk UUIDs as 36-byte strings
+#  group_<id>/v<version>/document_ids.npy
+#  group_<id>/v<version>/ivf_centroids.npy + ivf_offsets.npy  (optional)
+#                                      → coarse k-means partition; rows are
+#                                        stored grouped by list, list j is
+#                                        rows offsets[j]:offsets[j+1]
+#  group_<id>/v<version>/meta.json     → version, count, dims, ivf_lists
+#
+#  FLOW OVERVIEW:
+#  Step 1 → build_group_snapshot() writes a full snapshot from Postgres
+#           (`manage.py build_vector_snapshots`, optional scikit-learn k-means)
+#  Step 2 → refresh_document_snapshot() patches the snapshot after one document
+#           is embedded / deleted: drop its old rows, append its new rows
+#           (or, when other documents changed too, every row whose chunk id
+#           is gone / new) — never a full rebuild
+#  Step 3 → read_snapshot() memory-maps the live version for the memory index
+#
+#  Version directories are written aside and published by atomically
+#  replacing CURRENT, so readers never see a half-written snapshot
+# ===============================================================
+
+
+# ---------------- Step 0: Imports ----------------
+import os
+import json
+import fcntl
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .corpus import get_corpus_version
+from .models import DocumentChunk, EMBEDDING_DIMENSIONS
+
+
+logger = logging.getLogger(__name__)
+
+ID_DTYPE = "S36"  # str(uuid) is always 36 ASCII characters
+
+# Write-through from the memory index runs here, off the search request
+# One thread: writes of one group are serialized by its flock anyway
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-snapshot")
+_pending = set()  # Group ids with a write-through already queued in this process
+_pending_lock = threading.Lock()
+
+
+# ================================================================
+#  Class: VectorSnapshot
+#  One memory-mapped snapshot version of a group
+# ================================================================
+class VectorSnapshot:
+
+    def __init__(self, version, ids, document_ids, vectors, centroids=None, offsets=None):
+        self.version = version
+        self.ids = ids
+        self.document_ids = document_ids
+        self.vectors = vectors
+        self.centroids = centroids  # None → flat snapshot (no IVF lists)
+        self.offsets = offsets
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    # ---------------- Row → IVF list ----------------
+    # Rows are stored list by list, so the assignment is implied by the offsets
+    def assignments(self):
+        if self.centroids is None:
+            return None
+        return np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets))
+
+
+def snapshots_enabled() -> bool:
+    return bool(settings.RAG_VECTOR_SNAPSHOT_DIR)
+
+
+def _group_dir(group_id) -> Path:
+    return Path(settings.RAG_VECTOR_SNAPSHOT_DIR) / f"group_{group_id}"
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# ================================================================
+#  Helper: _group_lock
+#  Exclusive flock on group_<id>/.lock — serializes writers of one group
+#  across threads and processes (web workers + embedding_worker)
+#  blocking=False → yields False instead of waiting when another writer holds it
+# ================================================================
+@contextmanager
+def _group_lock(group_id, blocking=True):
+    group_dir = _group_dir(group_id)
+    group_dir.mkdir(parents=True, exist_ok=True)
+    with open(group_dir / ".lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ================================================================
+#  Helper: fetch_group_rows
+#  (ids, document_ids, normalized float32 matrix) of a group's embedded chunks
+#  document_id → only that document's rows (incremental refresh)
+#  chunk_ids   → only these chunks (incremental refresh)
+#  Chunk text is not fetched — snapshots store vectors and ids only
+# ================================================================
+def fetch_group_rows(group_id, document_id=None, chunk_ids=None):
+    qs = DocumentChunk.objects.filter(follow_group=group_id, embedding__isnull=False)
+    if document_id is not None:
+        qs = qs.filter(document_id=document_id)
+    if chunk_ids is not None:
+        qs = qs.filter(id__in=chunk_ids)
+
+    ids, document_ids, vectors = [], [], []
+    for chunk_id, doc_id, embedding in qs.values_list("id", "document_id", "embedding").iterator(chunk_size=2000):
+        ids.append(str(chunk_id))
+        document_ids.append(str(doc_id))
+        vectors.append(embedding)
+
+    matrix = np.array(vectors, dtype=np.float32).reshape(len(vectors), EMBEDDING_DIMENSIONS)
+    return (
+        np.array(ids, dtype=ID_DTYPE),
+        np.array(document_ids, dtype=ID_DTYPE),
+        normalize_rows(matrix).astype(np.float32),
+    )
+
+
+# ================================================================
+#  Helper: kmeans_centroids
+#  Coarse IVF partition with scikit-learn MiniBatchKMeans
+#  scikit-learn is optional — without it (or with too few rows) the
+#  snapshot is written flat and searched exhaustively
+# ================================================================
+def kmeans_centroids(matrix, n_lists: int):
+    n_lists = min(n_lists, len(matrix) // 4)  # Lists of a handful of rows are pointless
+    if n_lists < 2:
+        return None
+    try:
+        from sklearn.cluster import MiniBatchKMeans
+    except ImportError:
+        logger.warning("scikit-learn is not installed — writing a flat snapshot without IVF lists")
+        return None
+
+    kmeans = MiniBatchKMeans(n_clusters=n_lists, n_init=3, random_state=0, batch_size=4096)
+    kmeans.fit(matrix)
+    return normalize_rows(kmeans.cluster_centers_).astype(np.float32)
+
+
+def _assign(matrix, centroids):
+    # Rows and centroids are normalized → highest dot product = nearest centroid
+    if len(matrix) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.argmax(matrix @ centroids.T, axis=1)
+
+
+# ================================================================
+#  Function 1: write_snapshot
+#  Writes v<version>/ next to the live one, then swaps CURRENT to it
+#  centroids   → reuse an existing IVF partition (rows are re-assigned to it)
+#  assignments → list of each row when already known (skips re-assignment)
+#  Older version directories are removed; processes that still map them keep
+#  a valid mapping (unlinked files stay readable until unmapped)
+# ================================================================
+def write_snapshot(group_id, version, ids, document_ids, matrix, centroids=None, assignments=None):
+    group_dir = _group_dir(group_id)
+    group_dir.mkdir(parents=True, exist_ok=True)
+    name = f"v{version}"
+    tmp_dir = group_dir / f".{name}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+
+    # ---------------- Step 1: Order Rows by IVF List ----------------
+    offsets = None
+    if centroids is not None:
+        if assignments is None:
+            assignments = _assign(matrix, centroids)
+        order = np.argsort(assignments, kind="stable")
+        ids, document_ids, matrix = ids[order], document_ids[order], matrix[order]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=len(centroids)))])
+
+    # ---------------- Step 2: Write the Version Directory ----------------
+    np.save(tmp_dir / "vectors.npy", np.ascontiguousarray(matrix, dtype=np.float32))
+    np.save(tmp_dir / "ids.npy", ids.astype(ID_DTYPE))
+    np.save(tmp_dir / "document_ids.npy", document_ids.astype(ID_DTYPE))
+    if centroids is not None:
+        np.save(tmp_dir / "ivf_centroids.npy", centroids.astype(np.float32))
+        np.save(tmp_dir / "ivf_offsets.npy", offsets.astype(np.int64))
+    meta = {
+        "version": version,
+        "count": len(ids),
+        "dims": EMBEDDING_DIMENSIONS,
+        "ivf_lists": 0 if centroids is None else len(centroids),
+    }
+    (tmp_dir / "meta.json").write_text(json.dumps(meta))
+
+    shutil.rmtree(group_dir / name, ignore_errors=True)
+    os.rename(tmp_dir, group_dir / name)
+
+    # ---------------- Step 3: Publish + Prune ----------------
+    current_tmp = group_dir / f".CURRENT.tmp-{os.getpid()}"
+    current_tmp.write_text(name)
+    os.replace(current_tmp, group_dir / "CURRENT")
+
+    for old in group_dir.glob("v*"):
+        if old.name != name:
+            shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+# ================================================================
+#  Function 2: read_snapshot
+#  Memory-maps the live snapshot of a group → VectorSnapshot, or None
+#  when snapshots are disabled or the group has none
+# ================================================================
+def read_snapshot(group_id):
+    if not snapshots_enabled():
+        return None
+    group_dir = _group_dir(group_id)
+    try:
+        version_dir = group_dir / (group_dir / "CURRENT").read_text().strip()
+        meta = json.loads((version_dir / "meta.json").read_text())
+        if meta["dims"] != EMBEDDING_DIMENSIONS:
+            return None  # Written for another embedding model
+        centroids = offsets = None
+        if meta["ivf_lists"]:
+            centroids = np.load(version_dir / "ivf_centroids.npy")
+            offsets = np.load(version_dir / "ivf_offsets.npy")
+        return VectorSnapshot(
+            version=meta["version"],
+            ids=np.load(version_dir / "ids.npy", mmap_mode="r"),
+            document_ids=np.load(version_dir / "document_ids.npy", mmap_mode="r"),
+            vectors=np.load(version_dir / "vectors.npy", mmap_mode="r"),
+            centroids=centroids,
+            offsets=offsets,
+        )
+    except (OSError, ValueError, KeyError):
+        return None  # Missing, or pruned between reading CURRENT and opening it
+
+
+# ================================================================
+#  Function 3: list_snapshot_groups
+#  Group ids that have a snapshot directory (used to warm workers at startup)
+# ================================================================
+def list_snapshot_groups():
+    if not snapshots_enabled():
+        return []
+    root = Path(settings.RAG_VECTOR_SNAPSHOT_DIR)
+    if not root.is_dir():
+        return []
+    groups = []
+    for path in root.glob("group_*"):
+        try:
+            groups.append(int(path.name[len("group_"):]))
+        except ValueError:
+            continue
+    return sorted(groups)
+
+
+# ================================================================
+#  Function 4: build_group_snapshot
+#  Full rebuild of one group from Postgres
+#  ivf_lists → None = RAG_VECTOR_SNAPSHOT_IVF_LISTS, 0 = flat
+#  The version is read BEFORE the rows (same rule as memory_index._load)
+# ================================================================
+def build_group_snapshot(group_id, ivf_lists=None):
+    if ivf_lists is None:
+        ivf_lists = settings.RAG_VECTOR_SNAPSHOT_IVF_LISTS
+
+    with _group_lock(group_id):
+        version = get_corpus_version(group_id)
+        ids, document_ids, matrix = fetch_group_rows(group_id)
+        centroids = kmeans_centroids(matrix, ivf_lists) if ivf_lists else None
+        return write_snapshot(group_id, version, ids, document_ids, matrix, centroids=centroids)
+
+
+# ================================================================
+#  Function 5: save_loaded_snapshot
+#  Write-through from memory_index after a Postgres load at `version`
+#  Keeps the existing IVF centroids, skips when another process is already
+#  writing this group or a snapshot at least this new exists
+# ================================================================
+def save_loaded_snapshot(group_id, version, ids, document_ids, matrix):
+    with _group_lock(group_id, blocking=False) as locked:
+        if not locked:
+            return
+        base = read_snapshot(group_id)
+        if base is not None and base.version >= version:
+            return
+        write_snapshot(
+            group_id, version,
+            np.array(ids, dtype=ID_DTYPE), np.array(document_ids, dtype=ID_DTYPE), matrix,
+            centroids=base.centroids if base is not None else None,
+        )
+
+
+# ================================================================
+#  Function 5b: schedule_loaded_snapshot
+#  Queues save_loaded_snapshot() on the background writer thread, so a search
+#  that just loaded a group from Postgres does not wait for ~MBs of np.save
+#  One queued write per group; a newer load while one is pending is dropped
+#  (the pending one is at most one version behind, the next load catches up)
+#  RAG_VECTOR_SNAPSHOT_WRITE_ASYNC=False → write inline (tests, scripts)
+# ================================================================
+def schedule_loaded_snapshot(group_id, version, ids, document_ids, matrix):
+    if not settings.RAG_VECTOR_SNAPSHOT_WRITE_ASYNC:
+        save_loaded_snapshot(group_id, version, ids, document_ids, matrix)
+        return
+
+    with _pending_lock:
+        if group_id in _pending:
+            return
+        _pending.add(group_id)
+    _writer.submit(_save_in_background, group_id, version, ids, document_ids, matrix)
+
+
+def _save_in_background(group_id, version, ids, document_ids, matrix):
+    try:
+        save_loaded_snapshot(group_id, version, ids, document_ids, matrix)
+    except Exception:
+        logger.exception("Vector snapshot write-through failed for group %s", group_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(group_id)
+
+
+# ================================================================
+#  Function 6: refresh_document_snapshot
+#  Incremental update after ONE document's chunks changed and the group's
+#  corpus version was bumped (embed / re-embed / delete)
+#
+#  snapshot version == current     → already up to date
+#  snapshot version == current - 1 → only this document changed since:
+#                                    drop its rows, append its new rows
+#  anything else                   → other documents changed too (concurrent
+#                                    ingests): diff the group's chunk ids
+#                                    against the snapshot, drop the vanished
+#                                    rows, fetch only the new ones
+#  no snapshot for the group       → nothing to do (created by the command or
+#                                    by the memory index on first load)
+#  group over RAG_MEMORY_INDEX_MAX_CHUNKS → skipped, the memory index never
+#                                    loads it anyway
+#
+#  Chunk ids are never reused (every (re-)embed inserts new rows), so the id
+#  diff sees every change. New rows are assigned to the existing IVF lists
+#
+#  Never raises — a failed refresh only means the next load comes from Postgres
+# ================================================================
+def refresh_document_snapshot(group_id, document_id):
+    if not snapshots_enabled() or not (_group_dir(group_id) / "CURRENT").exists():
+        return
+    try:
+        with _group_lock(group_id):
+            current = get_corpus_version(group_id)
+            base = read_snapshot(group_id)
+            if base is None:
+                return
+            if base.version >= current:
+                return
+
+            chunks = DocumentChunk.objects.filter(follow_group=group_id, embedding__isnull=False)
+            if chunks.count() > settings.RAG_MEMORY_INDEX_MAX_CHUNKS:
+                return
+
+            if base.version == current - 1:
+                keep = base.document_ids != str(document_id).encode("ascii")
+                new_ids, new_document_ids, new_matrix = fetch_group_rows(group_id, document_id=document_id)
+            else:
+                live = np.array([str(i) for i in chunks.values_list("id", flat=True)], dtype=ID_DTYPE)
+                keep = np.isin(base.ids, live)
+                missing = np.setdiff1d(live, base.ids[keep])
+                new_ids, new_document_ids, new_matrix = fetch_group_rows(
+                    group_id, chunk_ids=[i.decode("ascii") for i in missing],
+                )
+            assignments = None
+            if base.centroids is not None:
+                assignments = np.concatenate([base.assignments()[keep], _assign(new_matrix, base.centroids)])
+            write_snapshot(
+                group_id, current,
+                np.concatenate([base.ids[keep], new_ids]),
+                np.concatenate([base.document_ids[keep], new_document_ids]),
+                np.concatenate([base.vectors[keep], new_matrix]),
+                centroids=base.centroids,
+                assignments=assignments,
+            )
+    except Exception:
+        logger.exception("Vector snapshot refresh failed for group %s", group_id)
@@ -10,45 +10,93 @@
 #  5. rag_chat        → POST ask a question across ALL embedded docs in the group
 #  6. preview_file    → GET  generate a 10-min MinIO presigned URL
 #  7. doc_chat        → POST ask a question scoped to ONE specific document
+#  8. embed_file_async     → POST queue the embedding pipeline, return at once
+#  9. embedding_job_status → GET  poll a queued/running embedding job
+#  10. rag_cache_stats     → GET  hit/miss counters of the RAG caches (staff only)
+#  11. rag_chat_stream     → POST rag_chat, answer streamed as Server-Sent Events
+#  12. doc_chat_stream     → POST doc_chat, answer streamed as Server-Sent Events
+#  13. chat_sessions       → GET list / POST create server-side chat sessions
+#  14. chat_session_detail → GET a session with its turns / DELETE it
+#  15. bulk_upload_files   → POST many files at once (parallel MinIO writes)
+#  16. presigned_upload    → POST presigned PUT / multipart URLs for a direct MinIO upload
+#  17. complete_upload     → POST verify the uploaded object and register the Document
+#  18. abort_upload        → POST cancel an unfinished multipart upload
+#
+#  rag_chat, doc_chat and their *_stream variants accept an optional
+#  "session_id": the history then comes from the ChatSession (rolling summary
+#  + latest turns) instead of the request body, and the new turn is stored
 #
 #  RAG HELPER FUNCTIONS (internal, not views):
 #  - embed_query          → convert a question string into a vector
-#  - search_similar_chunks→ find top-K closest chunks in pgvector
-#  - build_prompt         → assemble context + history into a LLaMA prompt
+#  - build_prompt         → assemble packed context + history into a LLaMA prompt
+#  - answer_cache_key     → cache key of a finished answer (corpus-version aware)
+#  - remember_answer      → store a finished answer in the exact + semantic caches
+#  - resolve_chat_session → load the ChatSession named by "session_id" (if any)
+#  - search_similar_chunks / search_document_chunks → see retrieval.py
 # ===============================================================
 
 
 # ---------------- Step 0: Imports & Config ----------------
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes
 from .rbac_perms import CanViewFiles, CanUploadFiles, CanDeleteFiles, CanEmbedFiles, CanRagChat
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser  # Required for file upload parsing
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
-from pgvector.django import CosineDistance  # Annotates chunks with their vector distance from the query
 
-from .models import Document, DocumentChunk
-from .serializers import DocumentSerializer
+from django.http import StreamingHttpResponse  # Chunked response used for Server-Sent Events
+
+from .models import Document, EmbeddingJob, ChatSession
+from .serializers import DocumentSerializer, EmbeddingJobSerializer, ChatSessionSerializer, ChatSessionDetailSerializer
 from .embedding_file import create_embeddings_for_document  # Full embedding pipeline
+from .jobs import enqueue_embedding_job  # Background queue consumed by `manage.py embedding_worker`
+from .bulk_upload import upload_documents  # Many files per request, written to MinIO in parallel
+from .direct_upload import start_direct_upload, finish_direct_upload, abort_direct_upload, DirectUploadError
+from .embedding_file import embedding_cache_stats  # Chunk-embedding cache counters
+from .caching import query_embedding_cache, answer_cache, normalize_question, history_digest, all_cache_stats, MISSING
+from .corpus import bump_corpus_version, get_corpus_version  # Answer-cache invalidation
+from .semantic_cache import lookup_semantic_answer, store_semantic_answer, semantic_cache_stats
+from .memory_index import memory_index  # In-process per-group vector matrices
+from .vector_snapshots import refresh_document_snapshot  # On-disk .npy copies of those matrices
+from .retrieval import search_similar_chunks, search_document_chunks  # pgvector ANN search
+from .context_packing import pack_context, context_packing_stats  # Token-budgeted prompt context
+from .chat_sessions import prompt_history, record_exchange  # Server-side history + rolling summary
+from .pagination import keyset_page, InvalidCursor  # Cursor pages for list_files
 from .utils import get_group_id  # Resolves company group_id for any user
-from ollama import Client  # Local Ollama client for LLaMA inference
+from backend import ollama_client  # Shared, pooled Ollama client for LLaMA inference
+from backend.storage import presigned_url  # Shared S3 client + cached presigned GET URLs
+from .embedders import embed_texts, embedding_model_id  # Query embeddings (Ollama or in-process)
 
-import boto3
+import json
 from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError  # Malformed session_id UUID
 
 # ---------------- RAG Model Config ----------------
 # These two models must be pulled in Ollama before the RAG features work:
 #   ollama pull all-minilm:l6-v2   (embedding)
 #   ollama pull llama3.2:3b        (generation)
-EMBEDDING_MODEL_NAME = "all-minilm:l6-v2"  # Converts text to 384-dim vectors
-LLM_MODEL_NAME = "llama3.2:3b"             # Generates natural language answers from context
+# Configurable via OLLAMA_EMBED_MODEL / OLLAMA_CHAT_MODEL (settings Step 21);
+# RAG_EMBEDDING_BACKEND="local" embeds in-process instead (file_upload/embedders.py)
+EMBEDDING_MODEL_NAME = embedding_model_id()  # Converts text to 384-dim vectors
+LLM_MODEL_NAME = settings.OLLAMA_CHAT_MODEL  # Generates natural language answers from context
 
 
 # ================================================================
 #  View 1: list_files
 #  GET /list_files/
-#  Returns all documents belonging to the current user's company group
+#  Returns the documents of the current user's company group, newest first
 #  Requires: IsAuthenticated + CanViewFiles (files:view RBAC check)
+#
+#  Query params (all optional):
+#   is_embedded → "true" / "false"
+#   mime_type   → exact ("application/pdf") or a family ("image/*")
+#   limit       → page size (max FILE_LIST_MAX_PAGE_SIZE)
+#   cursor      → next_cursor of the previous page
+#
+#  Without limit/cursor the response is the plain list (all matching files)
+#  With either one it is a keyset page (file_upload/pagination.py):
+#   { "results": [...], "next_cursor": "<opaque>" | null }
 # ================================================================
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, CanViewFiles])
@@ -56,17 +104,51 @@ def list_files(request):
     # ---------------- Step 1: Resolve Company Group ----------------
     # group_id scopes the query — user only sees their company's files
     group_id = get_group_id(request.user)
+    params = request.query_params
 
     # ---------------- Step 2: Query Documents ----------------
-    # Newest first (ordered by -created_at in model Meta)
+    # Newest first; id breaks created_at ties (matches document_group_created_idx)
     docs = (
         Document.objects
         .filter(follow_group=group_id)
-        .order_by("-created_at")
+        .order_by("-created_at", "-id")
     )
 
-    serializer = DocumentSerializer(docs, many=True)
-    return Response(serializer.data)
+    # ---------------- Step 3: Optional Filters ----------------
+    is_embedded = params.get("is_embedded")
+    if is_embedded is not None:
+        if is_embedded.lower() not in ("true", "false"):
+            return Response({"error": "is_embedded must be true or false."}, status=400)
+        docs = docs.filter(is_embedded=is_embedded.lower() == "true")
+
+    mime_type = params.get("mime_type")
+    if mime_type:
+        if mime_type.endswith("/*"):
+            docs = docs.filter(mime_type__startswith=mime_type[:-1])  # "image/*" → "image/"
+        else:
+            docs = docs.filter(mime_type=mime_type)
+
+    # ---------------- Step 4a: Unpaginated (default) ----------------
+    if "limit" not in params and "cursor" not in params:
+        serializer = DocumentSerializer(docs, many=True)
+        return Response(serializer.data)
+
+    # ---------------- Step 4b: Keyset Page ----------------
+    try:
+        limit = int(params.get("limit", settings.FILE_LIST_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "limit must be a number."}, status=400)
+    limit = max(1, min(limit, settings.FILE_LIST_MAX_PAGE_SIZE))
+
+    try:
+        rows, next_cursor = keyset_page(docs, params.get("cursor"), limit)
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response({
+        "results": DocumentSerializer(rows, many=True).data,
+        "next_cursor": next_cursor,  # null → this was the last page
+    })
 
 
 # ================================================================
@@ -117,8 +199,14 @@ def delete_file(request):
     # doc.file.delete(save=False) → removes the object from MinIO bucket
     # save=False → don't trigger another save() after deletion
     # doc.delete()              → removes the DB row (also cascades to DocumentChunk rows)
+    # bump_corpus_version()   → cached RAG answers may cite the deleted file
+    # refresh_document_snapshot() → drops the file's rows from the group's vector snapshot
+    doc_id = doc.id
     doc.file.delete(save=False)
     doc.delete()
+    if doc.is_embedded:
+        bump_corpus_version(doc.follow_group)
+        refresh_document_snapshot(doc.follow_group, doc_id)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -166,68 +254,111 @@ def embed_file(request):
 #  Converts a plain text question into a vector using the same
 #  embedding model used to embed document chunks
 #  The returned vector is used for CosineDistance similarity search
+#
+#  Cached by (model, normalized question) in query_embedding_cache —
+#  repeated questions and frontend retries skip the Ollama round trip
 # ================================================================
 def embed_query(text: str):
-    client = Client()
-    resp = client.embeddings(model=EMBEDDING_MODEL_NAME, prompt=text)
-    return resp["embedding"]  # list[float] — 384 dimensions for all-minilm:l6-v2
+    question = normalize_question(text)
+
+    def compute():
+        # Same backend as the chunk pipeline → same vector space
+        return embed_texts([question])[0]  # 384 floats
+
+    return query_embedding_cache.get_or_set((EMBEDDING_MODEL_NAME, question), compute)
 
 
 # ================================================================
-#  RAG Helper 2: search_similar_chunks
-#  Finds the top-K document chunks most semantically similar to the query vector
-#  Scoped to the user's company group AND only searches embedded documents
+#  RAG Helper 1b: answer_cache_key
+#  Key of a finished answer in answer_cache, or None when the cache is disabled
 #
-#  Uses pgvector CosineDistance annotation → lower distance = more similar
-# ================================================================
-def search_similar_chunks(user, query_vector, top_k=10):
-    # ---------------- Step 1: Scope to Company Group ----------------
-    # Only search chunks from this company's embedded documents
-    group_id = get_group_id(user)
-
-    # ---------------- Step 2: Vector Similarity Query ----------------
-    # .annotate(distance=CosineDistance(...)) → adds a computed "distance" column
-    # .order_by("distance") → closest chunks come first
-    # [:top_k] → SQL LIMIT — only return the best matches
-    qs = (
-        DocumentChunk.objects
-        .filter(document__follow_group=group_id, document__is_embedded=True)
-        .annotate(distance=CosineDistance("embedding", query_vector))
-        .order_by("distance")[:top_k]
-    )
+#  (scope, corpus version, normalized question, history digest)
+#  scope → ("group", group_id) for rag_chat, ("document", id) for doc_chat
+#  The view reads the corpus version first (get_corpus_version), so any
+#  embed/delete in the group moves every later request onto fresh keys
+# ================================================================
+def answer_cache_key(group_id, corpus_version, question, digest, document_id=None):
+    if not settings.RAG_ANSWER_CACHE_ENABLED:
+        return None
+    scope = ("document", str(document_id)) if document_id else ("group", group_id)
+    return (scope, corpus_version, normalize_question(question), digest)
 
-    # ---------------- Step 3: Serialize to Dict ----------------
-    # Returns plain dicts so build_prompt() can consume them without ORM awareness
-    results = []
-    for c in qs:
-        results.append({
-            "id": str(c.id),
-            "text": c.text,           # The text that will be injected as LLM context
-            "document_id": str(c.document_id),
-        })
-    return results
+
+def cached_answer(cache_key):
+    if cache_key is None:
+        return None
+    cached = answer_cache.get(cache_key)
+    return None if cached is MISSING else cached
+
+
+# ================================================================
+#  RAG Helper 1c: remember_answer
+#  Stores a freshly generated answer
+#  cache_key → exact-match answer_cache entry (skipped when None)
+#  semantic  → kwargs for store_semantic_answer() (rag_chat only; skipped when None)
+# ================================================================
+def remember_answer(answer, chunks, cache_key=None, semantic=None):
+    if cache_key is not None:
+        answer_cache.set(cache_key, {"answer": answer, "chunks": chunks})
+    if semantic is not None:
+        store_semantic_answer(**semantic, answer=answer, chunks=chunks)
+
+
+# ================================================================
+#  RAG Helper 1d: resolve_chat_session
+#  Optional "session_id" in the request body → (session, error_response)
+#  The session must belong to the caller and match the endpoint's scope:
+#  document=None for rag_chat, the chatted document for doc_chat
+#  No session_id → (None, None): the request's own "history" is used
+# ================================================================
+def resolve_chat_session(request, document=None):
+    session_id = request.data.get("session_id")
+    if not session_id:
+        return None, None
+    try:
+        session = ChatSession.objects.get(id=session_id, user=request.user, document=document)
+    except (ChatSession.DoesNotExist, ValueError, DjangoValidationError):
+        return None, Response({"error": "Chat session not found."}, status=status.HTTP_404_NOT_FOUND)
+    return session, None
+
+
+def record_turn(session, question, answer):
+    if session is not None:
+        record_exchange(session, question, answer)
 
 
 # ================================================================
-#  RAG Helper 3: build_prompt
+#  RAG Helper 2: build_prompt
 #  Assembles the final prompt string sent to LLaMA
 #
 #  Structure:
 #   - System instruction (answer only from context)
 #   - Last 6 messages of conversation history (for multi-turn chat)
-#   - Context: the top-K retrieved chunk texts
+#     role "summary" → rolling summary of a ChatSession's older turns
+#   - Context: the top-K retrieved chunks, packed by pack_context()
+#     (neighbouring chunks merged, overlap + duplicates removed, token budget)
 #   - The user's current question
+#
+#  Returns (prompt, context_stats) — context_stats reports the tokens saved
+#  and is sent back to the client as "context"
 # ================================================================
 def build_prompt(question: str, chunks: list[dict], history: list[dict]):
     # ---------------- Step 1: Format Conversation History ----------------
     # Only the last 6 messages → keeps prompt size manageable
     history_text = ""
     for msg in history[-6:]:
-        history_text += f"{msg['role'].upper()}: {msg['content']}\n"
+        if msg["role"] == "summary":
+            history_text += f"Summary of the earlier conversation: {msg['content']}\n"
+        else:
+            history_text += f"{msg['role'].upper()}: {msg['content']}\n"
 
     # ---------------- Step 2: Format Retrieved Chunks as Context ----------------
-    # Each chunk is prefixed with "- " for readability in the prompt
-    context = "\n\n".join(f"- {c['text']}" for c in chunks)
+    # Each passage is prefixed with "- " for readability in the prompt
+    if settings.RAG_CONTEXT_PACKING:
+        passages, context_stats = pack_context(chunks)
+    else:
+        passages, context_stats = [c["text"] for c in chunks], None
+    context = "\n\n".join(f"- {text}" for text in passages)
 
     # ---------------- Step 3: Assemble Prompt ----------------
     # "answer using ONLY the context" → prevents LLaMA from hallucinating outside the docs
@@ -239,17 +370,108 @@ def build_prompt(question: str, chunks: list[dict], history: list[dict]):
         "If the context is not enough, say you are not sure. "
         "Answer briefly and clearly."
     )
-    return prompt
+    return prompt, context_stats
+
+
+# ================================================================
+#  RAG Helper 3: ask_llm
+#  Sends the prompt to LLaMA and returns the full answer text (non-streaming)
+# ================================================================
+def ask_llm(prompt: str) -> str:
+    return ollama_client.chat([{"role": "user", "content": prompt}], model=LLM_MODEL_NAME)
+
+
+# ================================================================
+#  RAG Helper 4: sse_event / stream_answer_events
+#  Server-Sent Events framing for the *_stream endpoints
+#
+#  Event sequence sent to the client:
+#   event: sources → {"chunks": [...], ...}   (immediately, before generation)
+#   event: token   → {"content": "..."}       (one per generated piece)
+#   event: done    → {"answer": "<full text>", "chunk_count": N}
+#   event: error   → {"error": "..."}         (if generation fails mid-stream)
+#
+#  on_answer → optional callback(answer) run once generation finished cleanly
+#              (the views use it to fill the answer caches)
+#  A cached answer is replayed with prompt=None and fallback_answer=<answer>
+# ================================================================
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_answer_events(prompt, sources: dict, fallback_answer: str = "", on_answer=None):
+    # ---------------- Step 1: Sources First ----------------
+    # The frontend can render the "Sources" section while the model is still thinking
+    yield sse_event("sources", sources)
+
+    # ---------------- Step 2: Nothing to Ask ----------------
+    # No chunks → send the canned answer as a single token, skip the LLM
+    if prompt is None:
+        yield sse_event("token", {"content": fallback_answer})
+        yield sse_event("done", {"answer": fallback_answer, "chunk_count": len(sources.get("chunks", []))})
+        return
+
+    # ---------------- Step 3: Tokens As They Are Generated ----------------
+    # chat_stream() yields the reply piece by piece as Ollama generates it
+    parts = []
+    try:
+        for token in ollama_client.chat_stream([{"role": "user", "content": prompt}], model=LLM_MODEL_NAME):
+            parts.append(token)
+            yield sse_event("token", {"content": token})
+    except Exception as e:
+        yield sse_event("error", {"error": f"Generation failed: {str(e)}"})
+        return
+
+    answer = "".join(parts)
+    if on_answer is not None:
+        on_answer(answer)
+    yield sse_event("done", {"answer": answer, "chunk_count": len(sources.get("chunks", []))})
+
+
+# ================================================================
+#  RAG Helper 5: sse_response
+#  Wraps an event generator in a StreamingHttpResponse
+#  X-Accel-Buffering: no → stops Nginx from buffering the stream
+# ================================================================
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ================================================================
+#  RAG Helper 6: EventStreamRenderer
+#  Lets DRF's content negotiation accept "Accept: text/event-stream" on the
+#  *_stream views — without it DRF answers 406 before the view runs
+#  The stream itself is a StreamingHttpResponse and never goes through a
+#  renderer; only the view's early Response objects (400/404/500 errors) do,
+#  and those are still rendered as JSON
+# ================================================================
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = JSONRenderer.media_type
+        return JSONRenderer().render(data, JSONRenderer.media_type, renderer_context)
 
 
 # ================================================================
 #  View 5: rag_chat
 #  POST /rag_chat/
-#  Body: { "question": "...", "history": [...] }
+#  Body: { "question": "...", "history": [...] }  or  { "question": "...", "session_id": "..." }
 #  Global RAG — searches ALL embedded documents in the company group
 #
 #  Flow:
+#   Step 0 → Load the chat session (if any) — its summary + latest turns replace "history"
+#            Return the cached answer if this question was already answered
+#            for the same corpus version + history
 #   Step 1 → Embed the question into a vector
+#            → reuse the answer of a near-identical earlier question (semantic cache)
 #   Step 2 → Find top-10 most similar chunks across all group documents
 #   Step 3 → Build a prompt with context + history
 #   Step 4 → Ask LLaMA 3.2 to generate an answer
@@ -265,13 +487,55 @@ def rag_chat(request):
     if not question:
         return Response({"error": "question is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+    session, error = resolve_chat_session(request)
+    if error is not None:
+        return error
+    if session is not None:
+        history = prompt_history(session)
+
     try:
+        # ---------------- Step 0: Answer Cache ----------------
+        group_id = get_group_id(request.user)
+        corpus_version = get_corpus_version(group_id)
+        digest = history_digest(history)
+        cache_key = answer_cache_key(group_id, corpus_version, question, digest)
+        cached = cached_answer(cache_key)
+        if cached is not None:
+            record_turn(session, question, cached["answer"])
+            return Response({
+                "answer": cached["answer"],
+                "chunks": cached["chunks"],
+                "chunk_count": len(cached["chunks"]),
+                "session_id": session and str(session.id),
+            }, status=status.HTTP_200_OK)
+
         # ---------------- Step 1: Embed the Question ----------------
         query_vec = embed_query(question)
 
+        # ---------------- Step 1b: Semantic Cache ----------------
+        # A paraphrase of an already answered question (same corpus + history) → reuse it
+        semantic = {
+            "group_id": group_id,
+            "corpus_version": corpus_version,
+            "history_digest": digest,
+            "embedding_model": EMBEDDING_MODEL_NAME,
+            "query_vector": query_vec,
+            "question": question,
+        }
+        similar = lookup_semantic_answer(**semantic)
+        if similar is not None:
+            remember_answer(similar["answer"], similar["chunks"], cache_key=cache_key)
+            record_turn(session, question, similar["answer"])
+            return Response({
+                "answer": similar["answer"],
+                "chunks": similar["chunks"],
+                "chunk_count": len(similar["chunks"]),
+                "session_id": session and str(session.id),
+            }, status=status.HTTP_200_OK)
+
         # ---------------- Step 2: Retrieve Similar Chunks ----------------
         # Scoped to the user's company group automatically inside search_similar_chunks()
-        chunks = search_similar_chunks(request.user, query_vec, top_k=10)
+        chunks = search_similar_chunks(request.user, query_vec, top_k=10, question=question)
 
         if not chunks:
             # No embedded documents found for this company — tell user to embed first
@@ -281,20 +545,19 @@ def rag_chat(request):
             })
 
         # ---------------- Step 3: Build Prompt ----------------
-        prompt = build_prompt(question, chunks, history)
+        prompt, context_stats = build_prompt(question, chunks, history)
 
         # ---------------- Step 4: Ask LLaMA ----------------
-        client = Client()
-        resp = client.chat(
-            model=LLM_MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        answer = resp["message"]["content"]
+        answer = ask_llm(prompt)
+        remember_answer(answer, chunks, cache_key=cache_key, semantic=semantic)
+        record_turn(session, question, answer)
 
         return Response({
             "answer": answer,
             "chunks": chunks,          # Returned so frontend can show "Sources" section
-            "chunk_count": len(chunks)
+            "chunk_count": len(chunks),
+            "context": context_stats,  # Prompt tokens before / after packing
+            "session_id": session and str(session.id),
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -325,33 +588,16 @@ def preview_file(request, document_id):
     except Document.DoesNotExist:
         return Response({"error": "Document not found."}, status=404)
 
-    # ---------------- Step 2: Create Boto3 S3 Client for MinIO ----------------
-    # boto3 is used directly here (not django-storages) because we need
-    # generate_presigned_url() which is not exposed via Django's File API
-    # signature_version="s3v4" is required for MinIO compatibility
-    s3_client = boto3.client(
-        "s3",
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,         # MinIO endpoint (e.g., http://minio:9000)
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        config=boto3.session.Config(signature_version="s3v4"),
-    )
-
-    # ---------------- Step 3: Generate Presigned URL ----------------
+    # ---------------- Step 2: Presigned URL (cached) ----------------
     # "get_object" → the client can only GET this specific file, not write/delete
-    # ExpiresIn=600 → URL is valid for 10 minutes, then becomes invalid
+    # expires=600 → URL is valid for 10 minutes; the same URL is re-served for
+    # the first 80% of that (S3_PRESIGNED_URL_CACHE_REUSE), then re-signed
     # doc.file.name → the MinIO object key (e.g., "uploads/report.pdf")
-    presigned_url = s3_client.generate_presigned_url(
-        "get_object",
-        Params={
-            "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
-            "Key": doc.file.name,
-        },
-        ExpiresIn=600,  # 10 minutes
-    )
+    # Signed by the shared per-process boto3 client (backend/storage.py)
+    url = presigned_url(doc.file.name, expires=600)  # 10 minutes
 
     return Response({
-        "url": presigned_url,          # Frontend uses this to render an iframe or download link
+        "url": url,                    # Frontend uses this to render an iframe or download link
         "mime_type": doc.mime_type,    # Frontend needs this to pick the right viewer (PDF/image/etc.)
         "filename": doc.original_filename,
         "is_embedded": doc.is_embedded,  # Frontend can show "Embed" button if False
@@ -359,23 +605,12 @@ def preview_file(request, document_id):
 
 
 # ================================================================
-#  View 7: doc_chat
-#  POST /doc_chat/
-#  Body: { "document_id": "...", "question": "...", "history": [...] }
-#  Document-scoped RAG — searches ONLY the chunks of a specific document
-#  Useful for "chat with this file" use cases
-#
-#  Flow:
-#   Step 1 → Validate document_id + question
-#   Step 2 → Verify document exists, belongs to the group, and is embedded
-#   Step 3 → Embed the question
-#   Step 4 → Search ONLY this document's chunks (not the whole group)
-#   Step 5 → Build prompt + ask LLaMA → return answer
-#  Requires: IsAuthenticated + CanRagChat (prompt:execute RBAC check)
+#  Helper: _resolve_doc_chat
+#  Shared input validation for doc_chat and doc_chat_stream
+#  Returns (doc, question, history, session, error_response)
+#  With a "session_id" the history comes from that ChatSession
 # ================================================================
-@api_view(["POST"])
-@permission_classes([IsAuthenticated, CanRagChat])
-def doc_chat(request):
+def _resolve_doc_chat(request):
     # ---------------- Step 1: Validate Input ----------------
     group_id    = get_group_id(request.user)
     document_id = request.data.get("document_id", "").strip()
@@ -383,9 +618,9 @@ def doc_chat(request):
     history     = request.data.get("history",     []) or []
 
     if not document_id:
-        return Response({"error": "document_id is required."}, status=400)
+        return None, question, history, None, Response({"error": "document_id is required."}, status=400)
     if not question:
-        return Response({"error": "question is required."}, status=400)
+        return None, question, history, None, Response({"error": "question is required."}, status=400)
 
     # ---------------- Step 2: Verify Document ----------------
     # Three conditions must all be true:
@@ -399,54 +634,493 @@ def doc_chat(request):
             is_embedded=True,
         )
     except Document.DoesNotExist:
-        return Response(
+        return None, question, history, None, Response(
             {"error": "Document not found or has not been embedded yet."},
             status=404,
         )
 
+    # ---------------- Step 3: Chat Session ----------------
+    session, error = resolve_chat_session(request, document=doc)
+    if error is not None:
+        return None, question, history, None, error
+    if session is not None:
+        history = prompt_history(session)
+
+    return doc, question, history, session, None
+
+
+# ================================================================
+#  View 7: doc_chat
+#  POST /doc_chat/
+#  Body: { "document_id": "...", "question": "...", "history": [...] }
+#        ("session_id" instead of "history" → server-side history, see rag_chat)
+#  Document-scoped RAG — searches ONLY the chunks of a specific document
+#  Useful for "chat with this file" use cases
+#
+#  Flow:
+#   Step 1 → Validate document_id + question
+#   Step 2 → Verify document exists, belongs to the group, and is embedded
+#   Step 3 → Embed the question
+#   Step 4 → Search ONLY this document's chunks (not the whole group)
+#   Step 5 → Build prompt + ask LLaMA → return answer
+#  Requires: IsAuthenticated + CanRagChat (prompt:execute RBAC check)
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanRagChat])
+def doc_chat(request):
+    # ---------------- Steps 1-2: Validate Input + Verify Document ----------------
+    # Shared with doc_chat_stream — returns a ready 400/404 Response on failure
+    doc, question, history, session, error = _resolve_doc_chat(request)
+    if error is not None:
+        return error
+
     try:
-        # ---------------- Step 3: Embed the Question ----------------
+        # ---------------- Step 3a: Answer Cache ----------------
+        cache_key = answer_cache_key(
+            doc.follow_group, get_corpus_version(doc.follow_group),
+            question, history_digest(history), document_id=doc.id,
+        )
+        cached = cached_answer(cache_key)
+        if cached is not None:
+            record_turn(session, question, cached["answer"])
+            return Response({
+                "answer":       cached["answer"],
+                "document_id":  str(doc.id),
+                "filename":     doc.original_filename,
+                "chunk_count":  len(cached["chunks"]),
+                "session_id":   session and str(session.id),
+            }, status=200)
+
+        # ---------------- Step 3b: Embed the Question ----------------
         query_vector = embed_query(question)
 
         # ---------------- Step 4: Search ONLY This Document's Chunks ----------------
-        # Key difference from rag_chat: .filter(document_id=doc.id) restricts
-        # the vector search to chunks from this one file only
-        qs = (
-            DocumentChunk.objects
-            .filter(document_id=doc.id)
-            .annotate(distance=CosineDistance("embedding", query_vector))
-            .order_by("distance")[:10]
-        )
+        # Key difference from rag_chat: the search is restricted to chunks
+        # from this one file only (document_id filter)
+        # Returns list[dict] with "text" key — same shape as search_similar_chunks()
+        chunks = search_document_chunks(doc.id, query_vector, top_k=10, question=question)
 
-        if not qs.exists():
+        if not chunks:
             return Response({"answer": "No content found for this document."})
 
-        # ---------------- Step 5a: Convert QuerySet to Dict List ----------------
-        # build_prompt() expects list[dict] with "text" key — same shape as search_similar_chunks()
-        chunks = [
-            {"id": str(c.id), "text": c.text, "document_id": str(c.document_id)}
-            for c in qs
-        ]
-
-        # ---------------- Step 5b: Build Prompt + Ask LLaMA ----------------
-        prompt = build_prompt(question, chunks, history)
-
-        client = Client()
-        resp = client.chat(
-            model=LLM_MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        answer = resp["message"]["content"]
+        # ---------------- Step 5: Build Prompt + Ask LLaMA ----------------
+        prompt, context_stats = build_prompt(question, chunks, history)
+        answer = ask_llm(prompt)
+        remember_answer(answer, chunks, cache_key=cache_key)
+        record_turn(session, question, answer)
 
         return Response({
             "answer":       answer,
             "document_id":  str(doc.id),
             "filename":     doc.original_filename,
             "chunk_count":  len(chunks),
+            "context":      context_stats,
+            "session_id":   session and str(session.id),
         }, status=200)
 
     except Exception as e:
         return Response(
             {"error": f"Doc chat failed: {str(e)}"},
             status=500,
-        )
\ No newline at end of file
+        )
+
+
+# ================================================================
+#  View 8: embed_file_async
+#  POST /embed_file_async/
+#  Body: { "id": "<document UUID>" }
+#  Queues the embedding pipeline instead of running it inside the request
+#  Returns 202 with the job at once — poll embedding_job_status for progress
+#  The job is executed by `python manage.py embedding_worker`
+#  Requires: IsAuthenticated + CanEmbedFiles (files:execute RBAC check)
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanEmbedFiles])
+def embed_file_async(request):
+    # ---------------- Step 1: Validate Input ----------------
+    doc_id = request.data.get("id")
+    if not doc_id:
+        return Response({"error": "id is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # ---------------- Step 2: Resolve Group + Fetch Document ----------------
+    group_id = get_group_id(request.user)
+    try:
+        doc = Document.objects.get(id=doc_id, follow_group=group_id)
+    except Document.DoesNotExist:
+        return Response({"error": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    # ---------------- Step 3: Enqueue ----------------
+    # Returns the existing job if this document is already queued/running
+    job = enqueue_embedding_job(doc, user=request.user)
+
+    return Response(EmbeddingJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+# ================================================================
+#  View 9: embedding_job_status
+#  GET /embedding_job_status/<job_id>/
+#  Returns status + progress counters of an embedding job
+#  Group-scoped → users only see jobs of their own company
+# ================================================================
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def embedding_job_status(request, job_id):
+    group_id = get_group_id(request.user)
+    try:
+        job = EmbeddingJob.objects.get(id=job_id, follow_group=group_id)
+    except EmbeddingJob.DoesNotExist:
+        return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(EmbeddingJobSerializer(job).data)
+
+
+
+# ================================================================
+#  View 10: rag_cache_stats
+#  GET /rag_cache_stats/
+#  Hit / miss / size counters of every RAG cache in THIS worker process
+#  (query embeddings, exact + semantic answers, chunk-embedding cache,
+#  in-memory vector index) + prompt tokens saved by context packing — shows how
+#  much embedding / generation latency the caches are saving
+#  Requires: IsAuthenticated + IsAdminUser (process-wide, not tenant data)
+# ================================================================
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def rag_cache_stats(request):
+    stats = all_cache_stats()
+    stats["chunk_embedding"] = embedding_cache_stats()
+    stats["semantic_answer"] = semantic_cache_stats()
+    stats["memory_index"] = memory_index.stats()
+    stats["context_packing"] = context_packing_stats()
+    return Response(stats)
+
+
+
+# ================================================================
+#  View 11: rag_chat_stream
+#  POST /rag_chat_stream/
+#  Body: same as rag_chat — { "question": "...", "history": [...] } or with "session_id"
+#  Streaming variant: retrieved sources are sent first, then the answer
+#  token by token as LLaMA generates it (text/event-stream)
+#  Non-streaming clients keep using rag_chat (same JSON shape as before)
+#  Requires: IsAuthenticated + CanRagChat (prompt:execute RBAC check)
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanRagChat])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def rag_chat_stream(request):
+    question = request.data.get("question", "").strip()
+    history = request.data.get("history", []) or []
+
+    if not question:
+        return Response({"error": "question is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    session, error = resolve_chat_session(request)
+    if error is not None:
+        return error
+    if session is not None:
+        history = prompt_history(session)
+    session_info = {"session_id": session and str(session.id)}
+
+    # ---------------- Step 1: Replay a Cached Answer ----------------
+    group_id = get_group_id(request.user)
+    corpus_version = get_corpus_version(group_id)
+    digest = history_digest(history)
+    cache_key = answer_cache_key(group_id, corpus_version, question, digest)
+    cached = cached_answer(cache_key)
+    if cached is not None:
+        record_turn(session, question, cached["answer"])
+        return sse_response(stream_answer_events(
+            None,
+            {"chunks": cached["chunks"], "chunk_count": len(cached["chunks"]), **session_info},
+            fallback_answer=cached["answer"],
+        ))
+
+    # ---------------- Step 2: Retrieve Before Streaming ----------------
+    # Embedding/search errors still come back as a normal JSON 500
+    # A semantic-cache hit is replayed like an exact one
+    try:
+        query_vec = embed_query(question)
+        semantic = {
+            "group_id": group_id,
+            "corpus_version": corpus_version,
+            "history_digest": digest,
+            "embedding_model": EMBEDDING_MODEL_NAME,
+            "query_vector": query_vec,
+            "question": question,
+        }
+        similar = lookup_semantic_answer(**semantic)
+        if similar is not None:
+            remember_answer(similar["answer"], similar["chunks"], cache_key=cache_key)
+            record_turn(session, question, similar["answer"])
+            return sse_response(stream_answer_events(
+                None,
+                {"chunks": similar["chunks"], "chunk_count": len(similar["chunks"]), **session_info},
+                fallback_answer=similar["answer"],
+            ))
+        chunks = search_similar_chunks(request.user, query_vec, top_k=10, question=question)
+    except Exception as e:
+        return Response(
+            {"error": f"RAG failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    # ---------------- Step 3: Stream Sources + Tokens ----------------
+    def on_answer(answer):
+        remember_answer(answer, chunks, cache_key=cache_key, semantic=semantic)
+        record_turn(session, question, answer)
+
+    prompt, context_stats = build_prompt(question, chunks, history) if chunks else (None, None)
+    return sse_response(stream_answer_events(
+        prompt,
+        {"chunks": chunks, "chunk_count": len(chunks), "context": context_stats, **session_info},
+        fallback_answer="No relevant documents found. Upload and embed some files first.",
+        on_answer=on_answer,
+    ))
+
+
+# ================================================================
+#  View 12: doc_chat_stream
+#  POST /doc_chat_stream/
+#  Body: same as doc_chat — { "document_id": "...", "question": "...", "history": [...] }
+#  Streaming variant of doc_chat (text/event-stream)
+#  Requires: IsAuthenticated + CanRagChat (prompt:execute RBAC check)
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanRagChat])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def doc_chat_stream(request):
+    doc, question, history, session, error = _resolve_doc_chat(request)
+    if error is not None:
+        return error
+
+    doc_info = {
+        "document_id": str(doc.id),
+        "filename": doc.original_filename,
+        "session_id": session and str(session.id),
+    }
+
+    cache_key = answer_cache_key(
+        doc.follow_group, get_corpus_version(doc.follow_group),
+        question, history_digest(history), document_id=doc.id,
+    )
+    cached = cached_answer(cache_key)
+    if cached is not None:
+        record_turn(session, question, cached["answer"])
+        return sse_response(stream_answer_events(
+            None,
+            {"chunks": cached["chunks"], "chunk_count": len(cached["chunks"]), **doc_info},
+            fallback_answer=cached["answer"],
+        ))
+
+    try:
+        query_vector = embed_query(question)
+        chunks = search_document_chunks(doc.id, query_vector, top_k=10, question=question)
+    except Exception as e:
+        return Response({"error": f"Doc chat failed: {str(e)}"}, status=500)
+
+    def on_answer(answer):
+        remember_answer(answer, chunks, cache_key=cache_key)
+        record_turn(session, question, answer)
+
+    prompt, context_stats = build_prompt(question, chunks, history) if chunks else (None, None)
+    return sse_response(stream_answer_events(
+        prompt,
+        {"chunks": chunks, "chunk_count": len(chunks), "context": context_stats, **doc_info},
+        fallback_answer="No content found for this document.",
+        on_answer=on_answer,
+    ))
+
+
+# ================================================================
+#  View 13: chat_sessions
+#  GET  /chat_sessions/ → the caller's chat sessions, most recently used first
+#  POST /chat_sessions/ → create one
+#        Body: { "document_id": "..." (optional → doc_chat session), "title": "..." (optional) }
+#  Pass the returned id as "session_id" to rag_chat / doc_chat (+ *_stream)
+#  Requires: IsAuthenticated + CanRagChat (prompt:execute RBAC check)
+# ================================================================
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated, CanRagChat])
+def chat_sessions(request):
+    group_id = get_group_id(request.user)
+
+    if request.method == "GET":
+        sessions = ChatSession.objects.filter(user=request.user, follow_group=group_id)
+        return Response(ChatSessionSerializer(sessions, many=True).data)
+
+    # ---------------- Create: Optional Document Scope ----------------
+    # Same checks as doc_chat — the document must be in the group and embedded
+    document = None
+    document_id = (request.data.get("document_id") or "").strip()
+    if document_id:
+        try:
+            document = Document.objects.get(id=document_id, follow_group=group_id, is_embedded=True)
+        except (Document.DoesNotExist, ValueError, DjangoValidationError):
+            return Response(
+                {"error": "Document not found or has not been embedded yet."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+    session = ChatSession.objects.create(
+        user=request.user,
+        follow_group=group_id,
+        document=document,
+        title=(request.data.get("title") or "")[:255],
+    )
+    return Response(ChatSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+# ================================================================
+#  View 14: chat_session_detail
+#  GET    /chat_session_detail/<session_id>/ → session + summary + every turn
+#  DELETE /chat_session_detail/<session_id>/ → remove the session and its turns
+#  Only the session's owner can see or delete it
+# ================================================================
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAuthenticated, CanRagChat])
+def chat_session_detail(request, session_id):
+    try:
+        session = ChatSession.objects.get(id=session_id, user=request.user)
+    except ChatSession.DoesNotExist:
+        return Response({"error": "Chat session not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == "DELETE":
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    return Response(ChatSessionDetailSerializer(session).data)
+
+
+# ================================================================
+#  View 15: bulk_upload_files
+#  POST /bulk_upload_files/
+#  Multipart form: "files" (repeated, up to FILE_BULK_UPLOAD_MAX_FILES)
+#                  "embed" = "true" → also queue an embedding job per file
+#                            (needs CanEmbedFiles as well)
+#
+#  Files are written to MinIO concurrently and the Document rows are created
+#  with one bulk_create — see bulk_upload.py
+#  Response: {"results": [one entry per file, in request order], "created": N, "failed": N}
+#   201 → every file stored, 207 → some failed, 400 → none stored
+#  Requires: IsAuthenticated + CanUploadFiles (files:create RBAC check)
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanUploadFiles])
+@parser_classes([MultiPartParser, FormParser])
+def bulk_upload_files(request):
+    # ---------------- Step 1: Validate Request ----------------
+    files = request.FILES.getlist("files")
+    if not files:
+        return Response({"error": "files is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(files) > settings.FILE_BULK_UPLOAD_MAX_FILES:
+        return Response(
+            {"error": f"At most {settings.FILE_BULK_UPLOAD_MAX_FILES} files per request."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    embed = str(request.data.get("embed", "")).lower() in ("1", "true", "yes")
+    if embed and not CanEmbedFiles().has_permission(request, None):
+        return Response({"error": "You do not have permission to embed files."}, status=status.HTTP_403_FORBIDDEN)
+
+    # ---------------- Step 2: Store Files + Create Rows ----------------
+    try:
+        outcomes = upload_documents(request.user, files, embed=embed)
+    except Exception as e:
+        return Response({"error": f"Bulk upload failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # ---------------- Step 3: Per-File Results ----------------
+    results = []
+    for outcome in outcomes:
+        doc, job = outcome["document"], outcome["job"]
+        results.append({
+            "filename": outcome["filename"],
+            "ok": doc is not None,
+            "document": DocumentSerializer(doc).data if doc is not None else None,
+            "embedding_job_id": str(job.id) if job is not None else None,
+            "error": outcome["error"],
+        })
+
+    created = sum(1 for r in results if r["ok"])
+    if created == len(results):
+        code = status.HTTP_201_CREATED
+    elif created:
+        code = status.HTTP_207_MULTI_STATUS
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    return Response({"results": results, "created": created, "failed": len(results) - created}, status=code)
+
+
+# ================================================================
+#  View 16: presigned_upload
+#  POST /presigned_upload/
+#  Body: { "filename": "report.pdf", "size": <bytes> }
+#  Step 1 of a direct upload — the file bytes never pass through Django
+#
+#  Response:
+#   method "put"       → PUT the whole file to "url"
+#   method "multipart" → PUT each part_size slice to parts[i].url and keep
+#                        every response's ETag header for complete_upload
+#   upload_token       → send to complete_upload (or abort_upload) afterwards
+#  Requires: IsAuthenticated + CanUploadFiles (files:create RBAC check)
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanUploadFiles])
+def presigned_upload(request):
+    filename = (request.data.get("filename") or "").strip()
+    try:
+        size = int(request.data.get("size") or 0)
+    except (TypeError, ValueError):
+        return Response({"error": "size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return Response(start_direct_upload(request.user, filename, size), status=status.HTTP_201_CREATED)
+    except DirectUploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+
+
+# ================================================================
+#  View 17: complete_upload
+#  POST /complete_upload/
+#  Body: { "upload_token": "...", "parts": [{"part_number": 1, "etag": "..."}] (multipart only),
+#          "embed": true (optional → queue an embedding job, needs CanEmbedFiles) }
+#  Step 3 of a direct upload — HEADs the object in MinIO, checks its size
+#  against the one announced to presigned_upload, then creates the Document
+#  Returns the Document like upload_file (+ "embedding_job_id")
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanUploadFiles])
+def complete_upload(request):
+    embed = str(request.data.get("embed", "")).lower() in ("1", "true", "yes")
+    if embed and not CanEmbedFiles().has_permission(request, None):
+        return Response({"error": "You do not have permission to embed files."}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        doc, job = finish_direct_upload(
+            request.user,
+            request.data.get("upload_token"),
+            parts=request.data.get("parts"),
+            embed=embed,
+        )
+    except DirectUploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+
+    data = dict(DocumentSerializer(doc).data)
+    data["embedding_job_id"] = str(job.id) if job is not None else None
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+# ================================================================
+#  View 18: abort_upload
+#  POST /abort_upload/
+#  Body: { "upload_token": "..." }
+#  Drops the parts of a multipart upload the client gave up on
+# ================================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, CanUploadFiles])
+def abort_upload(request):
+    try:
+        abort_direct_upload(request.user, request.data.get("upload_token"))
+    except DirectUploadError as e:
+        return Response({"error": str(e)}, status=e.status)
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -4,7 +4,7 @@
 #  Takes a user prompt + tone key → returns {subject, body} dict
 #
 #  FLOW:
-#  Step 1 → Initialize LLaMA model (llama3.2:3b via Ollama)
+#  Step 1 → Use the shared Ollama client (OLLAMA_CHAT_MODEL, llama3.2:3b by default)
 #  Step 2 → Resolve tone key to a human-readable label
 #  Step 3 → Build a strict JSON-output instruction prompt
 #  Step 4 → Invoke LLaMA and parse the JSON response
@@ -15,13 +15,12 @@
 # ---------------- Step 0: Imports ----------------
 import json  # For parsing and validating the JSON response from LLaMA
 
-from langchain_ollama import OllamaLLM  # LangChain wrapper for local Ollama models
+from backend import ollama_client  # Shared, pooled Ollama client (keep-alive + concurrency cap)
 
 
-# ---------------- Step 1: Initialize the LLM ----------------
-# llama3.2:3b → larger than :1b, better writing quality for email generation
-# Instantiated once at module level so the model isn't reloaded on every request
-llm = OllamaLLM(model="llama3.2:3b")
+# ---------------- Step 1: LLM Access ----------------
+# llama3.2:3b (OLLAMA_CHAT_MODEL) → larger than :1b, better writing quality for email generation
+# The process-wide client reuses its HTTP connections across requests
 
 
 # ---------------- Step 2: Tone Mappings ----------------
@@ -70,8 +69,8 @@ No markdown, no extra text.
 """.strip()
 
     # ---------------- Step 3c: Invoke LLaMA ----------------
-    # llm.invoke() sends the prompt to the local Ollama instance and returns a string
-    response_text = llm.invoke(instruction)
+    # generate() sends the prompt to the local Ollama instance and returns a string
+    response_text = ollama_client.generate(instruction)
 
     # ---------------- Step 3d: Parse JSON Response ----------------
     try:
@@ -15,6 +15,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
 from file_upload.utils import get_group_id
+from backend.storage import file_url  # Cached presigned URLs for profile pictures
 from .models import Task
 from .utils import same_group  # Cross-company assignment guard
 
@@ -43,7 +44,7 @@ class TaskUserMiniSerializer(serializers.ModelSerializer):
             return None
 
         try:
-            url = f.url   # May raise ValueError if the file field has no file attached
+            url = file_url(f)   # Cached MinIO signed URL; may raise ValueError if no file is attached
         except Exception:
             return None
 